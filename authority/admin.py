@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import AuthorityDashboard, IssueComment
+from .stats import reconcile_dashboards
 
 @admin.register(AuthorityDashboard)
 class AuthorityDashboardAdmin(admin.ModelAdmin):
@@ -15,9 +16,11 @@ class AuthorityDashboardAdmin(admin.ModelAdmin):
     actions = ['update_statistics']
     
     def update_statistics(self, request, queryset):
-        for dashboard in queryset:
-            dashboard.update_statistics()
-        self.message_user(request, f"Updated statistics for {queryset.count()} dashboards")
+        result = reconcile_dashboards(areas=list(queryset.values_list('area', flat=True)))
+        self.message_user(
+            request,
+            f"Checked {len(result['areas'])} dashboards, repaired {len(result['drifted'])}"
+        )
     update_statistics.short_description = "Update statistics for selected dashboards"
 
 @admin.register(IssueComment)
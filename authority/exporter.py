@@ -0,0 +1,137 @@
+import csv
+import json
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
+from user.renderers import orjson
+from .models import IssueComment
+
+FORMATS = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+# Same names as the import columns, so an export can be imported elsewhere
+EXPORT_FIELDS = (
+    'id', 'title', 'description', 'issue_type', 'status', 'priority',
+    'latitude', 'longitude', 'address', 'area', 'city',
+    'reporter_name', 'reporter_phone', 'reporter_email',
+    'assigned_to', 'authority_notes', 'ai_classification', 'ai_priority',
+    'created_at', 'updated_at', 'resolved_at',
+)
+CHUNK_SIZE = 2000
+# Rows joined into each piece of the response body
+ROWS_PER_WRITE = 500
+# Leading characters that make spreadsheets evaluate a CSV cell
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+# Prefix that makes such a cell text; the importer removes it again
+QUOTE = "'"
+
+_encoder = DjangoJSONEncoder()
+
+
+def export_rows(queryset, comment_counts=False, chunk_size=CHUNK_SIZE):
+    """
+    Issue rows as dicts of EXPORT_FIELDS (plus ``comment_count``), in id order.
+    Rows are fetched ``chunk_size`` at a time (a server-side cursor where the
+    database has them), so memory stays flat however many rows match.
+    """
+    fields = list(EXPORT_FIELDS)
+    if comment_counts:
+        # A correlated count uses the issue_id index row by row; a GROUP BY
+        # would have to aggregate every issue before the first row is sent
+        comments = (
+            IssueComment.objects.filter(issue=OuterRef('pk')).order_by()
+            .values('issue').annotate(count=Count('pk')).values('count')
+        )
+        queryset = queryset.annotate(
+            comment_count=Coalesce(Subquery(comments, output_field=IntegerField()), Value(0))
+        )
+        fields.append('comment_count')
+    return queryset.order_by('pk').values(*fields).iterator(chunk_size=chunk_size)
+
+
+def columns(comment_counts=False):
+    return list(EXPORT_FIELDS) + (['comment_count'] if comment_counts else [])
+
+
+class _Echo:
+    """File-like object for csv.writer that hands back each written line"""
+
+    def write(self, value):
+        return value
+
+
+def csv_chunks(rows, comment_counts=False):
+    """CSV text: the header at once, then ROWS_PER_WRITE rows per chunk"""
+    writer = csv.writer(_Echo())
+    fields = columns(comment_counts)
+    yield writer.writerow(fields)
+    lines = []
+    for row in rows:
+        lines.append(writer.writerow([_csv_value(row[field]) for field in fields]))
+        if len(lines) >= ROWS_PER_WRITE:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+def jsonl_chunks(rows):
+    """One JSON object per line, ROWS_PER_WRITE lines per chunk"""
+    lines = []
+    for row in rows:
+        lines.append(_json_line(row))
+        if len(lines) >= ROWS_PER_WRITE:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+def chunks(queryset, fmt, comment_counts=False, chunk_size=CHUNK_SIZE):
+    rows = export_rows(queryset, comment_counts, chunk_size)
+    return csv_chunks(rows, comment_counts) if fmt == 'csv' else jsonl_chunks(rows)
+
+
+def streaming_response(request, body, fmt, filename='issues'):
+    """
+    StreamingHttpResponse for export ``body`` chunks (see streaming_body).
+    """
+    response = StreamingHttpResponse(streaming_body(request, body), content_type=f'{FORMATS[fmt]}; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def streaming_body(request, body):
+    """
+    ``body`` as the response content for ``request``. Under ASGI the chunks
+    are produced in a worker thread one at a time; handing Django a plain
+    iterator there would make it buffer the whole body first.
+    """
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        return _aiter(body)
+    return body
+
+
+async def _aiter(iterator):
+    iterator = iter(iterator)
+    while True:
+        chunk = await sync_to_async(next)(iterator, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def _csv_value(value):
+    if isinstance(value, str):
+        # Text a spreadsheet would run as a formula is quoted (CSV injection),
+        # and so is text already starting with the quote, so import can undo it
+        return QUOTE + value if value.startswith(FORMULA_PREFIXES + (QUOTE,)) else value
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def _json_line(row):
+    if orjson is not None:
+        return orjson.dumps(row, default=_encoder.default, option=orjson.OPT_PASSTHROUGH_DATETIME).decode() + '\n'
+    return json.dumps(row, cls=DjangoJSONEncoder, separators=(',', ':'), ensure_ascii=False) + '\n'
@@ -0,0 +1,195 @@
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from user import areas
+from user.models import CivicIssue
+from user.signals import issue_changed
+
+FORMATS = ('csv', 'jsonl')
+REQUIRED_FIELDS = ('title', 'description', 'issue_type', 'latitude', 'longitude', 'address', 'area')
+OPTIONAL_FIELDS = (
+    'city', 'status', 'priority', 'reporter_name', 'reporter_phone', 'reporter_email',
+    'created_at', 'resolved_at', 'authority_notes', 'assigned_to',
+)
+DEFAULT_BATCH_SIZE = 500
+# Row errors kept in an import summary; the counts include all of them
+MAX_REPORTED_ERRORS = 1000
+
+_COORDINATE = Decimal('0.000001')
+_BOUNDS = {'latitude': 90, 'longitude': 180}
+
+
+def format_for(filename, default='csv'):
+    """Import format from a file name's extension"""
+    name = (filename or '').lower()
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    if name.endswith('.csv'):
+        return 'csv'
+    return default
+
+
+def read_rows(stream, fmt):
+    """
+    Parse a text stream one record at a time.
+    Yields: (line number, dict of raw values or error message)
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            # Short rows come back as None values, long rows under the None key
+            if None in row:
+                yield reader.line_num, 'Row has more values than the header'
+            else:
+                yield reader.line_num, {key.strip(): _unquote(value) for key, value in row.items() if key}
+        return
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, f'Invalid JSON: {e}'
+            continue
+        if not isinstance(row, dict):
+            yield line_number, 'Each line must be a JSON object'
+            continue
+        yield line_number, row
+
+
+def _unquote(value):
+    """Drop the leading ' that CSV exports (and spreadsheets) use to mark a cell as text"""
+    return value[1:] if value and value.startswith("'") else value
+
+
+def open_upload(upload):
+    """Text stream over an uploaded (binary) file; a UTF-8 BOM is skipped"""
+    return io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+
+
+def build_issue(row, user):
+    """
+    Validate one raw row against the CivicIssue fields and choices.
+    Returns: (unsaved issue, legacy created_at or None)
+    Raises: ValidationError with a message dict keyed by column
+    """
+    values, errors = {}, {}
+    for name in REQUIRED_FIELDS + OPTIONAL_FIELDS:
+        raw = row.get(name)
+        if isinstance(raw, str):
+            raw = raw.strip()
+        if raw in (None, ''):
+            if name in REQUIRED_FIELDS:
+                errors[name] = ['This field is required.']
+            continue
+        try:
+            values[name] = _clean(name, raw)
+        except ValidationError as e:
+            errors[name] = e.messages
+    if errors:
+        raise ValidationError(errors)
+
+    created_at = values.pop('created_at', None)
+    if values.get('status') == 'RESOLVED' and 'resolved_at' not in values:
+        values['resolved_at'] = created_at or timezone.now()
+    values.setdefault('reporter_name', user.get_full_name() or user.username)
+    values.setdefault('reporter_phone', user.username[:15])
+    # Rows bring their own type and priority; classify_issues can still add the AI's
+    issue = CivicIssue(reported_by=user, ai_status='SKIPPED', **values)
+    issue.assign_geohash()
+    return issue, created_at
+
+
+def _clean(name, raw):
+    field = CivicIssue._meta.get_field(name)
+    if field.choices:
+        raw = _choice_value(field, raw)
+    elif name in _BOUNDS:
+        try:
+            raw = Decimal(str(raw)).quantize(_COORDINATE)
+        except InvalidOperation:
+            raise ValidationError('Enter a number.')
+        if not raw.is_finite():
+            raise ValidationError('Enter a number.')
+        if abs(raw) > _BOUNDS[name]:
+            raise ValidationError(f'Must be between -{_BOUNDS[name]} and {_BOUNDS[name]}.')
+    value = field.clean(raw, None)
+    if field.get_internal_type() == 'DateTimeField' and timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+def _choice_value(field, raw):
+    """Accept choice keys and labels in any case ('in progress', 'Potholes')"""
+    text = str(raw).strip()
+    for key, label in field.choices:
+        if text.upper() in (key, label.upper()) or text.upper().replace(' ', '_') == key:
+            return key
+    return text
+
+
+def import_issues(rows, user, batch_size=DEFAULT_BATCH_SIZE, dry_run=False, max_errors=MAX_REPORTED_ERRORS):
+    """
+    Validate and insert ``rows`` (from read_rows) as issues reported by ``user``.
+    Valid rows are written with bulk_create, ``batch_size`` at a time, each
+    batch in its own transaction with one issue_changed signal, so counters,
+    rollups, map indexes and events are updated once per batch.
+    Invalid rows are skipped and reported; they do not stop the import.
+    Unreadable data (bad encoding or CSV quoting) does: the rows read before
+    it are still written and ``error`` is set in the summary.
+    Returns: dict with imported, failed, errors ({'line', 'errors'}),
+    errors_truncated and, if reading stopped early, error
+    """
+    batch_size = max(batch_size, 1)
+    summary = {'imported': 0, 'failed': 0, 'errors': [], 'errors_truncated': False}
+    batch = []
+    try:
+        for line, row in rows:
+            try:
+                if isinstance(row, str):
+                    raise ValidationError({'row': [row]})
+                batch.append(build_issue(row, user))
+            except ValidationError as e:
+                summary['failed'] += 1
+                if max_errors is None or len(summary['errors']) < max_errors:
+                    summary['errors'].append({'line': line, 'errors': e.message_dict})
+                else:
+                    summary['errors_truncated'] = True
+                continue
+            if len(batch) >= batch_size:
+                summary['imported'] += _write_batch(batch, dry_run)
+                batch = []
+    except (UnicodeDecodeError, csv.Error) as e:
+        # Earlier batches are committed; the summary says how far it got
+        summary['error'] = f'Could not read file: {e}'
+    if batch:
+        summary['imported'] += _write_batch(batch, dry_run)
+    return summary
+
+
+def _write_batch(batch, dry_run):
+    if dry_run:
+        return len(batch)
+    issues = [issue for issue, _ in batch]
+    with transaction.atomic():
+        areas.assign(issues)
+        CivicIssue.objects.bulk_create(issues)
+        # created_at is auto_now_add, so legacy timestamps are written afterwards
+        for issue, created_at in batch:
+            if created_at is not None:
+                issue.created_at = created_at
+        changes = []
+        for issue in issues:
+            issue._tracked_state = issue.tracked_state()
+            changes.append((None, issue._tracked_state))
+        issue_changed.send(sender=CivicIssue, changes=changes)
+        # Sequence numbers last: the counter row stays locked until commit
+        last = CivicIssue.reserve_sync_seq(len(issues))
+        for seq, issue in enumerate(issues, start=last - len(issues) + 1):
+            issue.sync_seq = seq
+        CivicIssue.objects.bulk_update(issues, ['created_at', 'sync_seq'])
+    return len(issues)
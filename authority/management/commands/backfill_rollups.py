@@ -0,0 +1,25 @@
+from datetime import datetime, time
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from authority import rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the hourly, daily and all-time issue rollups used by the analytics endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since', help='Only rebuild buckets from this date (YYYY-MM-DD) onwards'
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            day = parse_date(options['since'])
+            if day is None:
+                raise CommandError('--since must be a YYYY-MM-DD date')
+            since = datetime.combine(day, time.min)
+
+        self.stdout.write('Rebuilding issue rollups...')
+        rows = rollups.rebuild(since=since)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {rows} rollup rows'))
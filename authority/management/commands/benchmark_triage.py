@@ -0,0 +1,50 @@
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from user.models import CivicIssue
+
+
+class Command(BaseCommand):
+    help = 'Compare resolving N issues with per-item update_status PATCHes against one bulk_triage call'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--issues', type=int, default=200, help='Issues to resolve (created and rolled back)')
+
+    def handle(self, *args, **options):
+        client = APIClient(SERVER_NAME='localhost')
+        for name, run in (('per-item update_status', self._per_item), ('bulk_triage', self._bulk)):
+            with transaction.atomic():
+                ids = self._create(options['issues'])
+                connection.queries_log.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    run(client, ids)
+                    elapsed = time.perf_counter() - started
+                resolved = CivicIssue.objects.filter(pk__in=ids, status='RESOLVED').count()
+                transaction.set_rollback(True)
+            self.stdout.write(
+                f'{name}: {resolved} resolved in {elapsed * 1000:.0f} ms, '
+                f'{len(queries)} queries, {len(ids) / elapsed:,.0f} issues/s'
+            )
+
+    def _per_item(self, client, ids):
+        for pk in ids:
+            client.patch(f'/api/authority/issues/{pk}/update_status/', {'status': 'RESOLVED'}, format='json')
+
+    def _bulk(self, client, ids):
+        client.post('/api/authority/issues/bulk_triage/', {'ids': ids, 'status': 'RESOLVED'}, format='json')
+
+    def _create(self, count):
+        user, _ = User.objects.get_or_create(username='benchmark')
+        return [
+            CivicIssue.objects.create(
+                title=f'Benchmark issue {i}', description='Synthetic issue for benchmarking',
+                issue_type='POTHOLE', latitude=28.5 + i * 1e-4, longitude=77.1 + i * 1e-4,
+                address='Main Road', area=f'Benchmark Area {i % 5}', reported_by=user,
+                reporter_name='Benchmark', reporter_phone='0000000000',
+            ).pk
+            for i in range(count)
+        ]
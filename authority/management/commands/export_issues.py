@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from authority import exporter, importer
+from authority.views import filter_issues
+from user.models import CivicIssue
+
+
+class Command(BaseCommand):
+    help = 'Stream issues (optionally with comment counts) to a CSV or JSONL file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help="Output file (default '-': standard output)")
+        parser.add_argument('--format', choices=sorted(exporter.FORMATS),
+                            help='Output format (default: from the file extension, else csv)')
+        parser.add_argument('--status', help='Only issues with this status')
+        parser.add_argument('--priority', help='Only issues with this priority')
+        parser.add_argument('--area', help='Only issues in this area (a name, an alias or part of one)')
+        parser.add_argument('--issue-type', help='Only issues of this type')
+        parser.add_argument('--comment-counts', action='store_true', help='Add a comment_count column')
+        parser.add_argument('--chunk-size', type=int, default=exporter.CHUNK_SIZE,
+                            help='Rows fetched from the database at a time')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or importer.format_for(path)
+        queryset = filter_issues(CivicIssue.objects.all(), options)
+        body = exporter.chunks(queryset, fmt, options['comment_counts'], max(options['chunk_size'], 1))
+
+        if path == '-':
+            for chunk in body:
+                self.stdout.write(chunk, ending='')
+            return
+        try:
+            output = open(path, 'w', encoding='utf-8', newline='')
+        except OSError as e:
+            raise CommandError(str(e))
+        with output:
+            for chunk in body:
+                output.write(chunk)
+        self.stderr.write(self.style.SUCCESS(f'Exported issues to {path}'))
@@ -0,0 +1,52 @@
+import sys
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from authority import importer
+
+
+class Command(BaseCommand):
+    help = 'Import issues from a CSV or JSONL file, streaming it in batched inserts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV/JSONL file, or '-' for standard input")
+        parser.add_argument('--user', required=True, help='Username recorded as the reporter of imported issues')
+        parser.add_argument('--format', choices=importer.FORMATS,
+                            help='Input format (default: from the file extension, else csv)')
+        parser.add_argument('--batch-size', type=int, default=importer.DEFAULT_BATCH_SIZE,
+                            help='Issues per bulk insert and transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Validate every row but write nothing')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']!r} does not exist")
+        fmt = options['format'] or importer.format_for(options['path'])
+
+        started = time.perf_counter()
+        if options['path'] == '-':
+            summary = self._import(sys.stdin, fmt, user, options)
+        else:
+            try:
+                stream = open(options['path'], encoding='utf-8-sig', newline='')
+            except OSError as e:
+                raise CommandError(str(e))
+            with stream:
+                summary = self._import(stream, fmt, user, options)
+        elapsed = time.perf_counter() - started
+
+        for error in summary['errors']:
+            details = '; '.join(f"{field}: {' '.join(messages)}" for field, messages in error['errors'].items())
+            self.stderr.write(f"Line {error['line']}: {details}")
+        verb = 'Validated' if options['dry_run'] else 'Imported'
+        message = f"{verb} {summary['imported']} issues in {elapsed:.1f}s, {summary['failed']} rows failed"
+        if 'error' in summary:
+            raise CommandError(f"{summary['error']} ({message})")
+        self.stdout.write(self.style.SUCCESS(message))
+
+    def _import(self, stream, fmt, user, options):
+        return importer.import_issues(
+            importer.read_rows(stream, fmt), user,
+            batch_size=options['batch_size'], dry_run=options['dry_run'], max_errors=None,
+        )
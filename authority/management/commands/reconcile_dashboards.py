@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from authority.stats import reconcile_dashboards
+
+
+class Command(BaseCommand):
+    help = 'Rebuild AuthorityDashboard counters from civic issues, reporting any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only report drift; exit with status 1 if any is found'
+        )
+        parser.add_argument('--area', action='append', help='Limit to this area (repeatable)')
+
+    def handle(self, *args, **options):
+        result = reconcile_dashboards(areas=options['area'], repair=not options['check'])
+
+        for drift in result['drifted']:
+            self.stdout.write(self.style.WARNING(
+                f"{drift['area']}: stored {drift['stored']} actual {drift['actual']}"
+            ))
+
+        summary = f"Checked {len(result['areas'])} areas, {len(result['drifted'])} drifted"
+        if options['check']:
+            if result['drifted']:
+                self.stderr.write(self.style.ERROR(summary))
+                raise SystemExit(1)
+            self.stdout.write(self.style.SUCCESS(summary))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{summary}, all repaired"))
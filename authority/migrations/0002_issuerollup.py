@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:56
+
+from datetime import timezone
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+
+
+def backfill_rollups(apps, schema_editor):
+    CivicIssue = apps.get_model('user', 'CivicIssue')
+    IssueRollup = apps.get_model('authority', 'IssueRollup')
+    groups = (
+        CivicIssue.objects
+        .annotate(bucket=TruncHour('created_at', tzinfo=timezone.utc))
+        .values('bucket', 'area', 'issue_type', 'status', 'priority')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    IssueRollup.objects.bulk_create(
+        [IssueRollup(**group) for group in groups.iterator(chunk_size=2000)],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authority', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IssueRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(help_text='Start of the UTC hour the issues were created in')),
+                ('area', models.CharField(max_length=100)),
+                ('issue_type', models.CharField(choices=[('POTHOLE', 'Potholes'), ('GARBAGE', 'Garbage overflow'), ('WATER', 'Water leakage'), ('STREETLIGHT', 'Broken streetlights'), ('ROAD_OBSTRUCTION', 'Road obstruction')], max_length=20)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('IN_PROGRESS', 'In Progress'), ('RESOLVED', 'Resolved'), ('REJECTED', 'Rejected')], max_length=20)),
+                ('priority', models.CharField(choices=[('LOW', 'Low'), ('MEDIUM', 'Medium'), ('HIGH', 'High'), ('CRITICAL', 'Critical')], max_length=20)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('bucket', 'area', 'issue_type', 'status', 'priority'), name='unique_issue_rollup')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
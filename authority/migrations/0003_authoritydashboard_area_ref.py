@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:02
+
+from datetime import timezone
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncHour
+
+
+def rekey_aggregates(apps, schema_editor):
+    """Rebuild dashboards and rollups on the canonical area names from user.0017"""
+    CivicIssue = apps.get_model('user', 'CivicIssue')
+    AuthorityDashboard = apps.get_model('authority', 'AuthorityDashboard')
+    IssueRollup = apps.get_model('authority', 'IssueRollup')
+
+    counters = {
+        'total_issues': Q(),
+        'pending_issues': Q(status='PENDING'),
+        'in_progress_issues': Q(status='IN_PROGRESS'),
+        'resolved_issues': Q(status='RESOLVED'),
+        'critical_issues': Q(priority='CRITICAL'),
+    }
+    dashboards = CivicIssue.objects.values('area', 'area_ref').annotate(**{
+        field: Count('id', filter=condition) for field, condition in counters.items()
+    }).order_by()
+    AuthorityDashboard.objects.all().delete()
+    AuthorityDashboard.objects.bulk_create(
+        [AuthorityDashboard(area_ref_id=row.pop('area_ref'), **row) for row in dashboards],
+        batch_size=1000,
+    )
+
+    groups = (
+        CivicIssue.objects
+        .annotate(bucket=TruncHour('created_at', tzinfo=timezone.utc))
+        .values('bucket', 'area', 'issue_type', 'status', 'priority')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    IssueRollup.objects.all().delete()
+    IssueRollup.objects.bulk_create(
+        [IssueRollup(**group) for group in groups.iterator(chunk_size=2000)],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authority', '0002_issuerollup'),
+        ('user', '0017_area'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authoritydashboard',
+            name='area_ref',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='dashboard', to='user.area'),
+        ),
+        migrations.RunPython(rekey_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:19
+
+from datetime import datetime, timezone
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDay
+
+# authority.rollups.ALL_TIME, frozen here
+ALL_TIME = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def backfill_periods(apps, schema_editor):
+    """Add the local-day and all-time rows next to the existing hourly ones"""
+    CivicIssue = apps.get_model('user', 'CivicIssue')
+    IssueRollup = apps.get_model('authority', 'IssueRollup')
+    fields = ('area', 'issue_type', 'status', 'priority')
+    days = (
+        CivicIssue.objects.annotate(bucket=TruncDay('created_at'))
+        .values('bucket', *fields).annotate(count=Count('id')).order_by()
+    )
+    IssueRollup.objects.bulk_create(
+        [IssueRollup(period='DAY', **group) for group in days.iterator(chunk_size=2000)],
+        batch_size=1000,
+    )
+    totals = CivicIssue.objects.values(*fields).annotate(count=Count('id')).order_by()
+    IssueRollup.objects.bulk_create(
+        [IssueRollup(period='ALL', bucket=ALL_TIME, **group) for group in totals.iterator(chunk_size=2000)],
+        batch_size=1000,
+    )
+
+
+def drop_periods(apps, schema_editor):
+    IssueRollup = apps.get_model('authority', 'IssueRollup')
+    IssueRollup.objects.exclude(period='HOUR').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authority', '0003_authoritydashboard_area_ref'),
+        ('user', '0017_area'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='issuerollup',
+            name='unique_issue_rollup',
+        ),
+        migrations.AddField(
+            model_name='issuerollup',
+            name='period',
+            field=models.CharField(choices=[('HOUR', 'Hour (UTC)'), ('DAY', 'Day (local time)'), ('ALL', 'All time')], default='HOUR', max_length=4),
+        ),
+        migrations.AlterField(
+            model_name='issuerollup',
+            name='bucket',
+            field=models.DateTimeField(help_text='Start of the hour or day the issues were created in (fixed for ALL)'),
+        ),
+        migrations.AddConstraint(
+            model_name='issuerollup',
+            constraint=models.UniqueConstraint(fields=('period', 'bucket', 'area', 'issue_type', 'status', 'priority'), name='unique_issue_rollup'),
+        ),
+        migrations.RunPython(backfill_periods, drop_periods),
+    ]
@@ -1,10 +1,14 @@
 from django.db import models
-from user.models import CivicIssue
+from django.db.models import Count, Q
+from user.models import Area, CivicIssue
 
 class AuthorityDashboard(models.Model):
     """Model for authority dashboard statistics"""
     
     area = models.CharField(max_length=100, unique=True)
+    area_ref = models.OneToOneField(
+        Area, on_delete=models.CASCADE, related_name='dashboard', null=True, blank=True
+    )
     total_issues = models.IntegerField(default=0)
     pending_issues = models.IntegerField(default=0)
     in_progress_issues = models.IntegerField(default=0)
@@ -20,14 +24,16 @@ class AuthorityDashboard(models.Model):
         return f"Dashboard - {self.area}"
     
     def update_statistics(self):
-        """Update dashboard statistics from CivicIssue data"""
-        issues = CivicIssue.objects.filter(area=self.area)
-        
-        self.total_issues = issues.count()
-        self.pending_issues = issues.filter(status='PENDING').count()
-        self.in_progress_issues = issues.filter(status='IN_PROGRESS').count()
-        self.resolved_issues = issues.filter(status='RESOLVED').count()
-        self.critical_issues = issues.filter(priority='CRITICAL').count()
+        """Recompute dashboard statistics from CivicIssue data in one query"""
+        stats = CivicIssue.objects.filter(area_ref_id=self.area_ref_id).aggregate(
+            total_issues=Count('id'),
+            pending_issues=Count('id', filter=Q(status='PENDING')),
+            in_progress_issues=Count('id', filter=Q(status='IN_PROGRESS')),
+            resolved_issues=Count('id', filter=Q(status='RESOLVED')),
+            critical_issues=Count('id', filter=Q(priority='CRITICAL')),
+        )
+        for field, value in stats.items():
+            setattr(self, field, value)
         
         self.save()
 
@@ -44,3 +50,31 @@ class IssueComment(models.Model):
     
     def __str__(self):
         return f"Comment on {self.issue.title} by {self.commented_by}"
+
+class IssueRollup(models.Model):
+    """Issue counts by area, type, status and priority, keyed on creation time"""
+    
+    PERIODS = [
+        ('HOUR', 'Hour (UTC)'),
+        ('DAY', 'Day (local time)'),
+        ('ALL', 'All time'),
+    ]
+    
+    period = models.CharField(max_length=4, choices=PERIODS, default='HOUR')
+    bucket = models.DateTimeField(help_text="Start of the hour or day the issues were created in (fixed for ALL)")
+    area = models.CharField(max_length=100)
+    issue_type = models.CharField(max_length=20, choices=CivicIssue.ISSUE_TYPES)
+    status = models.CharField(max_length=20, choices=CivicIssue.STATUS_CHOICES)
+    priority = models.CharField(max_length=20, choices=CivicIssue.PRIORITY_CHOICES)
+    count = models.IntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['period', 'bucket', 'area', 'issue_type', 'status', 'priority'],
+                name='unique_issue_rollup',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.period} {self.bucket:%Y-%m-%d %H:00} {self.area} {self.issue_type}/{self.status}/{self.priority}: {self.count}"
@@ -0,0 +1,24 @@
+import hashlib
+from django.core.cache import cache
+from django.utils import timezone
+
+# Reports are keyed by data version, so a long timeout never serves stale data
+REPORT_CACHE_TIMEOUT = 7 * 24 * 3600
+
+
+def report_cache_key(area, summary):
+    """Cache key for the report on ``area`` (None for all areas) at the summary's data version"""
+    area_key = hashlib.sha256((area or '').strip().lower().encode()).hexdigest()[:16]
+    return f"authority:report:{area_key}:{summary['version']}"
+
+
+def get_cached_report(area, summary):
+    """Previously generated report for unchanged data, or None"""
+    return cache.get(report_cache_key(area, summary))
+
+
+def store_report(area, summary, report):
+    """Cache a generated report. Returns the cached entry."""
+    entry = {'report': report, 'generated_at': timezone.now().isoformat()}
+    cache.set(report_cache_key(area, summary), entry, REPORT_CACHE_TIMEOUT)
+    return entry
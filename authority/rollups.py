@@ -0,0 +1,152 @@
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDay, TruncHour, TruncMonth, TruncWeek
+from django.utils import timezone
+from user.counters import merge_deltas, apply_deltas
+from user.models import CivicIssue
+from .models import IssueRollup
+
+GRANULARITIES = {
+    'hour': TruncHour,
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+# Upper bound on the number of buckets one analytics request may span
+MAX_BUCKETS = 2000
+
+
+# Bucket of the single ALL row per (area, type, status, priority)
+ALL_TIME = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+_GROUP_FIELDS = ('area', 'issue_type', 'status', 'priority')
+
+
+def bucket_for(created_at, period='HOUR'):
+    """Start of the UTC hour (HOUR) or local day (DAY) containing ``created_at``; ALL_TIME for ALL"""
+    if period == 'ALL':
+        return ALL_TIME
+    if timezone.is_naive(created_at):
+        created_at = timezone.make_aware(created_at)
+    if period == 'DAY':
+        return timezone.make_aware(datetime.combine(timezone.localtime(created_at).date(), time.min))
+    return created_at.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def _rollup_keys(state):
+    return [
+        (('period', period), ('bucket', bucket_for(state['created_at'], period)),
+         *((field, state[field]) for field in _GROUP_FIELDS))
+        for period, _ in IssueRollup.PERIODS
+    ]
+
+
+def apply_changes(changes):
+    """Move rollup counts (every period) for a batch of (old_state, new_state) issue changes"""
+    keyed = []
+    for old, new in changes:
+        for state, sign in ((old, -1), (new, 1)):
+            if state is not None:
+                keyed.extend((key, {'count': sign}) for key in _rollup_keys(state))
+    apply_deltas(IssueRollup, merge_deltas(keyed))
+
+
+def _rows(issues, period):
+    if period == 'ALL':
+        groups = issues.values(*_GROUP_FIELDS)
+    else:
+        trunc = TruncHour('created_at', tzinfo=dt_timezone.utc) if period == 'HOUR' else TruncDay('created_at')
+        groups = issues.annotate(bucket=trunc).values('bucket', *_GROUP_FIELDS)
+    groups = groups.annotate(count=Count('id')).order_by()
+    for group in groups.iterator(chunk_size=2000):
+        group.setdefault('bucket', ALL_TIME)
+        yield IssueRollup(period=period, **group)
+
+
+def rebuild(since=None):
+    """
+    Recompute rollups from CivicIssue with one grouped query per period,
+    optionally only the hour and day buckets from ``since`` on (the ALL
+    rows are always recomputed). Returns the number of rows written.
+    """
+    written = 0
+    with transaction.atomic():
+        for period, _ in IssueRollup.PERIODS:
+            issues = CivicIssue.objects.all()
+            rollups = IssueRollup.objects.filter(period=period)
+            if since is not None and period != 'ALL':
+                start = bucket_for(since, period)
+                issues = issues.filter(created_at__gte=start)
+                rollups = rollups.filter(bucket__gte=start)
+            rollups.delete()
+            written += len(IssueRollup.objects.bulk_create(_rows(issues, period), batch_size=1000))
+    return written
+
+
+def _step(start, granularity):
+    """Start of the bucket following ``start``"""
+    if granularity == 'month':
+        year, month = divmod(start.month, 12)
+        return start.replace(year=start.year + year, month=month + 1)
+    return start + {
+        'hour': timedelta(hours=1),
+        'day': timedelta(days=1),
+        'week': timedelta(weeks=1),
+    }[granularity]
+
+
+def _truncate(moment, granularity):
+    """Local-time start of the bucket containing ``moment``"""
+    moment = timezone.localtime(moment)
+    if granularity == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    day = moment.date()
+    if granularity == 'week':
+        day -= timedelta(days=day.weekday())
+    elif granularity == 'month':
+        day = day.replace(day=1)
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def time_series(start, end, granularity='day', **filters):
+    """
+    Issue counts per bucket between ``start`` and ``end`` (aware datetimes),
+    oldest first, with empty buckets filled in.
+    Returns: list of (bucket_start, count)
+    """
+    first = _truncate(start, granularity)
+    buckets = []
+    current = first
+    while current <= end:
+        buckets.append(current)
+        if len(buckets) > MAX_BUCKETS:
+            raise ValueError(f'Range spans more than {MAX_BUCKETS} {granularity} buckets')
+        current = _step(current, granularity)
+
+    # Hourly rows only serve the hour series; longer buckets add up days
+    period = 'HOUR' if granularity == 'hour' else 'DAY'
+    trunc = GRANULARITIES[granularity]
+    rows = (
+        IssueRollup.objects
+        .filter(period=period, bucket__gte=bucket_for(first, period), bucket__lte=end, count__gt=0, **filters)
+        .annotate(start=trunc('bucket'))
+        .values('start')
+        .annotate(total=Sum('count'))
+        .order_by()
+    )
+    totals = {row['start']: row['total'] for row in rows}
+    return [(bucket, totals.get(bucket, 0)) for bucket in buckets]
+
+
+def distribution(field, **filters):
+    """All-time issue counts grouped by ``field`` (e.g. status or priority), from the ALL rows"""
+    rows = (
+        IssueRollup.objects
+        .filter(period='ALL', count__gt=0, **filters)
+        .values(field)
+        .annotate(total=Sum('count'))
+        .order_by()
+    )
+    return {row[field]: row['total'] for row in rows}
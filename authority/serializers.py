@@ -2,6 +2,10 @@ from rest_framework import serializers
 from .models import AuthorityDashboard, IssueComment
 from user.models import CivicIssue
 from user.serializers import CivicIssueSerializer
+from .triage import MAX_BULK_ITEMS, TRIAGE_FIELDS
+
+# Keys accepted in a bulk triage ``filter``, as in the issue list query parameters
+TRIAGE_FILTERS = ('status', 'priority', 'area', 'issue_type')
 
 class AuthorityDashboardSerializer(serializers.ModelSerializer):
     """Serializer for Authority Dashboard"""
@@ -30,6 +34,31 @@ class IssueUpdateSerializer(serializers.ModelSerializer):
         model = CivicIssue
         fields = ['status', 'priority', 'authority_notes', 'assigned_to']
 
+class BulkTriageSerializer(serializers.Serializer):
+    """Bulk triage request: the issues (``ids`` or ``filter``) and the changes to apply"""
+    
+    ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False, allow_empty=False, max_length=MAX_BULK_ITEMS
+    )
+    filter = serializers.DictField(child=serializers.CharField(), required=False, allow_empty=False)
+    status = serializers.ChoiceField(choices=CivicIssue.STATUS_CHOICES, required=False)
+    priority = serializers.ChoiceField(choices=CivicIssue.PRIORITY_CHOICES, required=False)
+    assigned_to = serializers.CharField(max_length=100, required=False, allow_null=True, allow_blank=True)
+    authority_notes = serializers.CharField(required=False, allow_null=True, allow_blank=True)
+    
+    def validate_filter(self, value):
+        unknown = set(value) - set(TRIAGE_FILTERS)
+        if unknown:
+            raise serializers.ValidationError(f"Unknown filters: {', '.join(sorted(unknown))}")
+        return value
+    
+    def validate(self, data):
+        if ('ids' in data) == ('filter' in data):
+            raise serializers.ValidationError('Provide either ids or filter')
+        if not any(field in data for field in TRIAGE_FIELDS):
+            raise serializers.ValidationError(f"Nothing to change; set one of {', '.join(TRIAGE_FIELDS)}")
+        return data
+
 class DashboardStatsSerializer(serializers.Serializer):
     """Serializer for overall dashboard statistics"""
     
@@ -0,0 +1,28 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from user import events
+from user.models import CivicIssue
+from user.signals import issue_changed
+from .models import IssueComment
+from . import rollups, stats
+
+
+@receiver(issue_changed, sender=CivicIssue)
+def update_dashboard_counters(sender, changes, **kwargs):
+    stats.apply_dashboard_changes(changes)
+
+
+@receiver(issue_changed, sender=CivicIssue)
+def update_rollups(sender, changes, **kwargs):
+    rollups.apply_changes(changes)
+
+
+@receiver(issue_changed, sender=CivicIssue)
+def invalidate_dashboard_cache(sender, changes, **kwargs):
+    stats.invalidate_overview()
+
+
+@receiver(post_save, sender=IssueComment)
+def publish_comment_event(sender, instance, created, **kwargs):
+    if created:
+        events.publish([events.comment_event(instance)])
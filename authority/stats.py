@@ -0,0 +1,200 @@
+import time
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from user.counters import merge_deltas, apply_deltas
+from user.models import CivicIssue
+from user.serializers import CivicIssueSerializer
+from .models import AuthorityDashboard
+
+OVERVIEW_CACHE_KEY = 'authority:dashboard-overview'
+# Generation of the cached overview, bumped by every committed issue write
+OVERVIEW_VERSION_KEY = 'authority:dashboard-overview-version'
+OVERVIEW_CACHE_TIMEOUT = 300
+
+
+def invalidate_overview():
+    """
+    Retire the cached dashboard overview; called whenever a CivicIssue is
+    written. The generation is bumped once the write commits.
+    """
+    transaction.on_commit(_bump_overview_version)
+
+
+def _bump_overview_version():
+    try:
+        cache.incr(OVERVIEW_VERSION_KEY)
+    except ValueError:
+        # Evicted: start a generation no earlier one can have used
+        cache.add(OVERVIEW_VERSION_KEY, time.time_ns(), None)
+
+
+def _overview_version():
+    version = cache.get(OVERVIEW_VERSION_KEY)
+    if version is None:
+        cache.add(OVERVIEW_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(OVERVIEW_VERSION_KEY)
+    return version
+
+
+def get_overview():
+    """
+    Dashboard overview, served from cache when no issue changed since it was
+    built. The overview is stored under the generation read before its
+    queries, so one built from data a concurrent write has since replaced
+    lands in a retired generation and is never served.
+    """
+    version = _overview_version()
+    data = cache.get(OVERVIEW_CACHE_KEY, version=version)
+    if data is None:
+        data = build_overview()
+        cache.add(OVERVIEW_CACHE_KEY, data, OVERVIEW_CACHE_TIMEOUT, version=version)
+    return data
+
+
+def build_overview():
+    """
+    Compute the dashboard overview with a fixed number of queries:
+    one grouped count over (status, priority, issue_type), the recent
+    issues and the top areas.
+    """
+    groups = (
+        CivicIssue.objects
+        .values('status', 'priority', 'issue_type')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+
+    type_names = dict(CivicIssue.ISSUE_TYPES)
+    totals = {'all': 0}
+    priorities = {}
+    types = {'all': {}, 'PENDING': {}, 'IN_PROGRESS': {}, 'RESOLVED': {}}
+    for group in groups:
+        count = group['count']
+        totals['all'] += count
+        totals[group['status']] = totals.get(group['status'], 0) + count
+        priorities[group['priority']] = priorities.get(group['priority'], 0) + count
+        for bucket in ('all', group['status']):
+            if bucket in types:
+                by_type = types[bucket]
+                by_type[group['issue_type']] = by_type.get(group['issue_type'], 0) + count
+
+    def type_breakdown(by_type):
+        # Display names in ISSUE_TYPES order, omitting empty types
+        return {
+            name: by_type[code]
+            for code, name in type_names.items()
+            if by_type.get(code)
+        }
+
+    # Recent issues (last 10)
+    recent_issues = CivicIssue.objects.order_by('-created_at')[:10]
+
+    # Area-wise statistics
+    areas = CivicIssue.objects.values('area').annotate(
+        total=Count('id'),
+        pending=Count('id', filter=Q(status='PENDING')),
+        resolved=Count('id', filter=Q(status='RESOLVED'))
+    ).order_by('-total')[:10]
+
+    return {
+        'total_issues': totals['all'],
+        'pending_issues': totals.get('PENDING', 0),
+        'in_progress_issues': totals.get('IN_PROGRESS', 0),
+        'resolved_issues': totals.get('RESOLVED', 0),
+        'critical_issues': priorities.get('CRITICAL', 0),
+        'high_priority_issues': priorities.get('HIGH', 0),
+        'issue_types': type_breakdown(types['all']),
+        'pending_types': type_breakdown(types['PENDING']),
+        'inprogress_types': type_breakdown(types['IN_PROGRESS']),
+        'resolved_types': type_breakdown(types['RESOLVED']),
+        'recent_issues': CivicIssueSerializer(recent_issues, many=True).data,
+        'areas_stats': list(areas),
+    }
+
+
+# AuthorityDashboard counter -> filter over the issues of its area
+DASHBOARD_COUNTERS = {
+    'total_issues': Q(),
+    'pending_issues': Q(status='PENDING'),
+    'in_progress_issues': Q(status='IN_PROGRESS'),
+    'resolved_issues': Q(status='RESOLVED'),
+    'critical_issues': Q(priority='CRITICAL'),
+}
+
+
+def _dashboard_deltas(state, sign):
+    deltas = {'total_issues': sign}
+    if state['status'] == 'PENDING':
+        deltas['pending_issues'] = sign
+    elif state['status'] == 'IN_PROGRESS':
+        deltas['in_progress_issues'] = sign
+    elif state['status'] == 'RESOLVED':
+        deltas['resolved_issues'] = sign
+    if state['priority'] == 'CRITICAL':
+        deltas['critical_issues'] = sign
+    return (('area', state['area']), ('area_ref_id', state['area_ref_id'])), deltas
+
+
+def apply_dashboard_changes(changes):
+    """Apply a batch of (old_state, new_state) issue changes to the per-area counters"""
+    keyed = []
+    for old, new in changes:
+        if old is not None:
+            keyed.append(_dashboard_deltas(old, -1))
+        if new is not None:
+            keyed.append(_dashboard_deltas(new, 1))
+    apply_deltas(AuthorityDashboard, merge_deltas(keyed), last_updated=timezone.now())
+
+
+def area_counts(areas=None):
+    """
+    Actual per-area counters computed from CivicIssue in one grouped query.
+    Returns: dict of area name -> (area id, counters)
+    """
+    issues = CivicIssue.objects.all()
+    if areas is not None:
+        issues = issues.filter(area_ref__name__in=areas)
+    rows = issues.values('area_ref', 'area').annotate(**{
+        field: Count('id', filter=condition) for field, condition in DASHBOARD_COUNTERS.items()
+    }).order_by()
+    return {row.pop('area'): (row.pop('area_ref'), row) for row in rows}
+
+
+def reconcile_dashboards(areas=None, repair=True):
+    """
+    Compare stored dashboard counters with the issues table and optionally fix them.
+    Returns: dict with the checked areas and the ones that had drifted
+    """
+    zero = dict.fromkeys(DASHBOARD_COUNTERS, 0)
+    with transaction.atomic():
+        actual = area_counts(areas)
+        dashboards = AuthorityDashboard.objects.select_for_update()
+        if areas is not None:
+            dashboards = dashboards.filter(area__in=areas)
+        stored = {dashboard.area: dashboard for dashboard in dashboards}
+
+        drifted, to_update, to_create = [], [], []
+        for area in sorted(set(actual) | set(stored)):
+            area_id, expected = actual.get(area, (None, zero))
+            dashboard = stored.get(area)
+            current = {field: getattr(dashboard, field) for field in DASHBOARD_COUNTERS} if dashboard else None
+            if current == expected and (area_id is None or dashboard.area_ref_id == area_id):
+                continue
+            drifted.append({'area': area, 'stored': current, 'actual': expected})
+            if dashboard is None:
+                to_create.append(AuthorityDashboard(area=area, area_ref_id=area_id, **expected))
+            else:
+                for field, value in expected.items():
+                    setattr(dashboard, field, value)
+                dashboard.area_ref_id = area_id or dashboard.area_ref_id
+                dashboard.last_updated = timezone.now()
+                to_update.append(dashboard)
+
+        if repair:
+            AuthorityDashboard.objects.bulk_create(to_create)
+            AuthorityDashboard.objects.bulk_update(
+                to_update, [*DASHBOARD_COUNTERS, 'area_ref', 'last_updated'], batch_size=500
+            )
+    return {'areas': sorted(set(actual) | set(stored)), 'drifted': drifted, 'repaired': repair}
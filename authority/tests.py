@@ -1,3 +1,588 @@
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+from datetime import timedelta
+from unittest import mock
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import Count
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.test import AsyncClient
+from rest_framework.test import APIClient
+from user import clusters, events
+from user.gemini_service import GeminiService, summarize_issues
+from user.tasks import _classification_failed
+from user.mock_model import MockGenerativeModel
+from user.models import BackgroundJob, CivicIssue, ClusterCell
+from user.serializers import CivicIssueSerializer
+from .models import AuthorityDashboard, IssueComment, IssueRollup
+from . import importer, rollups, stats
+from .stats import build_overview, get_overview, reconcile_dashboards
 
-# Create your tests here.
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def make_issues(user, count, start=0, **overrides):
+    """Create ``count`` issues cycling through types, statuses and priorities"""
+    types = [code for code, _ in CivicIssue.ISSUE_TYPES]
+    statuses = [code for code, _ in CivicIssue.STATUS_CHOICES]
+    priorities = [code for code, _ in CivicIssue.PRIORITY_CHOICES]
+    issues = []
+    for i in range(start, start + count):
+        fields = {
+            'title': f'Issue {i}',
+            'description': 'Test issue',
+            'issue_type': types[i % len(types)],
+            'status': statuses[i % len(statuses)],
+            'priority': priorities[i % len(priorities)],
+            'latitude': 28.5 + (i % 50) * 0.001,
+            'longitude': 77.1 + (i % 30) * 0.001,
+            'address': f'Main Road, Area {i % 3}',
+            'area': f'Area {i % 3}',
+            'reported_by': user,
+            'reporter_name': 'Tester',
+            'reporter_phone': '0000000000',
+        }
+        fields.update(overrides)
+        issues.append(CivicIssue.objects.create(**fields))
+    return issues
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class DashboardOverviewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reporter', password='pass12345')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_query_count_is_constant_as_data_grows(self):
+        make_issues(self.user, 5)
+        with self.assertNumQueries(3):
+            small = build_overview()
+
+        make_issues(self.user, 200, start=5)
+        with self.assertNumQueries(3):
+            large = build_overview()
+
+        self.assertEqual(small['total_issues'], 5)
+        self.assertEqual(large['total_issues'], 205)
+
+    def test_breakdowns_match_per_filter_counts(self):
+        make_issues(self.user, 37)
+        data = build_overview()
+        issues = CivicIssue.objects.all()
+
+        self.assertEqual(data['pending_issues'], issues.filter(status='PENDING').count())
+        self.assertEqual(data['in_progress_issues'], issues.filter(status='IN_PROGRESS').count())
+        self.assertEqual(data['resolved_issues'], issues.filter(status='RESOLVED').count())
+        self.assertEqual(data['critical_issues'], issues.filter(priority='CRITICAL').count())
+        self.assertEqual(data['high_priority_issues'], issues.filter(priority='HIGH').count())
+        for code, name in CivicIssue.ISSUE_TYPES:
+            expected = issues.filter(status='PENDING', issue_type=code).count()
+            self.assertEqual(data['pending_types'].get(name, 0), expected)
+
+    def test_cache_is_served_until_an_issue_is_written(self):
+        issue = make_issues(self.user, 3)[0]
+        get_overview()
+        with self.assertNumQueries(0):
+            get_overview()
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            issue.status = 'RESOLVED'
+            issue.save()
+            # Not dropped before the commit, or a reader could re-cache the old data
+            with self.assertNumQueries(0):
+                get_overview()
+        for callback in callbacks:
+            callback()
+        data = get_overview()
+        self.assertEqual(data['resolved_issues'], CivicIssue.objects.filter(status='RESOLVED').count())
+    
+    def test_overview_built_before_a_commit_is_not_served_after_it(self):
+        issue = make_issues(self.user, 3)[0]
+        with self.captureOnCommitCallbacks() as callbacks:
+            issue.status = 'RESOLVED'
+            issue.save()
+
+        def build_then_commit():
+            # The reader's queries ran before the write committed
+            for callback in callbacks:
+                callback()
+            return {'stale': True}
+
+        with mock.patch.object(stats, 'build_overview', side_effect=build_then_commit):
+            self.assertEqual(get_overview(), {'stale': True})
+        self.assertNotIn('stale', get_overview())
+    
+    def test_failed_classification_drops_the_cache(self):
+        issue = make_issues(self.user, 1)[0]
+        get_overview()
+        with self.captureOnCommitCallbacks(execute=True):
+            _classification_failed({'issue_id': issue.pk}, 'boom')
+        recent = get_overview()['recent_issues']
+        self.assertEqual(recent[0]['ai_status'], 'FAILED')
+    
+    def test_unchanged_overview_is_revalidated_with_one_query(self):
+        issue = make_issues(self.user, 3)[0]
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(self.user)
+        etag = client.get('/api/authority/dashboard/overview/')['ETag']
+        with self.assertNumQueries(1):
+            response = client.get('/api/authority/dashboard/overview/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            issue.status = 'RESOLVED'
+            issue.save()
+        response = client.get('/api/authority/dashboard/overview/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['resolved_issues'],
+                         CivicIssue.objects.filter(status='RESOLVED').count())
+
+
+class DashboardCounterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reporter', password='pass12345')
+
+    def test_counters_follow_creates_updates_and_deletes(self):
+        issues = make_issues(self.user, 12)
+        issues[0].status = 'RESOLVED'
+        issues[0].priority = 'CRITICAL'
+        issues[0].save()
+        issues[1].area = 'Area 9'
+        issues[1].save()
+        issues[2].delete()
+
+        self.assertEqual(reconcile_dashboards(repair=False)['drifted'], [])
+        dashboard = AuthorityDashboard.objects.get(area='Area 9')
+        self.assertEqual(dashboard.total_issues, 1)
+
+    def test_reconcile_repairs_drift(self):
+        make_issues(self.user, 6)
+        AuthorityDashboard.objects.filter(area='Area 0').update(total_issues=99)
+        AuthorityDashboard.objects.filter(area='Area 1').delete()
+
+        result = reconcile_dashboards()
+        self.assertEqual([d['area'] for d in result['drifted']], ['Area 0', 'Area 1'])
+        self.assertEqual(reconcile_dashboards(repair=False)['drifted'], [])
+        self.assertEqual(AuthorityDashboard.objects.get(area='Area 0').total_issues, 2)
+
+
+class IssueRollupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reporter', password='pass12345')
+
+    def rollup_rows(self):
+        return sorted(
+            IssueRollup.objects.filter(count__gt=0)
+            .values_list('period', 'bucket', 'area', 'issue_type', 'status', 'priority', 'count')
+        )
+
+    def test_incremental_rollups_match_rebuild(self):
+        issues = make_issues(self.user, 10)
+        issues[0].status = 'RESOLVED'
+        issues[0].save()
+        issues[1].delete()
+
+        incremental = self.rollup_rows()
+        rollups.rebuild()
+        self.assertEqual(incremental, self.rollup_rows())
+
+    def test_series_totals_match_issue_count(self):
+        make_issues(self.user, 8)
+        now = timezone.now()
+        for granularity in rollups.GRANULARITIES:
+            series = rollups.time_series(now - timedelta(days=1), now, granularity)
+            self.assertEqual(sum(count for _, count in series), 8)
+
+    def test_distributions_read_one_all_time_row_per_group(self):
+        make_issues(self.user, 8)
+        all_time = IssueRollup.objects.filter(period='ALL', count__gt=0)
+        self.assertEqual(sum(all_time.values_list('count', flat=True)), 8)
+        self.assertEqual(set(all_time.values_list('bucket', flat=True)), {rollups.ALL_TIME})
+        self.assertEqual(rollups.distribution('status'), {
+            row['status']: row['count'] for row in
+            CivicIssue.objects.values('status').annotate(count=Count('id')).order_by()
+        })
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class AuthorityReportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reporter', password='pass12345')
+        make_issues(cls.user, 12)
+
+    def setUp(self):
+        cache.clear()
+        self.model = MockGenerativeModel()
+        patcher = mock.patch('authority.views.GeminiService', lambda: GeminiService(model=self.model))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient(SERVER_NAME='localhost')
+        self.client.force_authenticate(self.user)
+
+    def test_summary_is_one_grouped_query(self):
+        with self.assertNumQueries(1):
+            summary = summarize_issues(CivicIssue.objects.all())
+        self.assertEqual(summary['total'], 12)
+        self.assertEqual(sum(summary['priority_breakdown'].values()), 12)
+
+    def test_report_is_cached_until_data_changes(self):
+        first = self.client.get('/api/authority/dashboard/generate_report/').data
+        second = self.client.get('/api/authority/dashboard/generate_report/').data
+        self.assertEqual((first['cached'], second['cached']), (False, True))
+        self.assertEqual(self.model.calls, 1)
+
+        issue = CivicIssue.objects.first()
+        issue.status = 'RESOLVED'
+        issue.save()
+        third = self.client.get('/api/authority/dashboard/generate_report/').data
+        self.assertFalse(third['cached'])
+        self.assertEqual(self.model.calls, 2)
+
+    def test_report_streams_as_server_sent_events(self):
+        response = self.client.get('/api/authority/dashboard/generate_report_stream/',
+                                   HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join(response.streaming_content).decode()
+        self.assertGreater(body.count('event: chunk'), 1)
+        self.assertTrue(body.rstrip().split('\n\n')[-1].startswith('event: done'))
+
+        # The streamed report was cached for the JSON endpoint too
+        data = self.client.get('/api/authority/dashboard/generate_report/').data
+        self.assertTrue(data['cached'])
+        self.assertEqual(self.model.calls, 1)
+
+
+    async def test_asgi_report_stream_is_not_buffered(self):
+        response = await AsyncClient().get('/api/authority/dashboard/generate_report_stream/',
+                                           HTTP_ACCEPT='text/event-stream')
+        self.assertTrue(response.is_async)
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertTrue(chunks[0].startswith(b'event: meta'))
+        self.assertGreater(sum(chunk.startswith(b'event: chunk') for chunk in chunks), 1)
+
+class IssueManagementListTests(TestCase):
+
+    def test_list_matches_model_serializer(self):
+        user = User.objects.create_user('staff', is_staff=True)
+        make_issues(user, 15)
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(user)
+        response = client.get('/api/authority/issues/?status=PENDING&count=exact')
+        request = response.wsgi_request
+        expected = CivicIssueSerializer(
+            CivicIssue.objects.filter(status='PENDING').order_by('-created_at')[:10],
+            many=True, context={'request': request}
+        ).data
+        self.assertEqual(response.json()['count'], CivicIssue.objects.filter(status='PENDING').count())
+        self.assertEqual(response.json()['results'], [dict(row) for row in expected])
+    
+    def test_search_applies_list_filters(self):
+        user = User.objects.create_user('staff', is_staff=True)
+        make_issues(user, 6)
+        water = CivicIssue.objects.get(title='Issue 2')  # WATER, RESOLVED
+        IssueComment.objects.create(issue=water, comment='Valve replaced by the water board', commented_by='Authority')
+        make_issues(user, 2, start=6, title='Valve leaking', status='PENDING')
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(user)
+        
+        data = client.get('/api/authority/issues/search/?q=valve').json()
+        self.assertEqual(len(data), 3)
+        self.assertEqual(data[-1]['id'], water.id)  # Comment matches rank below title matches
+        data = client.get('/api/authority/issues/search/?q=valve&status=RESOLVED&fields=id,title').json()
+        self.assertEqual([issue['id'] for issue in data], [water.id])
+        self.assertEqual(sorted(data[0]), ['id', 'search_rank', 'title'])
+        self.assertEqual(client.get('/api/authority/issues/search/').status_code, 400)
+    
+    def test_list_with_fields_selects_only_those_columns(self):
+        user = User.objects.create_user('staff', is_staff=True)
+        make_issues(user, 3)
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/authority/issues/?fields=id,title,status')
+        self.assertEqual(sorted(response.json()['results'][0]), ['id', 'status', 'title'])
+        select = queries.captured_queries[-1]['sql']
+        self.assertNotIn('"description"', select)
+        self.assertNotIn('"ai_analysis"', select)
+
+
+@override_settings(ISSUE_EVENTS_FANOUT='database', ISSUE_EVENTS_POLL_INTERVAL=0.05)
+class IssueEventStreamTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reporter', password='pass12345')
+
+    async def test_stream_delivers_filtered_events(self):
+        response = await AsyncClient().get('/api/authority/events/?priority=high')
+        chunks = aiter(response.streaming_content)
+        self.assertEqual(await anext(chunks), b'retry: 3000\n\n')
+        waiting = asyncio.ensure_future(anext(chunks))
+        await asyncio.sleep(0.1)
+        
+        await sync_to_async(make_issues)(self.user, 2, priority='LOW')
+        [high] = await sync_to_async(make_issues)(self.user, 1, priority='HIGH', status='PENDING')
+        chunk = (await asyncio.wait_for(waiting, 5)).decode()
+        self.assertIn('event: issue.created', chunk)
+        self.assertIn(f'"issue_id": {high.pk}', chunk)
+        
+        high.status = 'RESOLVED'
+        await sync_to_async(high.save)()
+        await sync_to_async(IssueComment.objects.create)(issue=high, comment='Fixed', commented_by='Authority')
+        chunk = (await asyncio.wait_for(anext(chunks), 5)).decode()
+        self.assertIn('event: issue.status_changed', chunk)
+        self.assertIn('"old_status": "PENDING"', chunk)
+        chunk = (await asyncio.wait_for(anext(chunks), 5)).decode()
+        self.assertIn('event: comment.added', chunk)
+        await chunks.aclose()
+
+    def test_reconnect_replays_missed_events(self):
+        since = events.latest_seq()
+        issue = make_issues(self.user, 1)[0]
+        response = self.client.get('/api/authority/events/', HTTP_LAST_EVENT_ID=str(since))
+        body = response.content.decode()
+        self.assertIn(f'"issue_id": {issue.pk}', body)
+        self.assertIn('event: issue.created', body)
+
+
+class BulkTriageTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('staff', is_staff=True)
+
+    def setUp(self):
+        self.client = APIClient(SERVER_NAME='localhost')
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_resolve_by_ids(self):
+        issues = make_issues(self.user, 8, status='PENDING')
+        resolved = make_issues(self.user, 1, start=8, status='RESOLVED', resolved_at=timezone.now())[0]
+        ids = [issue.pk for issue in issues] + [resolved.pk, 999999]
+        
+        response = self.client.post('/api/authority/issues/bulk_triage/', {
+            'ids': ids, 'status': 'RESOLVED', 'assigned_to': 'Crew 4'
+        }, format='json')
+        data = response.json()
+        self.assertEqual((data['updated'], data['unchanged'], data['not_found']), (9, 0, 1))
+        self.assertEqual(data['results'][-1], {'id': 999999, 'result': 'not_found'})
+        
+        stamps = dict(CivicIssue.objects.filter(pk__in=ids).values_list('pk', 'resolved_at'))
+        self.assertTrue(all(stamps.values()))
+        self.assertEqual(stamps[resolved.pk], CivicIssue.objects.get(pk=resolved.pk).resolved_at)
+        self.assertEqual(CivicIssue.objects.filter(assigned_to='Crew 4', status='RESOLVED').count(), 9)
+        
+        # Derived tables match a rebuild from scratch
+        self.assertEqual(reconcile_dashboards(repair=False)['drifted'], [])
+        incremental = sorted(IssueRollup.objects.filter(count__gt=0).values_list(
+            'bucket', 'area', 'issue_type', 'status', 'priority', 'count'))
+        rollups.rebuild()
+        self.assertEqual(incremental, sorted(IssueRollup.objects.filter(count__gt=0).values_list(
+            'bucket', 'area', 'issue_type', 'status', 'priority', 'count')))
+        
+        response = self.client.post('/api/authority/issues/bulk_triage/', {
+            'ids': ids[:2], 'status': 'RESOLVED'
+        }, format='json')
+        self.assertEqual(response.json()['unchanged'], 2)
+
+    def test_bulk_by_filter_and_validation(self):
+        make_issues(self.user, 6)
+        response = self.client.post('/api/authority/issues/bulk_triage/', {
+            'filter': {'area': 'Area 1'}, 'priority': 'CRITICAL'
+        }, format='json')
+        self.assertEqual(response.json()['updated'], 2)
+        self.assertEqual(AuthorityDashboard.objects.get(area='Area 1').critical_issues, 2)
+        
+        for payload in ({'status': 'RESOLVED'}, {'ids': [1], 'filter': {'area': 'x'}, 'status': 'RESOLVED'},
+                        {'ids': [1]}, {'filter': {'title': 'x'}, 'status': 'RESOLVED'}):
+            response = self.client.post('/api/authority/issues/bulk_triage/', payload, format='json')
+            self.assertEqual(response.status_code, 400)
+
+    def test_update_status_stamps_resolution_in_one_save(self):
+        issue = make_issues(self.user, 1, status='PENDING')[0]
+        with mock.patch.object(CivicIssue, 'save', autospec=True, side_effect=CivicIssue.save) as save:
+            self.client.patch(f'/api/authority/issues/{issue.pk}/update_status/',
+                              {'status': 'RESOLVED'}, format='json')
+        self.assertEqual(save.call_count, 1)
+        issue.refresh_from_db()
+        self.assertTrue(timezone.is_aware(issue.resolved_at))
+        
+        self.client.patch(f'/api/authority/issues/{issue.pk}/update_status/',
+                          {'status': 'IN_PROGRESS'}, format='json')
+        issue.refresh_from_db()
+        self.assertIsNone(issue.resolved_at)
+
+
+class IssueImportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('importer', first_name='City', last_name='Office')
+
+    def setUp(self):
+        self.client = APIClient(SERVER_NAME='localhost')
+        self.client.force_authenticate(self.user)
+
+    def _upload(self, name, content, **data):
+        return self.client.post('/api/authority/issues/import/', {
+            'file': SimpleUploadedFile(name, content.encode()), **data
+        }, format='multipart')
+
+    def test_csv_import_reports_bad_rows_and_batches_derived_updates(self):
+        header = 'title,description,issue_type,latitude,longitude,address,area,status,priority,created_at\n'
+        rows = [
+            f'Legacy {i},Old complaint,pothole,28.5{i}1234567,77.1{i},Main Road,Ward {i % 2},'
+            f'{"Resolved" if i % 3 == 0 else "in progress"},HIGH,2023-01-0{i % 9 + 1}T10:00:00\n'
+            for i in range(7)
+        ]
+        rows.insert(3, 'Broken,Row,FLOODING,95,77.1,Main Road,,PENDING,LOW,\n')
+        with mock.patch.object(stats, 'apply_dashboard_changes', wraps=stats.apply_dashboard_changes) as counters_update:
+            response = self._upload('legacy.csv', header + ''.join(rows), batch_size='3')
+        data = response.json()
+        
+        self.assertEqual((data['imported'], data['failed']), (7, 1))
+        self.assertEqual(data['errors'][0]['line'], 5)
+        self.assertEqual(sorted(data['errors'][0]['errors']), ['area', 'issue_type', 'latitude'])
+        # One counter update per batch of 3, not per row
+        self.assertEqual(counters_update.call_count, 3)
+        
+        issues = CivicIssue.objects.filter(reported_by=self.user).order_by('title')
+        self.assertEqual(issues.count(), 7)
+        first = issues[0]
+        self.assertEqual((first.issue_type, first.status, first.reporter_name), ('POTHOLE', 'RESOLVED', 'City Office'))
+        self.assertEqual(first.created_at.year, 2023)
+        self.assertEqual(first.resolved_at, first.created_at)
+        self.assertTrue(first.geohash)
+        self.assertEqual(len(set(issues.values_list('sync_seq', flat=True))), 7)
+        # Imported rows bring their own type and priority: no classification is pending
+        self.assertEqual(set(issues.values_list('ai_status', flat=True)), {'SKIPPED'})
+        self.assertFalse(BackgroundJob.objects.filter(kind='classify_issue').exists())
+        self.assertEqual(set(issues.values_list('area_ref__name', flat=True)), {'Ward 0', 'Ward 1'})
+        
+        self.assertEqual(reconcile_dashboards(repair=False)['drifted'], [])
+        incremental = sorted(IssueRollup.objects.filter(count__gt=0).values_list(
+            'bucket', 'area', 'issue_type', 'status', 'priority', 'count'))
+        rollups.rebuild()
+        self.assertEqual(incremental, sorted(IssueRollup.objects.filter(count__gt=0).values_list(
+            'bucket', 'area', 'issue_type', 'status', 'priority', 'count')))
+        # The map indexes took the bulk counter path (one cell per zoom level per issue)
+        cells = sorted(ClusterCell.objects.filter(count__gt=0).values_list(
+            'zoom', 'cell_x', 'cell_y', 'count', 'resolved_count', 'high_count'))
+        clusters.rebuild()
+        self.assertEqual(cells, sorted(ClusterCell.objects.filter(count__gt=0).values_list(
+            'zoom', 'cell_x', 'cell_y', 'count', 'resolved_count', 'high_count')))
+
+    def test_jsonl_dry_run_and_errors(self):
+        lines = '\n'.join([
+            '{"title": "A", "description": "d", "issue_type": "WATER", "latitude": 28.5,'
+            ' "longitude": 77.1, "address": "x", "area": "Ward 1"}',
+            '',
+            'not json',
+            '[1, 2]',
+        ])
+        data = self._upload('dump.jsonl', lines, dry_run='true').json()
+        self.assertEqual((data['imported'], data['failed']), (1, 2))
+        self.assertEqual([error['line'] for error in data['errors']], [3, 4])
+        self.assertFalse(CivicIssue.objects.exists())
+        
+        response = self._upload('dump.txt', lines, format='xml')
+        self.assertEqual(response.status_code, 400)
+
+    def test_non_finite_coordinates_are_rejected(self):
+        header = 'title,description,issue_type,latitude,longitude,address,area\n'
+        rows = ''.join(f'T,d,WATER,{value},77.1,x,Ward 1\n' for value in ('NaN', 'Infinity', '-inf', 'sNaN'))
+        data = self._upload('bad.csv', header + rows).json()
+        self.assertEqual((data['imported'], data['failed']), (0, 4))
+        self.assertEqual({tuple(error['errors']) for error in data['errors']}, {('latitude',)})
+    
+    def test_unreadable_data_reports_the_rows_already_imported(self):
+        header = 'title,description,issue_type,latitude,longitude,address,area\n'
+        rows = [f'T{i},d,WATER,28.5,77.1,x,Ward 1\n' for i in range(5)]
+        rows.append(f'Huge,{"x" * (csv.field_size_limit() + 1)},WATER,28.5,77.1,x,Ward 1\n')
+        response = self._upload('broken.csv', header + ''.join(rows), batch_size='2')
+        data = response.json()
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Could not read file', data['error'])
+        self.assertEqual((data['imported'], data['failed']), (5, 0))
+        self.assertEqual(CivicIssue.objects.filter(reported_by=self.user).count(), 5)
+
+
+class IssueExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reporter')
+        cls.issues = make_issues(cls.user, 12)
+        IssueComment.objects.create(issue=cls.issues[3], comment='On it', commented_by='Authority')
+        IssueComment.objects.create(issue=cls.issues[3], comment='Done', commented_by='Authority')
+
+    def test_csv_export_applies_list_filters_and_counts_comments(self):
+        response = self.client.get('/api/authority/issues/export/?area=Area 0&comment_counts=1')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        
+        expected = [issue for issue in self.issues if issue.area == 'Area 0']
+        self.assertEqual([int(row['id']) for row in rows], [issue.pk for issue in expected])
+        counts = {int(row['id']): int(row['comment_count']) for row in rows}
+        self.assertEqual(counts[self.issues[3].pk], 2)
+        self.assertEqual(sum(counts.values()), 2)
+
+    def test_csv_export_quotes_formula_cells(self):
+        CivicIssue.objects.filter(pk=self.issues[0].pk).update(
+            title='=1+1', reporter_name='@SUM(A1)',
+            authority_notes='-2+3', address='+1 Main Road',
+        )
+        response = self.client.get('/api/authority/issues/export/')
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        row = next(row for row in rows if int(row['id']) == self.issues[0].pk)
+        self.assertEqual(row['title'], "'=1+1")
+        self.assertEqual(row['reporter_name'], "'@SUM(A1)")
+        self.assertEqual(row['authority_notes'], "'-2+3")
+        self.assertEqual(row['address'], "'+1 Main Road")
+        self.assertEqual(row['description'], self.issues[0].description)
+
+    def test_csv_export_round_trips_through_the_importer(self):
+        texts = {'title': '=1+1', 'description': '- broken lamp', 'authority_notes': "'quoted' note",
+                 'address': '@ Main Road'}
+        CivicIssue.objects.filter(pk=self.issues[0].pk).update(**texts)
+        response = self.client.get('/api/authority/issues/export/')
+        body = b''.join(response.streaming_content).decode()
+
+        importer.import_issues(importer.read_rows(io.StringIO(body), 'csv'), self.user)
+        imported = CivicIssue.objects.filter(title='=1+1').exclude(pk=self.issues[0].pk).get()
+        self.assertEqual({field: getattr(imported, field) for field in texts}, texts)
+
+    def test_jsonl_export_round_trips_through_the_importer(self):
+        response = self.client.get('/api/authority/issues/export/?format=jsonl&status=PENDING')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual(len(rows), CivicIssue.objects.filter(status='PENDING').count())
+        self.assertEqual(rows[0]['latitude'], '28.500000')
+        
+        summary = importer.import_issues(enumerate(rows, start=1), self.user)
+        self.assertEqual((summary['imported'], summary['failed']), (len(rows), 0))
+
+    async def test_asgi_export_streams_without_buffering(self):
+        response = await AsyncClient().get('/api/authority/issues/export/')
+        self.assertTrue(response.is_async)
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertTrue(chunks[0].startswith(b'id,title,'))
+        self.assertEqual(len(b''.join(chunks).decode().splitlines()), 13)
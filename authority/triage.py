@@ -0,0 +1,65 @@
+from django.db import transaction
+from django.utils import timezone
+from user.models import CivicIssue
+from user.signals import issue_changed
+
+# Fields a bulk triage request may change
+TRIAGE_FIELDS = ('status', 'priority', 'assigned_to', 'authority_notes')
+MAX_BULK_ITEMS = 1000
+
+
+def resolved_at_for(issue, new_status, now=None):
+    """resolved_at after moving ``issue`` to ``new_status``: stamped on resolution, cleared on reopening"""
+    if new_status != 'RESOLVED':
+        return None
+    if issue.status != 'RESOLVED' or issue.resolved_at is None:
+        return now or timezone.now()
+    return issue.resolved_at
+
+
+def bulk_triage(queryset, changes, ids=None):
+    """
+    Apply ``changes`` (a dict of TRIAGE_FIELDS) to every issue of ``queryset``
+    in one transaction: one SELECT, one bulk UPDATE and one issue_changed
+    signal, so the map indexes, dashboard counters, rollups and events are
+    adjusted once for the whole batch.
+    ``ids``, when given, are reported as ``not_found`` if they matched nothing.
+    Returns: list of {'id', 'result'} with result updated/unchanged/not_found
+    """
+    now = timezone.now()
+    fields = [field for field in TRIAGE_FIELDS if field in changes]
+    with transaction.atomic():
+        issues = list(
+            queryset.select_for_update().order_by('pk')
+            .only(*CivicIssue.TRACKED_FIELDS, *TRIAGE_FIELDS, 'resolved_at')
+        )
+        updated, state_changes, results = [], [], {}
+        for issue in issues:
+            old = issue.tracked_state()
+            values = dict(changes)
+            if 'status' in values:
+                values['resolved_at'] = resolved_at_for(issue, values['status'], now)
+            if all(getattr(issue, field) == value for field, value in values.items()):
+                results[issue.pk] = 'unchanged'
+                continue
+            for field, value in values.items():
+                setattr(issue, field, value)
+            issue.updated_at = now
+            updated.append(issue)
+            state_changes.append((old, issue.tracked_state()))
+            results[issue.pk] = 'updated'
+
+        if updated:
+            # Receivers work from the states, so they run before the rows are
+            # written and the sequence (locked until commit) is reserved last
+            issue_changed.send(sender=CivicIssue, changes=state_changes)
+            last = CivicIssue.reserve_sync_seq(len(updated))
+            for seq, issue in enumerate(updated, start=last - len(updated) + 1):
+                issue.sync_seq = seq
+            columns = fields + (['resolved_at'] if 'status' in changes else [])
+            CivicIssue.objects.bulk_update(
+                updated, columns + ['updated_at', 'sync_seq'], batch_size=500
+            )
+
+    order = ids if ids is not None else [issue.pk for issue in issues]
+    return [{'id': pk, 'result': results.get(pk, 'not_found')} for pk in order]
@@ -2,7 +2,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     AuthorityDashboardViewSet, IssueManagementViewSet,
-    IssueCommentViewSet, analytics_view
+    IssueCommentViewSet, analytics_view, ai_status_view, issue_events_view
 )
 
 router = DefaultRouter()
@@ -13,4 +13,6 @@ router.register(r'comments', IssueCommentViewSet, basename='issue-comments')
 urlpatterns = [
     path('', include(router.urls)),
     path('analytics/', analytics_view, name='analytics'),
+    path('ai/status/', ai_status_view, name='ai-status'),
+    path('events/', issue_events_view, name='issue-events'),
 ]
@@ -1,16 +1,62 @@
+import asyncio
+import json
+from asgiref.sync import sync_to_async
 from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view
+from rest_framework.parsers import MultiPartParser
+from rest_framework.renderers import BaseRenderer
 from rest_framework.response import Response
-from django.db.models import Count, Q
-from datetime import datetime, timedelta
+from datetime import datetime, time, timedelta
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from .models import AuthorityDashboard, IssueComment
-from user.models import CivicIssue
+from user.models import CivicIssue, IssueTombstone
 from .serializers import (
-    AuthorityDashboardSerializer, IssueCommentSerializer,
+    AuthorityDashboardSerializer, BulkTriageSerializer, IssueCommentSerializer,
     IssueUpdateSerializer, DashboardStatsSerializer
 )
 from user.serializers import CivicIssueSerializer
-from user.gemini_service import GeminiService
+from user.conditional import conditional_response
+from user.fieldsets import FullTextSearchMixin, SparseFieldsetMixin
+from user.pagination import IssueCursorPagination
+from user.renderers import FAST_RENDERERS
+from user import ai_cache, ai_guard, areas, events, sync
+from user.ai_guard import AIUnavailable
+from user.ai_providers import get_provider
+from user.gemini_service import GeminiService, summarize_issues
+from .stats import get_overview, reconcile_dashboards
+from . import exporter, importer, reports, rollups, triage
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets EventSource requests (Accept: text/event-stream) through content negotiation"""
+    
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data).encode()
+
+
+class CSVRenderer(EventStreamRenderer):
+    """Lets ``?format=csv`` / Accept: text/csv select the streaming export"""
+    
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class JSONLinesRenderer(EventStreamRenderer):
+    """Lets ``?format=jsonl`` / Accept: application/x-ndjson select the streaming export"""
+    
+    media_type = 'application/x-ndjson'
+    format = 'jsonl'
+
+
+def sse_event(event, data, event_id=None):
+    """Format one server-sent event"""
+    prefix = f"id: {event_id}\n" if event_id is not None else ''
+    return f"{prefix}event: {event}\ndata: {json.dumps(data)}\n\n"
+
 
 class AuthorityDashboardViewSet(viewsets.ModelViewSet):
     """ViewSet for Authority Dashboard"""
@@ -20,122 +66,160 @@ class AuthorityDashboardViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def overview(self, request):
-        """Get comprehensive dashboard overview"""
-        
-        # Get all issues
-        all_issues = CivicIssue.objects.all()
-        
-        # Calculate statistics
-        total_issues = all_issues.count()
-        pending_issues = all_issues.filter(status='PENDING').count()
-        in_progress_issues = all_issues.filter(status='IN_PROGRESS').count()
-        resolved_issues = all_issues.filter(status='RESOLVED').count()
-        critical_issues = all_issues.filter(priority='CRITICAL').count()
-        high_priority_issues = all_issues.filter(priority='HIGH').count()
-        
-        # Helper for type breakdown
-        def get_types(qs):
-            res = {}
-            for choice in CivicIssue.ISSUE_TYPES:
-                c = qs.filter(issue_type=choice[0]).count()
-                if c > 0: res[choice[1]] = c
-            return res
-
-        # Recent issues (last 10)
-        recent_issues = all_issues.order_by('-created_at')[:10]
-        
-        # Area-wise statistics
-        areas = all_issues.values('area').annotate(
-            total=Count('id'),
-            pending=Count('id', filter=Q(status='PENDING')),
-            resolved=Count('id', filter=Q(status='RESOLVED'))
-        ).order_by('-total')[:10]
-
-        data = {
-            'total_issues': total_issues,
-            'pending_issues': pending_issues,
-            'in_progress_issues': in_progress_issues,
-            'resolved_issues': resolved_issues,
-            'critical_issues': critical_issues,
-            'high_priority_issues': high_priority_issues,
-            'issue_types': get_types(all_issues),
-            'pending_types': get_types(all_issues.filter(status='PENDING')),
-            'inprogress_types': get_types(all_issues.filter(status='IN_PROGRESS')),
-            'resolved_types': get_types(all_issues.filter(status='RESOLVED')),
-            'recent_issues': CivicIssueSerializer(recent_issues, many=True).data,
-            'areas_stats': list(areas)
-        }
-        
-        
-        return Response(data)
+        """Get comprehensive dashboard overview; 304 when no issue changed"""
+        return conditional_response(request, CivicIssue.objects.all(), lambda: Response(get_overview()))
     
     @action(detail=False, methods=['get'])
     def generate_report(self, request):
-        """Generate AI-powered report for authorities"""
+        """
+        Generate AI-powered report for authorities.
+        Reports are cached per area and data version, so unchanged data
+        is not sent to the model again.
+        """
         
         area = request.query_params.get('area', None)
-        
-        if area:
-            issues = CivicIssue.objects.filter(area__icontains=area)
-        else:
-            issues = CivicIssue.objects.all()
+        summary = summarize_issues(self._report_issues(area))
         
         try:
-            gemini_service = GeminiService()
-            report = gemini_service.generate_authority_report(issues)
+            entry = reports.get_cached_report(area, summary)
+            cached = entry is not None
+            if not cached:
+                report = GeminiService().generate_authority_report(summary=summary, fallback=False)
+                entry = reports.store_report(area, summary, report)
             
             return Response({
-                'report': report,
-                'generated_at': datetime.now().isoformat(),
+                'report': entry['report'],
+                'generated_at': entry['generated_at'],
                 'area': area or 'All Areas',
-                'total_issues_analyzed': issues.count()
+                'total_issues_analyzed': summary['total'],
+                'cached': cached
             })
+        except AIUnavailable as e:
+            return Response(
+                {'error': f'Report generation failed: {str(e)}'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
         except Exception as e:
             return Response(
                 {'error': f'Report generation failed: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    @action(detail=False, methods=['get'], renderer_classes=[EventStreamRenderer])
+    def generate_report_stream(self, request):
+        """
+        Stream the report as server-sent events while the model writes it:
+        a ``meta`` event, ``chunk`` events with text, then ``done`` or ``error``.
+        A cached report for unchanged data is sent as a single chunk.
+        """
+        area = request.query_params.get('area', None)
+        summary = summarize_issues(self._report_issues(area))
+        entry = reports.get_cached_report(area, summary)
+        
+        def events():
+            yield sse_event('meta', {
+                'area': area or 'All Areas',
+                'total_issues_analyzed': summary['total'],
+                'cached': entry is not None,
+            })
+            if entry is not None:
+                yield sse_event('chunk', {'text': entry['report']})
+                yield sse_event('done', {'generated_at': entry['generated_at']})
+                return
+            
+            parts = []
+            try:
+                for text in GeminiService().stream_authority_report(summary):
+                    parts.append(text)
+                    yield sse_event('chunk', {'text': text})
+            except Exception as e:
+                yield sse_event('error', {'error': f'Report generation failed: {str(e)}'})
+                return
+            stored = reports.store_report(area, summary, ''.join(parts))
+            yield sse_event('done', {'generated_at': stored['generated_at']})
+        
+        response = StreamingHttpResponse(exporter.streaming_body(request, events()), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+    
+    def _report_issues(self, area):
+        if area:
+            return areas.filter_by_area(CivicIssue.objects.all(), area)
+        return CivicIssue.objects.all()
+    
     @action(detail=False, methods=['post'])
     def update_all_stats(self, request):
-        """Update statistics for all areas"""
-        
-        areas = CivicIssue.objects.values_list('area', flat=True).distinct()
+        """Reconcile the incrementally maintained statistics of all areas"""
         
-        for area in areas:
-            dashboard, created = AuthorityDashboard.objects.get_or_create(area=area)
-            dashboard.update_statistics()
+        result = reconcile_dashboards()
         
         return Response({
-            'message': f'Updated statistics for {len(areas)} areas',
-            'areas': list(areas)
+            'message': f'Checked {len(result["areas"])} areas, repaired {len(result["drifted"])}',
+            'areas': result['areas'],
+            'drifted': result['drifted'],
         })
 
-class IssueManagementViewSet(viewsets.ModelViewSet):
+def filter_issues(queryset, params):
+    """Apply the issue list filters (status, priority, area, issue_type) from ``params``"""
+    status = params.get('status')
+    priority = params.get('priority')
+    area = params.get('area')
+    issue_type = params.get('issue_type')
+    
+    if status:
+        queryset = queryset.filter(status=status)
+    if priority:
+        queryset = queryset.filter(priority=priority)
+    if area:
+        queryset = areas.filter_by_area(queryset, area)
+    if issue_type:
+        queryset = queryset.filter(issue_type=issue_type)
+    
+    return queryset
+
+class IssueManagementViewSet(FullTextSearchMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """ViewSet for managing issues from authority perspective"""
     
     queryset = CivicIssue.objects.all()
     serializer_class = CivicIssueSerializer
+    pagination_class = IssueCursorPagination
     
     def get_queryset(self):
         """Implement filtering for the issues list"""
         queryset = CivicIssue.objects.all().order_by('-created_at')
+        return filter_issues(queryset, self.request.query_params)
+    
+    def get_renderers(self):
+        if self.action == 'list':
+            return [renderer() for renderer in FAST_RENDERERS]
+        return super().get_renderers()
+    
+    def list(self, request, *args, **kwargs):
+        """Paginated issue list, serialized from values() rows; 304 when unchanged"""
+        queryset = self.filter_queryset(self.get_queryset())
+        return conditional_response(request, queryset, lambda: self._list_response(queryset))
+    
+    def _list_response(self, queryset):
+        serializer = self.get_values_serializer()
+        queryset = serializer.values(queryset)
         
-        status = self.request.query_params.get('status')
-        priority = self.request.query_params.get('priority')
-        area = self.request.query_params.get('area')
-        issue_type = self.request.query_params.get('issue_type')
-        
-        if status:
-            queryset = queryset.filter(status=status)
-        if priority:
-            queryset = queryset.filter(priority=priority)
-        if area:
-            queryset = queryset.filter(area__icontains=area)
-        if issue_type:
-            queryset = queryset.filter(issue_type=issue_type)
-            
-        return queryset
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.to_representation(page))
+        return Response(serializer.to_representation(queryset.iterator(chunk_size=2000)))
+    
+    @action(detail=False, methods=['get'], renderer_classes=FAST_RENDERERS)
+    def sync(self, request):
+        """All issues created, updated or deleted since ``cursor`` (omit it for a full copy)"""
+        try:
+            data = sync.sync_page(
+                request.query_params, CivicIssue.objects.all(), IssueTombstone.objects.all(),
+                self.get_values_serializer()
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(data)
     
     @action(detail=True, methods=['patch'])
     def update_status(self, request, pk=None):
@@ -145,17 +229,88 @@ class IssueManagementViewSet(viewsets.ModelViewSet):
         serializer = IssueUpdateSerializer(issue, data=request.data, partial=True)
         
         if serializer.is_valid():
-            serializer.save()
-            
-            # If resolved, set resolved_at timestamp
-            if request.data.get('status') == 'RESOLVED':
-                issue.resolved_at = datetime.now()
-                issue.save()
+            # Stamp resolved_at in the same save (cleared when reopened)
+            new_status = serializer.validated_data.get('status', issue.status)
+            serializer.save(resolved_at=triage.resolved_at_for(issue, new_status))
             
             return Response(CivicIssueSerializer(issue).data)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=False, methods=['post'])
+    def bulk_triage(self, request):
+        """
+        Change status, priority, assignee and/or notes of many issues at once,
+        selected by ``ids`` or by a ``filter`` like the list parameters.
+        Everything is applied in one transaction; returns a result per issue.
+        """
+        serializer = BulkTriageSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+        changes = {field: data[field] for field in triage.TRIAGE_FIELDS if field in data}
+        
+        ids = data.get('ids')
+        if ids is not None:
+            ids = list(dict.fromkeys(ids))
+            queryset = CivicIssue.objects.filter(pk__in=ids)
+        else:
+            queryset = filter_issues(CivicIssue.objects.all(), data['filter'])
+            if queryset.count() > triage.MAX_BULK_ITEMS:
+                return Response(
+                    {'error': f'Filter matches more than {triage.MAX_BULK_ITEMS} issues'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        results = triage.bulk_triage(queryset, changes, ids)
+        summary = {'updated': 0, 'unchanged': 0, 'not_found': 0}
+        for item in results:
+            summary[item['result']] += 1
+        return Response({**summary, 'results': results})
+    
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_issues(self, request):
+        """
+        Import issues from an uploaded CSV or JSONL ``file``, reported by the
+        requesting user. Rows are validated and inserted in batches; invalid
+        rows are skipped and listed by line. ``dry_run`` only validates.
+        """
+        if not request.user.is_authenticated:
+            return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'Upload a CSV or JSONL file as "file"'}, status=status.HTTP_400_BAD_REQUEST)
+        fmt = request.data.get('format') or importer.format_for(upload.name)
+        if fmt not in importer.FORMATS:
+            return Response({'error': f"format must be one of {', '.join(importer.FORMATS)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            batch_size = int(request.data.get('batch_size', importer.DEFAULT_BATCH_SIZE))
+        except ValueError:
+            return Response({'error': 'batch_size must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+        
+        summary = importer.import_issues(
+            importer.read_rows(importer.open_upload(upload), fmt), request.user,
+            batch_size=batch_size, dry_run=dry_run,
+        )
+        if 'error' in summary:
+            # Rows before the unreadable data were imported; report them too
+            return Response(summary, status=status.HTTP_400_BAD_REQUEST)
+        return Response(summary)
+        
+    @action(detail=False, methods=['get'], renderer_classes=[CSVRenderer, JSONLinesRenderer])
+    def export(self, request):
+        """
+        Stream every issue matching the list filters as CSV (default) or
+        JSONL (``?format=jsonl``), oldest first. ``comment_counts=1`` adds
+        the number of comments per issue.
+        """
+        fmt = request.accepted_renderer.format
+        comment_counts = request.query_params.get('comment_counts', '').lower() in ('1', 'true', 'yes')
+        queryset = filter_issues(CivicIssue.objects.all(), request.query_params)
+        return exporter.streaming_response(request, exporter.chunks(queryset, fmt, comment_counts), fmt)
+    
     @action(detail=True, methods=['post'])
     def add_comment(self, request, pk=None):
         """Add a comment to an issue"""
@@ -194,42 +349,152 @@ class IssueCommentViewSet(viewsets.ModelViewSet):
 
 @api_view(['GET'])
 def analytics_view(request):
-    """Get analytics data for charts and graphs"""
-    
-    # Time-based analytics (last 30 days)
-    thirty_days_ago = datetime.now() - timedelta(days=30)
-    recent_issues = CivicIssue.objects.filter(created_at__gte=thirty_days_ago)
-    
-    # Daily issue count
-    daily_counts = []
-    for i in range(30):
-        date = datetime.now() - timedelta(days=i)
-        count = recent_issues.filter(
-            created_at__date=date.date()
-        ).count()
-        daily_counts.append({
-            'date': date.strftime('%Y-%m-%d'),
-            'count': count
-        })
+    """
+    Get analytics data for charts and graphs, read from the issue rollups.
+    Query params: granularity (hour/day/week/month), start/end (ISO dates)
+    or days (default 30), area, issue_type
+    """
+    
+    granularity = request.query_params.get('granularity', 'day')
+    if granularity not in rollups.GRANULARITIES:
+        return Response(
+            {'error': f'granularity must be one of {", ".join(rollups.GRANULARITIES)}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    filters = {}
+    if request.query_params.get('area'):
+        filters['area'] = areas.canonical_name(request.query_params['area'])
+    if request.query_params.get('issue_type'):
+        filters['issue_type'] = request.query_params['issue_type'].upper()
+    
+    try:
+        end = _parse_moment(request.query_params.get('end'), end_of_day=True) or timezone.now()
+        start = _parse_moment(request.query_params.get('start'))
+        if start is None:
+            days = int(request.query_params.get('days', 30))
+            first_day = timezone.localtime(end).date() - timedelta(days=days - 1)
+            start = timezone.make_aware(datetime.combine(first_day, time.min))
+        series = rollups.time_series(start, end, granularity, **filters)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
     # Status distribution
+    by_status = rollups.distribution('status', **filters)
     status_distribution = {
-        'pending': CivicIssue.objects.filter(status='PENDING').count(),
-        'in_progress': CivicIssue.objects.filter(status='IN_PROGRESS').count(),
-        'resolved': CivicIssue.objects.filter(status='RESOLVED').count(),
-        'rejected': CivicIssue.objects.filter(status='REJECTED').count(),
+        code.lower(): by_status.get(code, 0) for code, _ in CivicIssue.STATUS_CHOICES
     }
     
     # Priority distribution
+    by_priority = rollups.distribution('priority', **filters)
     priority_distribution = {
-        'low': CivicIssue.objects.filter(priority='LOW').count(),
-        'medium': CivicIssue.objects.filter(priority='MEDIUM').count(),
-        'high': CivicIssue.objects.filter(priority='HIGH').count(),
-        'critical': CivicIssue.objects.filter(priority='CRITICAL').count(),
+        code.lower(): by_priority.get(code, 0) for code, _ in CivicIssue.PRIORITY_CHOICES
     }
     
-    return Response({
-        'daily_counts': daily_counts,
+    data = {
+        'granularity': granularity,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'series': [{'bucket': bucket.isoformat(), 'count': count} for bucket, count in series],
         'status_distribution': status_distribution,
         'priority_distribution': priority_distribution,
+    }
+    if granularity == 'day':
+        # Newest first, as the dashboard charts expect
+        data['daily_counts'] = [
+            {'date': bucket.strftime('%Y-%m-%d'), 'count': count}
+            for bucket, count in reversed(series)
+        ]
+    return Response(data)
+
+
+def _parse_moment(value, end_of_day=False):
+    """Parse an ISO date or datetime query parameter into an aware datetime"""
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Invalid date: {value}')
+        moment = datetime.combine(day, time.max if end_of_day else time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+@api_view(['GET'])
+def ai_status_view(request):
+    """Rate limiter, circuit breaker and classification cache state of the AI service"""
+    
+    return Response({
+        **ai_guard.status(get_provider().name),
+        'cache': ai_cache.stats(),
     })
+
+
+# Idle seconds between keepalive comments on the event stream
+EVENT_STREAM_KEEPALIVE = 15
+
+
+async def issue_events_view(request):
+    """
+    Server-sent stream of ``issue.created``, ``issue.status_changed`` and
+    ``comment.added`` events. Filters: ``area``, comma-separated ``priority``.
+    Reconnecting clients resume after ``Last-Event-ID``. Needs ASGI; under
+    WSGI each request returns after the next events (long polling).
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        since = int(last_event_id) if last_event_id else await sync_to_async(events.latest_seq)()
+    except ValueError:
+        return JsonResponse({'error': 'Invalid Last-Event-ID'}, status=400)
+    area = request.GET.get('area')
+    priorities = [p.strip().upper() for p in request.GET.get('priority', '').split(',') if p.strip()]
+    long_poll = 'wsgi.input' in request.META
+    
+    async def stream():
+        subscription = events.hub.subscribe(since, area, priorities)
+        try:
+            yield 'retry: 3000\n\n'
+            # Events committed before the subscription started
+            replay = await sync_to_async(events.events_after)(since)
+            if len(replay) == events.REPLAY_LIMIT:
+                yield sse_event('reset', {'error': 'Too many missed events; reload the data'})
+                return
+            sent = since
+            for message in replay:
+                sent = message['id']
+                if subscription.matches(message):
+                    yield sse_event(message['type'], message, message['id'])
+            if long_poll and replay:
+                return
+            
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscription.queue.get(), EVENT_STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    if long_poll:
+                        return
+                    yield ': keepalive\n\n'
+                    continue
+                if message is events.OVERFLOW:
+                    yield sse_event('reset', {'error': 'Too many events; reload the data'})
+                    return
+                if message['id'] <= sent:
+                    continue  # Already sent from the replay
+                sent = message['id']
+                yield sse_event(message['type'], message, message['id'])
+                if long_poll and subscription.queue.empty():
+                    return
+        finally:
+            events.hub.unsubscribe(subscription)
+    
+    if long_poll:
+        # WSGI can only send a finished body
+        response = HttpResponse(''.join([chunk async for chunk in stream()]), content_type='text/event-stream')
+    else:
+        response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -6,4 +6,6 @@ pip install -r requirements.txt
 
 python manage.py collectstatic --no-input
 python manage.py migrate
+python manage.py createcachetable
+python manage.py reconcile_dashboards
 python manage.py create_superuser_if_none
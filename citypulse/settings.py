@@ -101,6 +101,69 @@ DATABASES = {
 }
 
 
+# Cache
+# The database cache is shared by all gunicorn workers, so invalidating a
+# key on write is seen by every process. Create it with `createcachetable`.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'citypulse_cache',
+    }
+}
+
+
+# AI classification cache (user/ai_cache.py): entries expire after
+# AI_CACHE_TTL seconds; the least recently used are evicted beyond
+# AI_CACHE_MAX_ENTRIES.
+
+AI_CACHE_TTL = int(os.getenv('AI_CACHE_TTL', 30 * 24 * 3600))
+AI_CACHE_MAX_ENTRIES = int(os.getenv('AI_CACHE_MAX_ENTRIES', 10000))
+
+
+# Gemini rate limiter and circuit breaker (user/ai_guard.py), shared by all
+# processes through the AIServiceState table. AI_RATE_LIMIT_RPM=0 disables
+# the limiter. The circuit opens on a 429 or after
+# AI_CIRCUIT_FAILURE_THRESHOLD consecutive errors and lets one probe call
+# through after AI_CIRCUIT_COOLDOWN seconds.
+
+AI_RATE_LIMIT_RPM = int(os.getenv('AI_RATE_LIMIT_RPM', 15))
+AI_RATE_LIMIT_BURST = int(os.getenv('AI_RATE_LIMIT_BURST', 0)) or None
+AI_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('AI_CIRCUIT_FAILURE_THRESHOLD', 5))
+AI_CIRCUIT_COOLDOWN = int(os.getenv('AI_CIRCUIT_COOLDOWN', 60))
+AI_CIRCUIT_PROBE_TIMEOUT = 30
+
+
+# Local classifier (user/local_classifier.py): new issues whose predicted
+# type and priority both reach this probability skip the Gemini call.
+# train_classifier only saves a model whose confident predictions were at
+# least LOCAL_CLASSIFIER_MIN_ACCURACY correct on held-out issues.
+
+LOCAL_CLASSIFIER_THRESHOLD = float(os.getenv('LOCAL_CLASSIFIER_THRESHOLD', 0.9))
+LOCAL_CLASSIFIER_MIN_ACCURACY = float(os.getenv('LOCAL_CLASSIFIER_MIN_ACCURACY', 0.95))
+
+
+# Delta sync (user/sync.py): tombstones of deleted issues are kept this many
+# days by `prune_sync_tombstones`; clients with older cursors resync fully.
+
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.getenv('SYNC_TOMBSTONE_RETENTION_DAYS', 90))
+
+
+# Real-time issue events (user/events.py), streamed at /api/authority/events/
+# when served over ASGI. 'database' fan-out polls the IssueEvent table every
+# ISSUE_EVENTS_POLL_INTERVAL seconds per process and reaches streams on all
+# workers; 'memory' delivers only within the writing process (single node).
+
+ISSUE_EVENTS_FANOUT = os.getenv('ISSUE_EVENTS_FANOUT', 'database')
+ISSUE_EVENTS_POLL_INTERVAL = float(os.getenv('ISSUE_EVENTS_POLL_INTERVAL', 1.0))
+ISSUE_EVENTS_RETENTION = 24 * 3600
+
+
+# Covering indexes (Index.include) are PostgreSQL-only; SQLite builds them
+# without the extra columns, which is fine for development.
+SILENCED_SYSTEM_CHECKS = ['models.W040']
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -151,6 +214,10 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 # API Keys
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+
+# AI backend for GeminiService: 'gemini', 'stub' (offline, deterministic) or
+# a dotted path to an AIProvider subclass (user/ai_providers.py)
+AI_PROVIDER = os.getenv('AI_PROVIDER', 'gemini')
 MAPS_API_KEY = os.getenv('MAPS_API_KEY')
 
 # CORS Settings
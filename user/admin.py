@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import CivicIssue
+from django.utils import timezone
+from .models import Area, AreaAlias, BackgroundJob, CivicIssue
+from . import areas, search
 
 @admin.register(CivicIssue)
 class CivicIssueAdmin(admin.ModelAdmin):
@@ -7,9 +9,9 @@ class CivicIssueAdmin(admin.ModelAdmin):
         'title', 'issue_type', 'area', 'status', 
         'priority', 'reporter_name', 'created_at'
     ]
-    list_filter = ['status', 'issue_type', 'priority', 'area', 'created_at']
+    list_filter = ['status', 'issue_type', 'priority', 'area_ref', 'created_at']
     search_fields = ['title', 'description', 'area', 'reporter_name', 'address']
-    readonly_fields = ['created_at', 'updated_at', 'ai_classification', 'ai_analysis', 'ai_priority']
+    readonly_fields = ['created_at', 'updated_at', 'ai_status', 'ai_source', 'ai_classification', 'ai_analysis', 'ai_priority']
     
     fieldsets = (
         ('Issue Information', {
@@ -25,7 +27,7 @@ class CivicIssueAdmin(admin.ModelAdmin):
             'fields': ('status', 'priority', 'assigned_to')
         }),
         ('AI Analysis', {
-            'fields': ('ai_classification', 'ai_priority', 'ai_analysis'),
+            'fields': ('ai_status', 'ai_source', 'ai_classification', 'ai_priority', 'ai_analysis'),
             'classes': ('collapse',)
         }),
         ('Authority Response', {
@@ -36,3 +38,70 @@ class CivicIssueAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+    
+    def get_search_results(self, request, queryset, search_term):
+        """Use the full-text index instead of LIKE scans over search_fields"""
+        if not search.terms(search_term):
+            return queryset, False
+        return search.matching(queryset, search_term), False
+
+
+class AreaAliasInline(admin.TabularInline):
+    model = AreaAlias
+    fields = ['name', 'key']
+    readonly_fields = ['key']
+    extra = 1
+
+@admin.register(Area)
+class AreaAdmin(admin.ModelAdmin):
+    list_display = ['name', 'city', 'centroid_latitude', 'centroid_longitude', 'created_at']
+    list_filter = ['city']
+    search_fields = ['name', 'aliases__name']
+    readonly_fields = [
+        'centroid_latitude', 'centroid_longitude', 'min_latitude', 'min_longitude',
+        'max_latitude', 'max_longitude', 'created_at',
+    ]
+    inlines = [AreaAliasInline]
+    
+    actions = ['merge_areas', 'refresh_extents']
+    
+    def get_readonly_fields(self, request, obj=None):
+        # Issues carry the name; renaming goes through merge_areas
+        if obj is not None:
+            return ['name', *self.readonly_fields]
+        return self.readonly_fields
+    
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if not change:
+            AreaAlias.objects.create(area=obj, name=obj.name, key=areas.normalize(obj.name))
+    
+    def merge_areas(self, request, queryset):
+        selected = list(queryset.order_by('created_at', 'pk'))
+        if len(selected) < 2:
+            self.message_user(request, "Select at least two areas to merge")
+            return
+        moved = areas.merge(selected[0], selected[1:])
+        self.message_user(request, f"Merged {len(selected) - 1} areas into {selected[0].name}, moving {moved} issues")
+    merge_areas.short_description = "Merge selected areas into the oldest one"
+    
+    def refresh_extents(self, request, queryset):
+        count = areas.refresh_extents(list(queryset.values_list('pk', flat=True)))
+        self.message_user(request, f"Recomputed centroids and bounding boxes of {count} areas")
+    refresh_extents.short_description = "Recompute centroids and bounding boxes"
+
+
+@admin.register(BackgroundJob)
+class BackgroundJobAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'status', 'attempts', 'max_attempts', 'run_after', 'updated_at']
+    list_filter = ['status', 'kind']
+    readonly_fields = ['created_at', 'updated_at', 'locked_by', 'locked_until', 'last_error']
+    
+    actions = ['requeue']
+    
+    def requeue(self, request, queryset):
+        count = queryset.exclude(status='RUNNING').update(
+            status='QUEUED', attempts=0, run_after=timezone.now()
+        )
+        self.message_user(request, f"Requeued {count} jobs")
+    requeue.short_description = "Requeue selected jobs"
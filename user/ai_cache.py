@@ -0,0 +1,129 @@
+import hashlib
+import re
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from .counters import apply_deltas, next_value
+from .models import ClassificationCache, Counter
+
+HIT_COUNTER = 'ai_cache.hits'
+MISS_COUNTER = 'ai_cache.misses'
+EVICTION_COUNTER = 'ai_cache.evictions'
+# Number of cached entries, kept up to date by put() so it never counts the table
+SIZE_COUNTER = 'ai_cache.entries'
+
+
+def _ttl():
+    return timedelta(seconds=getattr(settings, 'AI_CACHE_TTL', 30 * 24 * 3600))
+
+
+def _max_entries():
+    return getattr(settings, 'AI_CACHE_MAX_ENTRIES', 10000)
+
+
+def normalize(text):
+    """Lower-case, drop punctuation and collapse whitespace"""
+    text = re.sub(r'[^\w\s]', ' ', (text or '').lower())
+    return ' '.join(text.split())
+
+
+def cache_key(prompt_version, title, description, address):
+    """Content address of a report: SHA-256 over its normalized fields"""
+    parts = [prompt_version, normalize(title), normalize(description), normalize(address)]
+    return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+def _count(name):
+    apply_deltas(Counter, {(('name', name),): {'value': 1}})
+
+
+def get(key):
+    """Cached result for ``key`` or None. Records the hit/miss."""
+    now = timezone.now()
+    entry = ClassificationCache.objects.filter(key=key, expires_at__gt=now).values('result').first()
+    if entry is None:
+        _count(MISS_COUNTER)
+        return None
+    ClassificationCache.objects.filter(key=key).update(hits=F('hits') + 1, last_used_at=now)
+    _count(HIT_COUNTER)
+    return entry['result']
+
+
+def put(key, prompt_version, result):
+    """Store a result; once the cache outgrows AI_CACHE_MAX_ENTRIES, drop the least recently used"""
+    now = timezone.now()
+    fields = {
+        'prompt_version': prompt_version,
+        'result': result,
+        'last_used_at': now,
+        'expires_at': now + _ttl(),
+    }
+    try:
+        with transaction.atomic():
+            ClassificationCache.objects.create(key=key, **fields)
+    except IntegrityError:
+        # Expired entry or a concurrent writer: refresh it
+        ClassificationCache.objects.filter(key=key).update(**fields)
+        return
+    size = next_value(Counter, SIZE_COUNTER)
+    if size > _max_entries():
+        _trim(size - _max_entries())
+
+
+def _trim(excess):
+    oldest = ClassificationCache.objects.order_by('last_used_at').values_list('id', flat=True)[:excess]
+    removed, _ = ClassificationCache.objects.filter(id__in=list(oldest)).delete()
+    _evicted(removed)
+    return removed
+
+
+def _evicted(removed):
+    if removed:
+        apply_deltas(Counter, {
+            (('name', EVICTION_COUNTER),): {'value': removed},
+            (('name', SIZE_COUNTER),): {'value': -removed},
+        })
+
+
+def evict():
+    """
+    Drop expired entries and trim the cache to AI_CACHE_MAX_ENTRIES, then
+    resynchronize the size counter. put() only trims, so run this on a
+    schedule to clear out expired entries. Returns rows removed.
+    """
+    removed, _ = ClassificationCache.objects.filter(expires_at__lte=timezone.now()).delete()
+    _evicted(removed)
+    excess = ClassificationCache.objects.count() - _max_entries()
+    if excess > 0:
+        removed += _trim(excess)
+    Counter.objects.update_or_create(
+        name=SIZE_COUNTER, defaults={'value': ClassificationCache.objects.count()}
+    )
+    return removed
+
+
+def clear():
+    """Delete every cached classification. Returns rows removed."""
+    removed, _ = ClassificationCache.objects.all().delete()
+    Counter.objects.update_or_create(name=SIZE_COUNTER, defaults={'value': 0})
+    return removed
+
+
+def stats():
+    """Cache size and hit/miss/eviction counters"""
+    counters = dict(
+        Counter.objects.filter(name__in=[HIT_COUNTER, MISS_COUNTER, EVICTION_COUNTER])
+        .values_list('name', 'value')
+    )
+    hits = counters.get(HIT_COUNTER, 0)
+    misses = counters.get(MISS_COUNTER, 0)
+    return {
+        'entries': ClassificationCache.objects.count(),
+        'max_entries': _max_entries(),
+        'hits': hits,
+        'misses': misses,
+        'evictions': counters.get(EVICTION_COUNTER, 0),
+        'hit_rate': round(hits / (hits + misses), 4) if hits + misses else None,
+    }
@@ -0,0 +1,231 @@
+import sys
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import AIServiceState
+
+# Compare-and-swap attempts before a contended token request gives up
+CAS_ATTEMPTS = 5
+
+
+class AIUnavailable(Exception):
+    """Raised instead of calling the model while throttled or the circuit is open"""
+
+    def __init__(self, message, retry_at=None):
+        super().__init__(message)
+        self.retry_at = retry_at
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _rpm():
+    return _setting('AI_RATE_LIMIT_RPM', 15)
+
+
+def _capacity():
+    return _setting('AI_RATE_LIMIT_BURST', None) or _rpm()
+
+
+def _cooldown():
+    return timedelta(seconds=_setting('AI_CIRCUIT_COOLDOWN', 60))
+
+
+def _probe_timeout():
+    return timedelta(seconds=_setting('AI_CIRCUIT_PROBE_TIMEOUT', 30))
+
+
+def is_rate_limit_error(error):
+    """True for quota errors: google-api-core 429s or anything carrying code 429"""
+    # Only consulted when the SDK is loaded, i.e. when it could have raised
+    exceptions = sys.modules.get('google.api_core.exceptions')
+    if exceptions and isinstance(error, (exceptions.ResourceExhausted, exceptions.TooManyRequests)):
+        return True
+    for attr in ('code', 'status_code'):
+        try:
+            if int(getattr(error, attr, 0) or 0) == 429:
+                return True
+        except (TypeError, ValueError):
+            continue
+    return False
+
+
+def _state(name):
+    try:
+        return AIServiceState.objects.get(name=name)
+    except AIServiceState.DoesNotExist:
+        try:
+            with transaction.atomic():
+                return AIServiceState.objects.create(name=name, tokens=_capacity())
+        except IntegrityError:
+            return AIServiceState.objects.get(name=name)
+
+
+def _available(state, now):
+    """Tokens in the bucket at ``now`` after refilling since the last update"""
+    elapsed = max((now - state.refilled_at).total_seconds(), 0)
+    return min(_capacity(), state.tokens + elapsed * _rpm() / 60)
+
+
+def _take_token(name):
+    """Try to take one token. Returns 0 on success, else seconds until one is due."""
+    for _ in range(CAS_ATTEMPTS):
+        state = _state(name)
+        now = timezone.now()
+        tokens = _available(state, now)
+        if tokens < 1:
+            return (1 - tokens) * 60 / _rpm()
+        if AIServiceState.objects.filter(pk=state.pk, version=state.version).update(
+            tokens=tokens - 1, refilled_at=now, version=F('version') + 1
+        ):
+            return 0
+    # Heavy contention: let the caller back off briefly
+    return 0.05
+
+
+def acquire(name, wait=0):
+    """
+    Take a token from the shared bucket of ``name``, sleeping up to ``wait``
+    seconds for one. The bucket is a database row updated by compare-and-swap,
+    so the budget holds across every worker process.
+    Returns: True if a token was taken
+    """
+    if not _rpm():
+        return True
+    deadline = time.monotonic() + wait
+    while True:
+        retry_after = _take_token(name)
+        if not retry_after:
+            return True
+        if time.monotonic() + retry_after > deadline:
+            return False
+        time.sleep(retry_after)
+
+
+def allow(name):
+    """
+    Whether a call may go out. A closed circuit always allows; an open one
+    rejects until the cooldown has passed, then lets exactly one process
+    through as the half-open probe.
+    """
+    state = _state(name)
+    if state.circuit_state == 'CLOSED':
+        return True
+    now = timezone.now()
+    if state.circuit_state == 'OPEN' and now < state.opened_at + _cooldown():
+        return False
+    if (state.circuit_state == 'HALF_OPEN' and state.probe_started_at
+            and now < state.probe_started_at + _probe_timeout()):
+        return False
+    # Take the probe lease; the conditional update lets only one process win
+    return bool(AIServiceState.objects.filter(
+        pk=state.pk,
+        circuit_state=state.circuit_state,
+        probe_started_at=state.probe_started_at,
+    ).update(circuit_state='HALF_OPEN', probe_started_at=now))
+
+
+def record_success(name):
+    """Close the circuit after a successful call"""
+    AIServiceState.objects.filter(name=name).exclude(
+        circuit_state='CLOSED', failures=0
+    ).update(circuit_state='CLOSED', failures=0, opened_at=None, probe_started_at=None)
+
+
+def _open(name, error, **extra):
+    AIServiceState.objects.filter(name=name).update(
+        circuit_state='OPEN', opened_at=timezone.now(), probe_started_at=None,
+        last_error=str(error)[:1000], **extra
+    )
+
+
+def record_failure(name, error):
+    """
+    Count a failed call. A quota error, or any failure of the half-open probe,
+    opens the circuit straight away; other errors open it after
+    AI_CIRCUIT_FAILURE_THRESHOLD consecutive failures.
+    """
+    state = _state(name)
+    if is_rate_limit_error(error):
+        # The provider says the quota is gone: drain the bucket as well
+        _open(name, error, tokens=0, refilled_at=timezone.now(), version=F('version') + 1)
+        return
+    if state.circuit_state == 'HALF_OPEN':
+        _open(name, error)
+        return
+    AIServiceState.objects.filter(pk=state.pk).update(
+        failures=F('failures') + 1, last_error=str(error)[:1000]
+    )
+    threshold = _setting('AI_CIRCUIT_FAILURE_THRESHOLD', 5)
+    if AIServiceState.objects.filter(pk=state.pk, circuit_state='CLOSED', failures__gte=threshold).exists():
+        _open(name, error)
+
+
+def guarded_call(name, func, wait=0):
+    """
+    Run ``func()`` behind the circuit breaker and rate limiter of ``name``.
+    Raises AIUnavailable without calling ``func`` when either rejects the call.
+    """
+    _admit(name, wait)
+    try:
+        result = func()
+    except Exception as e:
+        record_failure(name, e)
+        raise
+    record_success(name)
+    return result
+
+
+def guarded_stream(name, func, wait=0):
+    """
+    Like guarded_call for a ``func()`` that returns a stream: yields its
+    chunks and records the outcome only once the stream has been read to
+    the end, so an error raised mid-stream counts as a failure. A stream
+    the caller abandons records nothing; the probe lease expires instead.
+    """
+    _admit(name, wait)
+    try:
+        yield from func()
+    except Exception as e:
+        record_failure(name, e)
+        raise
+    record_success(name)
+
+
+def _admit(name, wait):
+    if not allow(name):
+        state = _state(name)
+        raise AIUnavailable(f'{name} circuit is open', retry_at=_retry_at(state))
+    if not acquire(name, wait=wait):
+        raise AIUnavailable(f'{name} rate limit of {_rpm()} requests/minute reached')
+
+
+def _retry_at(state):
+    if state.circuit_state == 'OPEN' and state.opened_at:
+        return state.opened_at + _cooldown()
+    return None
+
+
+def status(name):
+    """Limiter and breaker state for monitoring"""
+    state = _state(name)
+    return {
+        'provider': name,
+        'rate_limit': {
+            'requests_per_minute': _rpm(),
+            'burst': _capacity(),
+            'tokens_available': round(_available(state, timezone.now()), 2) if _rpm() else None,
+        },
+        'circuit': {
+            'state': state.circuit_state,
+            'consecutive_failures': state.failures,
+            'failure_threshold': _setting('AI_CIRCUIT_FAILURE_THRESHOLD', 5),
+            'opened_at': state.opened_at,
+            'retry_at': _retry_at(state),
+            'last_error': state.last_error,
+        },
+    }
@@ -0,0 +1,85 @@
+import threading
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from .mock_model import MockGenerativeModel
+
+# Short names accepted by the AI_PROVIDER setting; anything else is a dotted path
+PROVIDERS = {
+    'gemini': 'user.ai_providers.GeminiProvider',
+    'stub': 'user.ai_providers.StubProvider',
+}
+
+
+class AIProvider:
+    """
+    Interface for text-generation backends used by GeminiService.
+    ``generate_content`` mirrors google.generativeai: it returns an object
+    with ``.text``, or an iterable of such chunks when ``stream=True``.
+    """
+
+    # Key of the shared rate-limiter/circuit-breaker state (user/ai_guard.py)
+    name = None
+    # Whether calls go through the rate limiter and circuit breaker
+    guarded = True
+
+    def generate_content(self, prompt, stream=False):
+        raise NotImplementedError
+
+
+class GeminiProvider(AIProvider):
+    """Google Gemini. The SDK is imported and configured on first use only."""
+
+    name = 'gemini'
+    # Using the generic alias to route to the best available Flash model
+    model_name = 'gemini-flash-latest'
+
+    def __init__(self):
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    import warnings
+                    warnings.filterwarnings('ignore', category=FutureWarning)
+                    import google.generativeai as genai
+                    genai.configure(api_key=settings.GEMINI_API_KEY)
+                    self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+
+    def generate_content(self, prompt, stream=False):
+        return self.model.generate_content(prompt, stream=stream)
+
+
+class StubProvider(MockGenerativeModel, AIProvider):
+    """Deterministic offline provider for tests, benchmarks and local development"""
+
+    name = 'stub'
+    guarded = False
+
+
+_providers = {}
+_lock = threading.Lock()
+
+
+def get_provider():
+    """The provider named by settings.AI_PROVIDER, created once per process"""
+    path = getattr(settings, 'AI_PROVIDER', 'gemini')
+    provider = _providers.get(path)
+    if provider is None:
+        with _lock:
+            provider = _providers.get(path)
+            if provider is None:
+                provider = import_string(PROVIDERS.get(path, path))()
+                _providers[path] = provider
+    return provider
+
+
+@receiver(setting_changed)
+def reset_providers(setting, **kwargs):
+    if setting in ('AI_PROVIDER', 'GEMINI_API_KEY'):
+        _providers.clear()
@@ -0,0 +1,158 @@
+import re
+from django.db import IntegrityError, transaction
+from django.db.models import Avg, Max, Min
+from django.utils import timezone
+from .models import Area, AreaAlias, CivicIssue
+
+# Name given to issues filed without a usable area
+UNKNOWN_AREA = 'Unknown Area'
+
+
+def normalize(name):
+    """Lookup key for an area name: case, punctuation and spacing are ignored"""
+    return ' '.join(re.findall(r'\w+', (name or '').casefold()))[:100]
+
+
+def _display(name):
+    return ' '.join((name or '').split())[:100] or UNKNOWN_AREA
+
+
+def _key(name):
+    return normalize(name) or normalize(UNKNOWN_AREA)
+
+
+def assign(issues):
+    """
+    Point ``issues`` at the Area their ``area`` text names, creating areas
+    for new names, and replace the text with the area's canonical name.
+    All names are looked up in one query, so bulk writers call this once
+    per batch before bulk_create().
+    """
+    wanted = {}
+    for issue in issues:
+        wanted.setdefault(_key(issue.area), issue)
+    found = lookup(wanted)
+    for key, issue in wanted.items():
+        if key not in found:
+            found[key] = _create(key, _display(issue.area), issue)
+    for issue in issues:
+        area = found[_key(issue.area)]
+        issue.area_ref, issue.area = area, area.name
+
+
+def lookup(keys):
+    """Areas for normalized ``keys``. Returns: dict of key -> Area"""
+    aliases = AreaAlias.objects.filter(key__in=list(keys)).select_related('area')
+    return {alias.key: alias.area for alias in aliases}
+
+
+def _create(key, name, issue):
+    try:
+        with transaction.atomic():
+            area = Area.objects.create(
+                name=name, city=issue.city or 'Unknown',
+                centroid_latitude=issue.latitude, centroid_longitude=issue.longitude,
+                min_latitude=issue.latitude, min_longitude=issue.longitude,
+                max_latitude=issue.latitude, max_longitude=issue.longitude,
+            )
+            AreaAlias.objects.create(area=area, name=name, key=key)
+        return area
+    except IntegrityError:
+        # Created by a concurrent writer
+        alias = AreaAlias.objects.select_related('area').filter(key=key).first()
+        if alias is None:
+            raise
+        return alias.area
+
+
+def area_ids(text):
+    """
+    Ids of the areas ``text`` refers to: the area with that name or alias,
+    else every area with a name or alias containing it. Only the (small)
+    alias table is searched; issues are then matched on the indexed FK.
+    """
+    key = normalize(text)
+    if not key:
+        return []
+    aliases = AreaAlias.objects.order_by()
+    ids = list(aliases.filter(key=key).values_list('area_id', flat=True))
+    if not ids:
+        ids = list(aliases.filter(key__contains=key).values_list('area_id', flat=True).distinct())
+    return ids
+
+
+def filter_by_area(queryset, text):
+    """Issues of ``queryset`` in the areas ``text`` refers to (see area_ids)"""
+    ids = area_ids(text)
+    if len(ids) == 1:
+        return queryset.filter(area_ref_id=ids[0])
+    return queryset.filter(area_ref_id__in=ids)
+
+
+def canonical_name(text):
+    """Canonical name of the area ``text`` names exactly (or by alias), else ``text``"""
+    alias = AreaAlias.objects.select_related('area').filter(key=normalize(text)).first()
+    return alias.area.name if alias else text
+
+
+def refresh_extents(area_ids=None):
+    """Recompute centroids and bounding boxes from the issues, one grouped query"""
+    issues = CivicIssue.objects.filter(area_ref__isnull=False)
+    areas = Area.objects.all()
+    if area_ids is not None:
+        issues = issues.filter(area_ref_id__in=area_ids)
+        areas = areas.filter(pk__in=area_ids)
+    rows = issues.values('area_ref').annotate(
+        centroid_latitude=Avg('latitude'), centroid_longitude=Avg('longitude'),
+        min_latitude=Min('latitude'), min_longitude=Min('longitude'),
+        max_latitude=Max('latitude'), max_longitude=Max('longitude'),
+    ).order_by()
+    extents = {row.pop('area_ref'): row for row in rows}
+    fields = ['centroid_latitude', 'centroid_longitude', 'min_latitude', 'min_longitude',
+              'max_latitude', 'max_longitude']
+    areas = list(areas)
+    for area in areas:
+        extent = extents.get(area.pk, {})
+        for field in fields:
+            value = extent.get(field)
+            setattr(area, field, None if value is None else round(value, 6))
+    Area.objects.bulk_update(areas, fields, batch_size=500)
+    return len(areas)
+
+
+def merge(target, sources):
+    """
+    Fold the ``sources`` areas (spelling variants) into ``target``: their
+    aliases and issues move over and the issues take its name, in one
+    transaction with one issue_changed signal, so dashboards and rollups
+    stop splitting the area's statistics.
+    Returns: number of issues moved
+    """
+    from .signals import issue_changed
+
+    source_ids = [area.pk for area in sources if area.pk != target.pk]
+    if not source_ids:
+        return 0
+    now = timezone.now()
+    with transaction.atomic():
+        issues = list(
+            CivicIssue.objects.select_for_update().filter(area_ref_id__in=source_ids)
+            .order_by('pk').only(*CivicIssue.TRACKED_FIELDS)
+        )
+        changes = []
+        if issues:
+            for issue in issues:
+                old = issue.tracked_state()
+                issue.area_ref, issue.area, issue.updated_at = target, target.name, now
+                changes.append((old, issue.tracked_state()))
+            issue_changed.send(sender=CivicIssue, changes=changes)
+            last = CivicIssue.reserve_sync_seq(len(issues))
+            for seq, issue in enumerate(issues, start=last - len(issues) + 1):
+                issue.sync_seq = seq
+            CivicIssue.objects.bulk_update(
+                issues, ['area', 'area_ref', 'sync_seq', 'updated_at'], batch_size=500
+            )
+        AreaAlias.objects.filter(area_id__in=source_ids).update(area=target)
+        Area.objects.filter(pk__in=source_ids).delete()
+        refresh_extents([target.pk])
+    return len(issues)
@@ -0,0 +1,102 @@
+from django.core.files.storage import default_storage
+from django.db import transaction
+from .counters import merge_deltas, apply_deltas
+from .geo import tile_xy, tile_range
+from .models import CivicIssue, ClusterCell
+
+# Zoom levels with a materialized cluster index. Coarser requests reuse the
+# lowest level; from POINTS_MIN_ZOOM upwards individual issues are returned.
+CLUSTER_MIN_ZOOM = 3
+CLUSTER_MAX_ZOOM = 15
+POINTS_MIN_ZOOM = CLUSTER_MAX_ZOOM + 1
+
+# Each 256px tile is split into 2**2 x 2**2 cells, i.e. ~64px cluster radius
+CELL_BITS = 2
+
+# Hard cap on individual points returned for one viewport
+MAX_POINTS = 2000
+
+STATUS_COLUMNS = {code: f'{code.lower()}_count' for code, _ in CivicIssue.STATUS_CHOICES}
+PRIORITY_COLUMNS = {code: f'{code.lower()}_count' for code, _ in CivicIssue.PRIORITY_CHOICES}
+
+
+def cell_deltas(state, sign):
+    """(lookup, deltas) pairs adding (sign=1) or removing (sign=-1) an issue snapshot"""
+    if state['latitude'] is None or state['longitude'] is None:
+        return []
+    lat, lng = float(state['latitude']), float(state['longitude'])
+    deltas = {'count': sign, 'sum_lat': sign * lat, 'sum_lng': sign * lng}
+    if state['status'] in STATUS_COLUMNS:
+        deltas[STATUS_COLUMNS[state['status']]] = sign
+    if state['priority'] in PRIORITY_COLUMNS:
+        deltas[PRIORITY_COLUMNS[state['priority']]] = sign
+
+    pairs = []
+    for zoom in range(CLUSTER_MIN_ZOOM, CLUSTER_MAX_ZOOM + 1):
+        x, y = tile_xy(lat, lng, zoom + CELL_BITS)
+        pairs.append(((('zoom', zoom), ('cell_x', x), ('cell_y', y)), deltas))
+    return pairs
+
+
+def apply_changes(changes):
+    """Update the cluster index for a batch of (old_state, new_state) issue changes"""
+    keyed = []
+    for old, new in changes:
+        if old is not None:
+            keyed.extend(cell_deltas(old, -1))
+        if new is not None:
+            keyed.extend(cell_deltas(new, 1))
+    apply_deltas(ClusterCell, merge_deltas(keyed))
+
+
+def rebuild():
+    """Recompute every cluster from CivicIssue. Returns the number of cells written."""
+    rows = CivicIssue.objects.values('latitude', 'longitude', 'status', 'priority')
+    merged = merge_deltas(
+        pair for state in rows.iterator(chunk_size=2000) for pair in cell_deltas(state, 1)
+    )
+    cells = [ClusterCell(**dict(lookup), **deltas) for lookup, deltas in merged.items()]
+    with transaction.atomic():
+        ClusterCell.objects.all().delete()
+        ClusterCell.objects.bulk_create(cells, batch_size=1000)
+    return len(cells)
+
+
+def _cluster_data(cell):
+    return {
+        'lat': round(cell.sum_lat / cell.count, 6),
+        'lng': round(cell.sum_lng / cell.count, 6),
+        'count': cell.count,
+        'status': {code: getattr(cell, column) for code, column in STATUS_COLUMNS.items()},
+        'priority': {code: getattr(cell, column) for code, column in PRIORITY_COLUMNS.items()},
+    }
+
+
+def viewport_clusters(bbox, zoom):
+    """
+    Clusters and/or individual issues for a viewport.
+    Returns: dict with ``clusters`` (below POINTS_MIN_ZOOM) or ``points``
+    """
+    if zoom >= POINTS_MIN_ZOOM:
+        min_lng, min_lat, max_lng, max_lat = bbox
+        points = list(CivicIssue.objects.filter(
+            latitude__range=(min_lat, max_lat),
+            longitude__range=(min_lng, max_lng),
+        ).values(
+            'id', 'title', 'issue_type', 'status', 'priority',
+            'latitude', 'longitude', 'area', 'image_thumbnails',
+        ).order_by('-created_at')[:MAX_POINTS])
+        for point in points:
+            small = (point.pop('image_thumbnails') or {}).get('small')
+            point['thumbnail'] = default_storage.url(small) if small else None
+        return {'clusters': [], 'points': points}
+
+    zoom = max(zoom, CLUSTER_MIN_ZOOM)
+    x0, x1, y0, y1 = tile_range(bbox, zoom + CELL_BITS)
+    cells = ClusterCell.objects.filter(
+        zoom=zoom,
+        cell_x__range=(x0, x1),
+        cell_y__range=(y0, y1),
+        count__gt=0,
+    )
+    return {'clusters': [_cluster_data(cell) for cell in cells], 'points': []}
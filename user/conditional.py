@@ -0,0 +1,40 @@
+import hashlib
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_vary_headers
+
+
+def collection_etag(request, queryset):
+    """
+    Strong ETag for a filtered collection, from one aggregate query:
+    max(updated_at), the row count, and the request URL (with its filter
+    parameters), Accept header and user. Writes bump updated_at and deletes
+    lower the count, so either changes the tag.
+    """
+    version = queryset.order_by().aggregate(last_modified=Max('updated_at'), count=Count('pk'))
+    last_modified = version['last_modified']
+    stamp = '\x1f'.join([
+        request.build_absolute_uri(),
+        request.META.get('HTTP_ACCEPT', ''),
+        str(request.user.pk),
+        last_modified.isoformat() if last_modified else '',
+        str(version['count']),
+    ])
+    return f'"{hashlib.sha256(stamp.encode()).hexdigest()[:32]}"'
+
+
+def conditional_response(request, queryset, build):
+    """
+    Answer 304 when the client's If-None-Match matches the collection ETag;
+    otherwise call ``build()`` for the response. Either way the ETag is
+    attached and the client is told to revalidate.
+    No Last-Modified is sent: deleting an issue does not move the newest
+    updated_at, so a date alone would answer 304 for a changed collection.
+    """
+    etag = collection_etag(request, queryset)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = build()
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    patch_vary_headers(response, ['Accept', 'Cookie'])
+    return response
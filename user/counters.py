@@ -0,0 +1,103 @@
+from collections import defaultdict
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import F
+
+# Delta sets at least this large are written with bulk statements
+BULK_THRESHOLD = 20
+BULK_CHUNK_SIZE = 1000
+
+
+def merge_deltas(keyed_deltas):
+    """
+    Fold an iterable of (lookup, {field: delta}) pairs into one entry per lookup.
+    Lookups are tuples of (field, value) pairs so they can be used as dict keys.
+    Entries whose deltas cancel out are dropped.
+    """
+    merged = defaultdict(lambda: defaultdict(int))
+    for lookup, deltas in keyed_deltas:
+        for field, delta in deltas.items():
+            merged[lookup][field] += delta
+    return {
+        lookup: {field: delta for field, delta in deltas.items() if delta}
+        for lookup, deltas in merged.items()
+        if any(deltas.values())
+    }
+
+
+def apply_deltas(model, deltas, **extra):
+    """
+    Add counter deltas to the rows of ``model`` identified by each lookup,
+    creating missing rows. Increments are added in the database (F()
+    expressions, or ``col = col + %s`` for large batches) so concurrent
+    writers never lose them. ``extra`` values are written alongside every
+    update. The lookup fields must be covered by a unique constraint.
+    Rows are written in sorted lookup order, so two transactions touching
+    the same rows take their locks in the same order and cannot deadlock.
+    """
+    items = sorted(deltas.items(), key=lambda item: _lock_order(item[0]))
+    if len(items) >= BULK_THRESHOLD:
+        for start in range(0, len(items), BULK_CHUNK_SIZE):
+            _apply_many(model, items[start:start + BULK_CHUNK_SIZE], extra)
+        return
+    for lookup, changes in items:
+        lookup = dict(lookup)
+        updates = {field: F(field) + delta for field, delta in changes.items()}
+        updates.update(extra)
+        if model.objects.filter(**lookup).update(**updates):
+            continue
+        try:
+            with transaction.atomic():
+                model.objects.create(**lookup, **changes, **extra)
+        except IntegrityError:
+            # Another writer created the row first; apply on top of theirs
+            model.objects.filter(**lookup).update(**updates)
+
+
+def _lock_order(lookup):
+    # None sorts first instead of failing to compare with the other values
+    return tuple((name, value is not None, value if value is not None else 0) for name, value in lookup)
+
+
+def _apply_many(model, items, extra):
+    """
+    Insert the missing rows with one bulk INSERT (ignoring conflicts), then
+    send the increments as one executemany() UPDATE per set of lookup
+    fields, skipping the per-row query compilation of the ORM path. Fields
+    missing from a row's deltas are added as 0, so the rows of a model
+    are updated in one statement, in the order of ``items``.
+    """
+    model.objects.bulk_create([model(**dict(lookup), **extra) for lookup, _ in items], ignore_conflicts=True)
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    meta = model._meta
+
+    delta_names = sorted({name for _, changes in items for name in changes})
+    shapes = defaultdict(list)
+    for lookup, changes in items:
+        shapes[tuple(name for name, _ in lookup)].append((lookup, changes))
+    extra_fields = [meta.get_field(name) for name in extra]
+    extra_params = [field.get_db_prep_save(extra[field.name], connection) for field in extra_fields]
+    for lookup_names, rows in shapes.items():
+        lookup_fields = [meta.get_field(name) for name in lookup_names]
+        assignments = [f'{quote(meta.get_field(name).column)} = {quote(meta.get_field(name).column)} + %s'
+                       for name in delta_names]
+        assignments += [f'{quote(field.column)} = %s' for field in extra_fields]
+        conditions = ' AND '.join(f'{quote(field.column)} = %s' for field in lookup_fields)
+        sql = f'UPDATE {quote(meta.db_table)} SET {", ".join(assignments)} WHERE {conditions}'
+        params = [
+            [changes.get(name, 0) for name in delta_names] + extra_params
+            + [field.get_db_prep_value(value, connection) for field, (_, value) in zip(lookup_fields, lookup)]
+            for lookup, changes in rows
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, params)
+
+
+def next_value(model, name, count=1):
+    """
+    Add ``count`` to the named counter row of ``model`` and return the new
+    value; the caller owns the ``count`` values ending there. The update
+    holds the row lock until the surrounding transaction commits.
+    """
+    apply_deltas(model, {(('name', name),): {'value': count}})
+    return model.objects.filter(name=name).values_list('value', flat=True).get()
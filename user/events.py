@@ -0,0 +1,193 @@
+import asyncio
+import threading
+import time
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import CivicIssue, IssueEvent
+
+ISSUE_CREATED = 'issue.created'
+STATUS_CHANGED = 'issue.status_changed'
+COMMENT_ADDED = 'comment.added'
+
+# Messages buffered per stream before it is told to resync
+QUEUE_SIZE = 1000
+REPLAY_LIMIT = 1000
+# Sent instead of further messages when a stream's queue overflows
+OVERFLOW = object()
+
+_last_pruned = 0.0
+
+
+def issue_events(changes):
+    """Event dicts for new issues and status changes in issue_changed ``changes``"""
+    events = []
+    for old, new in changes:
+        if new is None:
+            continue
+        if old is not None and old['status'] == new['status']:
+            continue
+        data = {
+            'status': new['status'],
+            'issue_type': new['issue_type'],
+            'latitude': float(new['latitude']),
+            'longitude': float(new['longitude']),
+        }
+        if old is not None:
+            data['old_status'] = old['status']
+        events.append({
+            'kind': ISSUE_CREATED if old is None else STATUS_CHANGED,
+            'issue_id': new['id'], 'area': new['area'], 'priority': new['priority'],
+            'data': data,
+        })
+    return events
+
+
+def comment_event(comment):
+    issue = comment.issue
+    return {
+        'kind': COMMENT_ADDED,
+        'issue_id': issue.pk, 'area': issue.area, 'priority': issue.priority,
+        'data': {
+            'comment_id': comment.pk,
+            'commented_by': comment.commented_by,
+            'comment': comment.comment[:200],
+        },
+    }
+
+
+def publish(events):
+    """
+    Store events in the current transaction. With ISSUE_EVENTS_FANOUT='memory'
+    they are handed to this process's hub on commit; with 'database' every
+    process's poller picks them up from the table.
+    """
+    if not events:
+        return
+    with transaction.atomic():
+        last = CivicIssue.reserve_sync_seq(len(events))
+        rows = IssueEvent.objects.bulk_create([
+            IssueEvent(seq=last - len(events) + i, **event)
+            for i, event in enumerate(events, start=1)
+        ])
+        if settings.ISSUE_EVENTS_FANOUT == 'memory':
+            messages = [to_message(row) for row in rows]
+            transaction.on_commit(lambda: hub.dispatch(messages))
+    _maybe_prune()
+
+
+def to_message(event):
+    return {
+        'id': event.seq, 'type': event.kind, 'issue_id': event.issue_id,
+        'area': event.area, 'priority': event.priority, **event.data,
+    }
+
+
+def events_after(seq, limit=REPLAY_LIMIT):
+    """Stored messages newer than ``seq``, oldest first"""
+    return [to_message(event) for event in IssueEvent.objects.filter(seq__gt=seq).order_by('seq')[:limit]]
+
+
+def latest_seq():
+    return IssueEvent.objects.order_by('-seq').values_list('seq', flat=True).first() or 0
+
+
+def _maybe_prune():
+    """Delete events past ISSUE_EVENTS_RETENTION, at most once a minute per process"""
+    global _last_pruned
+    if time.monotonic() - _last_pruned < 60:
+        return
+    _last_pruned = time.monotonic()
+    cutoff = timezone.now() - timedelta(seconds=settings.ISSUE_EVENTS_RETENTION)
+    IssueEvent.objects.filter(created_at__lt=cutoff).delete()
+
+
+class Subscription:
+    """One open stream: a queue on its event loop and the stream's filters"""
+
+    def __init__(self, loop, area=None, priorities=None):
+        self.loop = loop
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        self.area = (area or '').strip().lower()
+        self.priorities = set(priorities or [])
+        self.overflowed = False
+
+    def matches(self, message):
+        # Substring of the canonical area name, as the REST area filters match names
+        if self.area and self.area not in message['area'].lower():
+            return False
+        return not self.priorities or message['priority'] in self.priorities
+
+    def offer(self, messages):
+        """Runs on the subscription's loop"""
+        for message in messages:
+            if self.overflowed:
+                return
+            if not self.matches(message):
+                continue
+            if self.queue.qsize() >= QUEUE_SIZE - 1:
+                self.overflowed = True
+                message = OVERFLOW
+            self.queue.put_nowait(message)
+
+
+class Hub:
+    """Process-local fan-out from publishers (any thread) to stream subscriptions"""
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._pollers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, since, area=None, priorities=None):
+        """
+        Call from the event loop that will read the subscription's queue.
+        ``since`` is the last event the stream has seen; a poller started for
+        this subscription begins there, so nothing committed meanwhile is lost.
+        """
+        loop = asyncio.get_running_loop()
+        subscription = Subscription(loop, area, priorities)
+        with self._lock:
+            self._subscriptions.add(subscription)
+            if settings.ISSUE_EVENTS_FANOUT == 'database' and loop not in self._pollers:
+                self._pollers[loop] = loop.create_task(self._poll(loop, since))
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Call from the subscription's loop; stops the poller with the last stream"""
+        with self._lock:
+            self._subscriptions.discard(subscription)
+            if any(s.loop is subscription.loop for s in self._subscriptions):
+                return
+            poller = self._pollers.pop(subscription.loop, None)
+        if poller is not None:
+            poller.cancel()
+
+    def dispatch(self, messages, loop=None):
+        """Hand messages to every subscription (on ``loop`` only, if given)"""
+        with self._lock:
+            subscriptions = [s for s in self._subscriptions if loop is None or s.loop is loop]
+        for subscription in subscriptions:
+            if subscription.loop is loop:
+                subscription.offer(messages)
+                continue
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, messages)
+            except RuntimeError:
+                # Its loop has closed
+                with self._lock:
+                    self._subscriptions.discard(subscription)
+
+    async def _poll(self, loop, last):
+        """Database fan-out: one query per interval per process, however many streams are open"""
+        while True:
+            await asyncio.sleep(settings.ISSUE_EVENTS_POLL_INTERVAL)
+            messages = await sync_to_async(events_after)(last)
+            if messages:
+                last = messages[-1]['id']
+                self.dispatch(messages, loop)
+
+
+hub = Hub()
@@ -0,0 +1,108 @@
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+from rest_framework.serializers import ListSerializer
+from . import search
+from .fast_serializers import ValuesSerializer
+
+
+def parse_fieldset(params, available):
+    """
+    Read ``fields``/``exclude`` (comma-separated) from query params.
+    Returns: the selected field names as a tuple, or None for all fields
+    Raises: ValueError on unknown field names or an empty selection
+    """
+    fields = _names(params.get('fields'))
+    exclude = _names(params.get('exclude'))
+    if fields is None and exclude is None:
+        return None
+
+    unknown = [name for name in (fields or []) + (exclude or []) if name not in available]
+    if unknown:
+        raise ValueError(f'Unknown fields: {", ".join(unknown)}')
+    selected = tuple(
+        name for name in available
+        if (fields is None or name in fields) and name not in (exclude or [])
+    )
+    if not selected:
+        raise ValueError('No fields selected')
+    return selected
+
+
+def _names(value):
+    if value is None:
+        return None
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+class SparseFieldsetMixin:
+    """
+    Viewset mixin for ``?fields=id,status,title`` and ``?exclude=description``
+    on GET requests. The selection trims the serializer output and narrows
+    the SELECT with only(), so unused TEXT columns are neither read nor sent.
+    """
+
+    def get_fieldset(self, serializer_class=None):
+        """Selected field names of ``serializer_class`` (default: the action's), or None for all"""
+        if self.request.method not in SAFE_METHODS:
+            return None
+        serializer_class = serializer_class or self.get_serializer_class()
+        available = [
+            name for name, field in serializer_class().fields.items() if not field.write_only
+        ]
+        try:
+            return parse_fieldset(self.request.query_params, available)
+        except ValueError as e:
+            raise ValidationError({'error': str(e)})
+
+    def sparse_queryset(self, queryset, serializer_class=None):
+        """Defer the columns no selected field reads"""
+        serializer_class = serializer_class or self.get_serializer_class()
+        fields = self.get_fieldset(serializer_class)
+        if fields is None:
+            return queryset
+        return queryset.only(*ValuesSerializer(serializer_class, fields=fields).plan.columns)
+
+    def filter_queryset(self, queryset):
+        return self.sparse_queryset(super().filter_queryset(queryset))
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        fields = self.get_fieldset()
+        if fields is not None:
+            target = serializer.child if isinstance(serializer, ListSerializer) else serializer
+            for name in [name for name in target.fields if name not in fields]:
+                target.fields.pop(name)
+        return serializer
+
+    def get_values_serializer(self, serializer_class=None):
+        """ValuesSerializer for the action's serializer, limited to the selected fields"""
+        serializer_class = serializer_class or self.get_serializer_class()
+        return ValuesSerializer(
+            serializer_class,
+            context=self.get_serializer_context(),
+            fields=self.get_fieldset(serializer_class)
+        )
+
+
+class FullTextSearchMixin:
+    """
+    Viewset mixin adding a ``search`` list action: full-text search (``q``)
+    of the issues the view lists, narrowed by its filters, best match first.
+    """
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Full-text search of issues, their notes and comments, best match first"""
+        query = request.query_params.get('q', '')
+        if not search.terms(query):
+            return Response({'error': 'q parameter required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(max(int(request.query_params.get('limit', search.DEFAULT_RESULTS)), 1), search.MAX_RESULTS)
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        issues = search.ranked(self.filter_queryset(self.get_queryset()), query)[:limit]
+        return Response(search.with_ranks(self.get_serializer, issues))
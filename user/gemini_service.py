@@ -1,29 +1,124 @@
-import warnings
-warnings.filterwarnings('ignore', category=FutureWarning)
-import google.generativeai as genai
-from django.conf import settings
+import hashlib
 import json
+from django.db.models import Count, Max
+from .models import CivicIssue
+from . import ai_cache, ai_guard
+from .ai_guard import AIUnavailable
+from .ai_providers import get_provider
+
+# Bump when the classification prompts change so cached answers are not reused
+PROMPT_VERSION = 'classify-v2'
+
+MAX_IMAGE_LABELS = 10
+
+ISSUE_TYPE_CODES = [code for code, _ in CivicIssue.ISSUE_TYPES]
+PRIORITY_CODES = [code for code, _ in CivicIssue.PRIORITY_CHOICES]
+
+
+def strip_code_fence(text):
+    """Remove a markdown code block wrapper around a model response"""
+    text = text.strip()
+    if text.startswith('```json'):
+        text = text[7:]
+    if text.startswith('```'):
+        text = text[3:]
+    if text.endswith('```'):
+        text = text[:-3]
+    return text.strip()
+
+
+def validate_classification(result):
+    """
+    Normalize a model answer against CivicIssue choices.
+    Raises ValueError if the type or priority is not a valid choice.
+    """
+    if not isinstance(result, dict):
+        raise ValueError('Classification is not a JSON object')
+    issue_type = str(result.get('issue_type', '')).upper()
+    priority = str(result.get('priority', '')).upper()
+    if issue_type not in ISSUE_TYPE_CODES:
+        raise ValueError(f'Invalid issue type: {issue_type}')
+    if priority not in PRIORITY_CODES:
+        raise ValueError(f'Invalid priority: {priority}')
+    return {
+        'issue_type': issue_type,
+        'priority': priority,
+        'analysis': result.get('analysis') or 'AI analysis not available'
+    }
+
+
+def summarize_issues(issues_queryset):
+    """
+    Report inputs from one grouped aggregate over (status, issue_type, priority).
+    ``version`` changes whenever any issue in the queryset is added, removed
+    or updated, so it can key a cache of generated reports.
+    """
+    groups = (
+        issues_queryset
+        .values('status', 'issue_type', 'priority')
+        .annotate(count=Count('id'), last_updated=Max('updated_at'))
+        .order_by('status', 'issue_type', 'priority')
+    )
+    
+    summary = {
+        'total': 0, 'pending': 0, 'in_progress': 0, 'resolved': 0,
+        'issue_types': {}, 'priority_breakdown': {},
+    }
+    stamp = hashlib.sha256()
+    for group in groups:
+        count = group['count']
+        summary['total'] += count
+        if group['status'] in ('PENDING', 'IN_PROGRESS', 'RESOLVED'):
+            summary[group['status'].lower()] += count
+        types = summary['issue_types']
+        types[group['issue_type']] = types.get(group['issue_type'], 0) + count
+        priorities = summary['priority_breakdown']
+        priorities[group['priority']] = priorities.get(group['priority'], 0) + count
+        stamp.update(
+            f"{group['status']}|{group['issue_type']}|{group['priority']}|{count}|"
+            f"{group['last_updated'].isoformat()};".encode()
+        )
+    summary['version'] = stamp.hexdigest()[:16]
+    return summary
+
 
 class GeminiService:
-    """Service class for interacting with Gemini API"""
+    """Service class for interacting with the configured AI provider (Gemini by default)"""
     
-    def __init__(self):
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-        # Using the generic alias to route to the best available Flash model
-        self.model = genai.GenerativeModel('gemini-flash-latest')
+    def __init__(self, model=None, use_cache=True, guard=None, rate_limit_wait=0):
+        self.use_cache = use_cache
+        # An injected model (e.g. MockGenerativeModel), else the AI_PROVIDER
+        # provider, whose client is created once per process on first use
+        self.model = model if model is not None else get_provider()
+        # The rate limiter and circuit breaker protect a real quota, so by
+        # default they are skipped for injected models and the stub provider
+        if guard is None:
+            guard = model is None and getattr(self.model, 'guarded', True)
+        self.guard = guard
+        self.provider_name = getattr(self.model, 'name', None) or 'custom'
+        self.rate_limit_wait = rate_limit_wait
     
-    def classify_issue(self, title, description, address):
+    def classify_issue(self, title, description, address, fallback=True):
         """
         Classify the civic issue using Gemini AI
         Returns: dict with issue_type, priority, and analysis
+        With fallback=False errors are raised instead of returning defaults,
+        so callers such as the job queue can retry.
+        Valid answers are stored in the classification cache, which is
+        consulted before calling the model.
         """
+        key = self._cache_key(title, description, address)
+        if key:
+            cached = ai_cache.get(key)
+            if cached is not None:
+                return cached
         
         prompt = f"""
         You are an AI assistant helping to classify civic issues for a city management system.
         
         Analyze the following civic issue report and provide:
-        1. Issue Type (choose one): POTHOLE, ELECTRICITY, WATER, GARBAGE, STREETLIGHT, DRAINAGE, ROAD, OTHER
-        2. Priority Level (choose one): LOW, MEDIUM, HIGH, CRITICAL
+        1. Issue Type (choose one): {', '.join(ISSUE_TYPE_CODES)}
+        2. Priority Level (choose one): {', '.join(PRIORITY_CODES)}
         3. Brief Analysis (2-3 sentences explaining the issue and recommended action)
         
         Issue Details:
@@ -40,31 +135,19 @@ class GeminiService:
         """
         
         try:
-            response = self.model.generate_content(prompt)
-            result_text = response.text.strip()
-            
-            # Remove markdown code blocks if present
-            if result_text.startswith('```json'):
-                result_text = result_text[7:]
-            if result_text.startswith('```'):
-                result_text = result_text[3:]
-            if result_text.endswith('```'):
-                result_text = result_text[:-3]
+            response = self._generate(prompt)
             
-            result_text = result_text.strip()
-            
-            # Parse JSON response
-            result = json.loads(result_text)
-            
-            return {
-                'issue_type': result.get('issue_type', 'OTHER'),
-                'priority': result.get('priority', 'MEDIUM'),
-                'analysis': result.get('analysis', 'AI analysis not available')
-            }
+            # Parse JSON response, removing markdown code blocks if present
+            result = validate_classification(json.loads(strip_code_fence(response.text)))
+            if key:
+                ai_cache.put(key, PROMPT_VERSION, result)
+            return result
         except Exception as e:
+            if not fallback:
+                raise
             error_msg = str(e)
-            if "429" in error_msg:
-                print("Gemini API Quota Exceeded (429)")
+            if isinstance(e, AIUnavailable) or ai_guard.is_rate_limit_error(e):
+                print(f"Gemini API unavailable: {error_msg}")
                 return {
                     'issue_type': 'OTHER',
                     'priority': 'MEDIUM',
@@ -77,39 +160,197 @@ class GeminiService:
                 'analysis': 'AI classification currently unavailable.'
             }
     
-    def generate_authority_report(self, issues_queryset):
+    def classify_issues(self, issues, fallback=True):
         """
-        Generate a summary report for authority dashboard
+        Classify several issues with a single model call.
+        ``issues`` is a list of dicts with id, title, description and address.
+        Items missing from or invalid in the batch response are classified
+        one by one, as is the whole batch if the call itself fails.
+        With fallback=False, items whose single call also fails are left out.
+        Returns: dict mapping issue id to a classify_issue() style result
         """
+        if not issues:
+            return {}
+        
+        results = {}
+        keys = {}
+        if self.use_cache:
+            for issue in issues:
+                key = self._cache_key(issue['title'], issue['description'], issue['address'])
+                cached = ai_cache.get(key)
+                if cached is not None:
+                    results[issue['id']] = cached
+                else:
+                    keys[issue['id']] = key
+        
+        pending = [issue for issue in issues if issue['id'] not in results]
+        if pending:
+            try:
+                answers = self._classify_batch(pending)
+            except Exception as e:
+                print(f"Batch classification failed, falling back to single calls: {str(e)}")
+            else:
+                for issue_id, result in answers.items():
+                    if issue_id in keys:
+                        ai_cache.put(keys[issue_id], PROMPT_VERSION, result)
+                results.update(answers)
         
-        # Prepare issue statistics
-        total_issues = issues_queryset.count()
-        pending_issues = issues_queryset.filter(status='PENDING').count()
-        in_progress_issues = issues_queryset.filter(status='IN_PROGRESS').count()
-        resolved_issues = issues_queryset.filter(status='RESOLVED').count()
+        for issue in pending:
+            if issue['id'] in results:
+                continue
+            try:
+                results[issue['id']] = self.classify_issue(
+                    title=issue['title'],
+                    description=issue['description'],
+                    address=issue['address'],
+                    fallback=fallback
+                )
+            except Exception as e:
+                print(f"Classification of issue {issue['id']} failed: {str(e)}")
+        return results
+    
+    def _generate(self, prompt, stream=False):
+        """
+        Call the model behind the shared rate limiter and circuit breaker.
+        Raises AIUnavailable without calling it while either rejects the call.
+        """
+        if not self.guard:
+            return self.model.generate_content(prompt, stream=stream)
+        if stream:
+            return ai_guard.guarded_stream(
+                self.provider_name, lambda: self.model.generate_content(prompt, stream=True),
+                wait=self.rate_limit_wait
+            )
+        return ai_guard.guarded_call(
+            self.provider_name, lambda: self.model.generate_content(prompt, stream=stream),
+            wait=self.rate_limit_wait
+        )
+    
+    def _cache_key(self, title, description, address):
+        if not self.use_cache:
+            return None
+        return ai_cache.cache_key(PROMPT_VERSION, title, description, address)
+    
+    def _classify_batch(self, issues):
+        """Send one structured prompt for all issues and keep the valid answers"""
+        payload = [
+            {
+                'id': issue['id'],
+                'title': issue['title'],
+                'description': issue['description'],
+                'location': issue['address'],
+            }
+            for issue in issues
+        ]
+        prompt = f"""
+        You are an AI assistant helping to classify civic issues for a city management system.
         
-        # Get issue type breakdown
-        issue_types = {}
-        for issue in issues_queryset:
-            issue_type = issue.issue_type
-            issue_types[issue_type] = issue_types.get(issue_type, 0) + 1
+        For EACH civic issue report in the JSON array below provide:
+        1. Issue Type (choose one): {', '.join(ISSUE_TYPE_CODES)}
+        2. Priority Level (choose one): {', '.join(PRIORITY_CODES)}
+        3. Brief Analysis (2-3 sentences explaining the issue and recommended action)
         
-        # Get priority breakdown
-        priority_breakdown = {}
-        for issue in issues_queryset:
-            priority = issue.priority
-            priority_breakdown[priority] = priority_breakdown.get(priority, 0) + 1
+        ISSUES_JSON:
+        {json.dumps(payload)}
         
+        Respond ONLY with a JSON array containing one object per issue, in this exact format:
+        [
+            {{
+                "id": <the issue id>,
+                "issue_type": "TYPE_HERE",
+                "priority": "PRIORITY_HERE",
+                "analysis": "Your analysis here"
+            }}
+        ]
+        """
+        
+        response = self._generate(prompt)
+        answers = json.loads(strip_code_fence(response.text))
+        if not isinstance(answers, list):
+            raise ValueError('Batch response is not a JSON array')
+        
+        wanted = {issue['id'] for issue in issues}
+        results = {}
+        for answer in answers:
+            if not isinstance(answer, dict):
+                continue
+            answer_id = answer.get('id')
+            if isinstance(answer_id, str) and answer_id.isdigit():
+                answer_id = int(answer_id)
+            if answer_id not in wanted:
+                continue
+            try:
+                results[answer_id] = validate_classification(answer)
+            except ValueError:
+                continue
+        return results
+    
+    def label_image(self, image, description='', fallback=True):
+        """
+        Describe what an issue photo shows. ``image`` is a PIL image.
+        Returns: list of up to MAX_IMAGE_LABELS short lower-case labels
+        (empty on failure unless fallback=False)
+        """
         prompt = f"""
+        You are an AI assistant helping a city management system understand photos of civic issues.
+        
+        List what the photo shows that matters to city staff: the kind of damage or hazard,
+        objects involved (e.g. pothole, garbage bin, water pipe, street light, fallen tree),
+        and conditions such as night, rain or flooding.
+        
+        Report: {description}
+        
+        Respond ONLY with a JSON array of at most {MAX_IMAGE_LABELS} short lower-case labels, e.g.
+        ["pothole", "asphalt road", "daylight"]
+        """
+        
+        try:
+            response = self._generate([prompt, image])
+            labels = json.loads(strip_code_fence(response.text))
+            if not isinstance(labels, list):
+                raise ValueError('Image labels are not a JSON array')
+            labels = [str(label).strip().lower() for label in labels if str(label).strip()]
+            return list(dict.fromkeys(labels))[:MAX_IMAGE_LABELS]
+        except Exception as e:
+            if not fallback:
+                raise
+            print(f"Error in image labelling: {str(e)}")
+            return []
+    
+    def generate_authority_report(self, issues_queryset=None, summary=None, fallback=True):
+        """
+        Generate a summary report for authority dashboard
+        Pass either a queryset or a summarize_issues() result.
+        With fallback=False errors are raised instead of returned as text.
+        """
+        if summary is None:
+            summary = summarize_issues(issues_queryset)
+        
+        try:
+            response = self._generate(self._report_prompt(summary))
+            return response.text
+        except Exception as e:
+            if not fallback:
+                raise
+            return f"Report generation failed: {str(e)}"
+    
+    def stream_authority_report(self, summary):
+        """Yield the report text in chunks as the model produces it"""
+        for chunk in self._generate(self._report_prompt(summary), stream=True):
+            if chunk.text:
+                yield chunk.text
+    
+    def _report_prompt(self, summary):
+        return f"""
         Generate a brief executive summary for city authorities based on the following civic issues data:
         
-        Total Issues: {total_issues}
-        Pending: {pending_issues}
-        In Progress: {in_progress_issues}
-        Resolved: {resolved_issues}
+        Total Issues: {summary['total']}
+        Pending: {summary['pending']}
+        In Progress: {summary['in_progress']}
+        Resolved: {summary['resolved']}
         
-        Issue Types: {json.dumps(issue_types)}
-        Priority Breakdown: {json.dumps(priority_breakdown)}
+        Issue Types: {json.dumps(summary['issue_types'])}
+        Priority Breakdown: {json.dumps(summary['priority_breakdown'])}
         
         Provide:
         1. A brief overview (2-3 sentences)
@@ -118,9 +359,3 @@ class GeminiService:
         
         Keep the response concise and actionable.
         """
-        
-        try:
-            response = self.model.generate_content(prompt)
-            return response.text
-        except Exception as e:
-            return f"Report generation failed: {str(e)}"
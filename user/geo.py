@@ -0,0 +1,143 @@
+import math
+
+# Web mercator cannot represent the poles; tiles are clamped to this latitude
+MAX_MERCATOR_LAT = 85.05112878
+
+
+def parse_bbox(value):
+    """
+    Parse a Leaflet-style ``west,south,east,north`` bounding box string.
+    Returns: (min_lng, min_lat, max_lng, max_lat) as floats
+    """
+    if not value:
+        raise ValueError('bbox parameter required')
+    try:
+        min_lng, min_lat, max_lng, max_lat = (float(part) for part in value.split(','))
+    except ValueError:
+        raise ValueError('bbox must be "west,south,east,north"')
+    if min_lat > max_lat or min_lng > max_lng:
+        raise ValueError('bbox corners are out of order')
+    if not (-90 <= min_lat <= 90 and -90 <= max_lat <= 90):
+        raise ValueError('bbox latitude out of range')
+    return (
+        max(min_lng, -180.0), min_lat,
+        min(max_lng, 180.0), max_lat,
+    )
+
+
+def parse_zoom(value, default=12, max_zoom=20):
+    """Parse a map zoom level, clamped to the range supported by the tiles"""
+    if value in (None, ''):
+        return default
+    return min(max(int(value), 0), max_zoom)
+
+
+def tile_xy(lat, lng, level):
+    """Web-mercator tile coordinates containing (lat, lng) at the given level"""
+    lat = min(max(float(lat), -MAX_MERCATOR_LAT), MAX_MERCATOR_LAT)
+    n = 1 << level
+    x = int((float(lng) + 180.0) / 360.0 * n)
+    lat_rad = math.radians(lat)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_center(x, y, level):
+    """Latitude/longitude of the centre of a tile"""
+    n = 1 << level
+    lng = (x + 0.5) / n * 360.0 - 180.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 0.5) / n))))
+    return lat, lng
+
+
+def tile_range(bbox, level):
+    """Inclusive (x0, x1, y0, y1) tile ranges covering a bbox at the given level"""
+    min_lng, min_lat, max_lng, max_lat = bbox
+    # Tile rows grow southwards, so the north-west corner gives the minimums
+    x0, y0 = tile_xy(max_lat, min_lng, level)
+    x1, y1 = tile_xy(min_lat, max_lng, level)
+    return x0, x1, y0, y1
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Length of the geohash stored on each issue (roughly 1.2m x 0.6m cells)
+GEOHASH_PRECISION = 10
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+# Length of a degree of latitude (and of longitude at the equator)
+_KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def geohash_encode(lat, lng, precision=GEOHASH_PRECISION):
+    """Encode a coordinate as a base32 geohash string"""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    lat, lng = float(lat), float(lng)
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        rng, coord = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        value <<= 1
+        if coord >= mid:
+            value |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = 0
+            value = 0
+    return ''.join(chars)
+
+
+def geohash_cell_size(precision):
+    """Height and width of a geohash cell in degrees: (lat_degrees, lng_degrees)"""
+    lat_bits = (5 * precision) // 2
+    lng_bits = 5 * precision - lat_bits
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def geohash_cell_km(precision, lat):
+    """
+    Smallest side, in km, of the geohash cells in the 3x3 neighbourhood of
+    the cell containing ``lat``. Cells narrow towards the poles, so the
+    width is taken at the poleward edge of the outer row.
+    """
+    lat_deg, lng_deg = geohash_cell_size(precision)
+    south = math.floor((float(lat) + 90.0) / lat_deg) * lat_deg - 90.0
+    poleward = min(max(abs(south - lat_deg), abs(south + 2 * lat_deg)), 90.0)
+    height = lat_deg * _KM_PER_DEGREE
+    width = lng_deg * _KM_PER_DEGREE * math.cos(math.radians(poleward))
+    return min(height, width)
+
+
+def geohash_neighbourhood(lat, lng, precision):
+    """The geohash cell containing (lat, lng) plus its eight neighbours"""
+    lat_deg, lng_deg = geohash_cell_size(precision)
+    lat, lng = float(lat), float(lng)
+    cells = set()
+    for dy in (-1, 0, 1):
+        for dx in (-1, 0, 1):
+            cell_lat = min(max(lat + dy * lat_deg, -90.0), 90.0)
+            cell_lng = (lng + dx * lng_deg + 180.0) % 360.0 - 180.0
+            cells.add(geohash_encode(cell_lat, cell_lng, precision))
+    return sorted(cells)
+
+
+def precision_for_radius(radius_km, lat):
+    """
+    Finest geohash precision whose 3x3 neighbourhood is guaranteed to cover a
+    circle of ``radius_km`` around any point in the centre cell.
+    Returns None when even single-character cells are too small.
+    """
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        if geohash_cell_km(precision, lat) >= radius_km:
+            return precision
+    return None
+
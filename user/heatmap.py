@@ -0,0 +1,89 @@
+from collections import Counter
+from django.db import transaction
+from django.db.models import Sum
+from .counters import merge_deltas, apply_deltas
+from .geo import tile_xy, tile_center, tile_range
+from .models import CivicIssue, HeatmapCell
+
+# Grid resolutions that are materialized. Each level splits the world into
+# 2**level columns/rows, so every other web-mercator zoom level is kept.
+HEATMAP_LEVELS = (5, 7, 9, 11, 13, 15, 17)
+
+# A 256px map tile at zoom z is covered by 2**3 x 2**3 cells (32px each)
+CELL_BITS = 3
+
+
+def level_for_zoom(zoom):
+    """Pick the coarsest materialized level giving at least 32px cells"""
+    wanted = zoom + CELL_BITS
+    for level in HEATMAP_LEVELS:
+        if level >= wanted:
+            return level
+    return HEATMAP_LEVELS[-1]
+
+
+def cell_keys(state):
+    """Grid cell lookups an issue snapshot contributes to, one per level"""
+    if state['latitude'] is None or state['longitude'] is None:
+        return []
+    keys = []
+    for level in HEATMAP_LEVELS:
+        x, y = tile_xy(state['latitude'], state['longitude'], level)
+        keys.append((
+            ('level', level), ('cell_x', x), ('cell_y', y),
+            ('status', state['status']), ('issue_type', state['issue_type']),
+        ))
+    return keys
+
+
+def apply_changes(changes):
+    """Move grid counts for a batch of (old_state, new_state) issue changes"""
+    keyed = []
+    for old, new in changes:
+        for state, sign in ((old, -1), (new, 1)):
+            if state is not None:
+                keyed.extend((key, {'count': sign}) for key in cell_keys(state))
+    apply_deltas(HeatmapCell, merge_deltas(keyed))
+
+
+def rebuild():
+    """Recompute the whole grid from CivicIssue. Returns the number of cells written."""
+    counts = Counter()
+    rows = CivicIssue.objects.values_list('latitude', 'longitude', 'status', 'issue_type')
+    for lat, lng, status, issue_type in rows.iterator(chunk_size=2000):
+        state = {'latitude': lat, 'longitude': lng, 'status': status, 'issue_type': issue_type}
+        for key in cell_keys(state):
+            counts[key] += 1
+
+    cells = [HeatmapCell(**dict(key), count=count) for key, count in counts.items()]
+    with transaction.atomic():
+        HeatmapCell.objects.all().delete()
+        HeatmapCell.objects.bulk_create(cells, batch_size=1000)
+    return len(cells)
+
+
+def heatmap_cells(bbox, zoom, statuses=None, issue_types=None):
+    """
+    Aggregate grid cells inside a bbox for a map zoom level.
+    Returns: (level, list of [lat, lng, weight])
+    """
+    level = level_for_zoom(zoom)
+    x0, x1, y0, y1 = tile_range(bbox, level)
+
+    cells = HeatmapCell.objects.filter(
+        level=level,
+        cell_x__range=(x0, x1),
+        cell_y__range=(y0, y1),
+        count__gt=0,
+    )
+    if statuses:
+        cells = cells.filter(status__in=statuses)
+    if issue_types:
+        cells = cells.filter(issue_type__in=issue_types)
+
+    weights = cells.values('cell_x', 'cell_y').annotate(weight=Sum('count')).order_by()
+    points = []
+    for cell in weights:
+        lat, lng = tile_center(cell['cell_x'], cell['cell_y'], level)
+        points.append([round(lat, 6), round(lng, 6), cell['weight']])
+    return level, points
@@ -0,0 +1,107 @@
+import io
+import os
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps
+
+# Longest edge of each WebP derivative, in pixels
+THUMBNAIL_SIZES = {
+    'small': 160,    # list rows
+    'medium': 480,   # cards, map popups and detail modals
+    'large': 1280,   # full-screen viewing
+}
+WEBP_QUALITY = 80
+
+# Formats re-encoded in place when stripping metadata; anything else becomes JPEG
+KEEP_FORMATS = {'JPEG', 'PNG', 'WEBP'}
+
+
+def _normalize_mode(image):
+    """RGB, or RGBA when the image has transparency"""
+    if image.mode in ('RGB', 'RGBA'):
+        return image
+    if image.mode in ('P', 'LA') or 'transparency' in image.info:
+        return image.convert('RGBA')
+    return image.convert('RGB')
+
+
+def strip_metadata(image):
+    """
+    Apply the EXIF orientation, then return the image re-encoded without
+    EXIF/XMP/ICC-embedded location data.
+    Returns: (bytes, format)
+    """
+    fmt = image.format if image.format in KEEP_FORMATS else 'JPEG'
+    image = _normalize_mode(ImageOps.exif_transpose(image))
+    if fmt == 'JPEG' and image.mode == 'RGBA':
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    # A fresh save writes no metadata unless exif=/icc_profile= are passed
+    image.save(buffer, format=fmt, **({'quality': 90, 'optimize': True} if fmt == 'JPEG' else {}))
+    return buffer.getvalue(), fmt
+
+
+def make_thumbnails(image):
+    """Returns: dict of size name -> WebP bytes"""
+    image = _normalize_mode(ImageOps.exif_transpose(image))
+    thumbnails = {}
+    for name, edge in THUMBNAIL_SIZES.items():
+        copy = image.copy()
+        copy.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        copy.save(buffer, format='WEBP', quality=WEBP_QUALITY, method=4)
+        thumbnails[name] = buffer.getvalue()
+    return thumbnails
+
+
+def process_issue_image(issue):
+    """
+    Strip metadata from an issue's uploaded image in place and store WebP
+    thumbnails next to it under issues/thumbs/. Saves ``image_thumbnails``.
+    Returns: the dict of size name -> storage path
+    """
+    storage = issue.image.storage
+    with storage.open(issue.image.name, 'rb') as f:
+        original = Image.open(f)
+        original.load()
+
+    stripped, fmt = strip_metadata(original)
+    thumbnails = make_thumbnails(original)
+
+    # New files are written under fresh names and the issue is pointed at
+    # them before the old ones are removed (after commit), so a failure at
+    # any step leaves the stored photo in place for the retry
+    old_name, old_thumbnails = issue.image.name, list((issue.image_thumbnails or {}).values())
+    stem, ext = os.path.splitext(old_name)
+    name = old_name
+    if fmt == 'JPEG' and ext.lower() not in ('.jpg', '.jpeg'):
+        name = f'{stem}.jpg'
+    name = storage.save(name, ContentFile(stripped))
+
+    base = os.path.basename(stem)
+    paths = {}
+    for size, data in thumbnails.items():
+        paths[size] = storage.save(f'issues/thumbs/{base}_{size}.webp', ContentFile(data))
+
+    issue.image.name = name
+    issue.image_thumbnails = paths
+    with transaction.atomic():
+        issue.save(update_fields=['image', 'image_thumbnails', 'updated_at'])
+        stale = [path for path in [old_name, *old_thumbnails] if path not in (name, *paths.values())]
+        transaction.on_commit(lambda: _delete(storage, stale))
+    return paths
+
+
+def _delete(storage, paths):
+    for path in paths:
+        storage.delete(path)
+
+
+def label_input(issue, edge=THUMBNAIL_SIZES['medium']):
+    """The medium thumbnail (or a downscaled original) to send for labelling"""
+    path = issue.image_thumbnails.get('medium') or issue.image.name
+    with issue.image.storage.open(path, 'rb') as f:
+        image = Image.open(f)
+        image.load()
+    image.thumbnail((edge, edge))
+    return image
@@ -0,0 +1,128 @@
+import logging
+import random
+import traceback
+from datetime import timedelta
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+# How long a claimed job stays invisible to other workers
+DEFAULT_VISIBILITY_TIMEOUT = timedelta(minutes=5)
+
+# Retry delays grow as BASE * 2**(attempt - 1), capped at MAX
+RETRY_BASE_DELAY = timedelta(seconds=10)
+RETRY_MAX_DELAY = timedelta(minutes=30)
+
+_handlers = {}
+
+
+def job_handler(kind, on_dead=None):
+    """
+    Register a function as the handler for jobs of ``kind``. It is called
+    with the job payload; raising makes the job retry. ``on_dead`` is called
+    with the payload and error text once the job runs out of attempts.
+    """
+    def register(func):
+        _handlers[kind] = (func, on_dead)
+        return func
+    return register
+
+
+def enqueue(kind, payload, delay=None, max_attempts=None):
+    """Add a job to the queue. Returns the BackgroundJob."""
+    fields = {'kind': kind, 'payload': payload}
+    if delay is not None:
+        fields['run_after'] = timezone.now() + delay
+    if max_attempts is not None:
+        fields['max_attempts'] = max_attempts
+    return BackgroundJob.objects.create(**fields)
+
+
+def retry_delay(attempts):
+    """Exponential backoff with jitter for a job that has failed ``attempts`` times"""
+    delay = min(RETRY_BASE_DELAY * (2 ** (attempts - 1)), RETRY_MAX_DELAY)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def _claimable(now):
+    """Jobs ready to run, including ones whose worker let the lock expire"""
+    return (
+        Q(status='QUEUED', run_after__lte=now)
+        | Q(status='RUNNING', locked_until__lt=now)
+    )
+
+
+def claim(worker_id, kinds=None, visibility_timeout=DEFAULT_VISIBILITY_TIMEOUT):
+    """
+    Atomically take the next runnable job. The claim is a conditional UPDATE,
+    so it is safe across processes on both SQLite and PostgreSQL.
+    Returns: the claimed BackgroundJob or None
+    """
+    now = timezone.now()
+    candidates = BackgroundJob.objects.filter(_claimable(now))
+    if kinds:
+        candidates = candidates.filter(kind__in=kinds)
+
+    for job_id in candidates.order_by('run_after', 'id').values_list('id', flat=True)[:10]:
+        claimed = BackgroundJob.objects.filter(_claimable(now), pk=job_id).update(
+            status='RUNNING',
+            locked_by=worker_id,
+            locked_until=now + visibility_timeout,
+            attempts=F('attempts') + 1,
+            updated_at=now,
+        )
+        if claimed:
+            return BackgroundJob.objects.get(pk=job_id)
+    return None
+
+
+def _finish(job, **fields):
+    """Update a job only if this worker still holds its lock"""
+    fields['updated_at'] = timezone.now()
+    return BackgroundJob.objects.filter(
+        pk=job.pk, status='RUNNING', locked_by=job.locked_by
+    ).update(**fields)
+
+
+def run(job):
+    """
+    Execute a claimed job, then mark it done, schedule a retry or dead-letter it.
+    Returns: 'DONE', 'RETRY', 'DEAD', or 'LOST' if another worker took the job over
+    """
+    handler, on_dead = _handlers.get(job.kind, (None, None))
+    try:
+        if handler is None:
+            raise LookupError(f'No handler registered for job kind "{job.kind}"')
+        if job.attempts > job.max_attempts:
+            raise TimeoutError('Visibility timeout expired on the final attempt')
+        handler(job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        if handler is not None and job.attempts < job.max_attempts:
+            delay = retry_delay(job.attempts)
+            if not _finish(job, status='QUEUED', run_after=timezone.now() + delay,
+                           locked_until=None, last_error=error):
+                return 'LOST'
+            logger.warning('Job %s failed (attempt %s), retrying in %s', job, job.attempts, delay)
+            return 'RETRY'
+        if not _finish(job, status='DEAD', locked_until=None, last_error=error):
+            return 'LOST'
+        logger.error('Job %s dead-lettered after %s attempts', job, job.attempts)
+        if on_dead:
+            on_dead(job.payload, error)
+        return 'DEAD'
+
+    if not _finish(job, status='DONE', locked_until=None, last_error=''):
+        return 'LOST'
+    return 'DONE'
+
+
+def requeue_dead(kinds=None):
+    """Move dead-lettered jobs back to the queue with a fresh attempt budget"""
+    jobs = BackgroundJob.objects.filter(status='DEAD')
+    if kinds:
+        jobs = jobs.filter(kind__in=kinds)
+    return jobs.update(status='QUEUED', attempts=0, run_after=timezone.now(),
+                       locked_by='', updated_at=timezone.now())
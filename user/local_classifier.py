@@ -0,0 +1,237 @@
+import math
+import time
+from collections import Counter, defaultdict
+from django.conf import settings
+from .ai_cache import normalize
+from .models import CivicIssue, ClassifierSnapshot
+
+# Fewer labelled issues than this and the classifier is not worth trusting
+MIN_TRAINING_SIZE = 20
+
+# Seconds between checks for a newer snapshot in a long-running process
+RELOAD_INTERVAL = 60
+
+# What the model reads. Titles are generated from the type the reporter
+# picked, so a model trained on them just echoes that choice back.
+INPUTS = 'description'
+
+
+def features(description):
+    """Unigrams and bigrams of the normalized report text"""
+    tokens = normalize(description).split()
+    return tokens + [f'{a} {b}' for a, b in zip(tokens, tokens[1:])]
+
+
+class NaiveBayes:
+    """Multinomial naive Bayes over TF-IDF weighted features"""
+
+    def __init__(self, log_priors, log_probs, log_unseen):
+        self.log_priors = log_priors
+        self.log_probs = log_probs
+        self.log_unseen = log_unseen
+
+    @classmethod
+    def fit(cls, vectors, labels, vocabulary_size, alpha=0.1):
+        counts = Counter(labels)
+        weights = defaultdict(lambda: defaultdict(float))
+        for vector, label in zip(vectors, labels):
+            for term, weight in vector.items():
+                weights[label][term] += weight
+
+        log_priors, log_probs, log_unseen = {}, {}, {}
+        for label, count in counts.items():
+            total = sum(weights[label].values()) + alpha * vocabulary_size
+            log_priors[label] = math.log(count / len(labels))
+            log_probs[label] = {
+                term: math.log((weight + alpha) / total)
+                for term, weight in weights[label].items()
+            }
+            log_unseen[label] = math.log(alpha / total)
+        return cls(log_priors, log_probs, log_unseen)
+
+    def predict(self, vector):
+        """Returns: (label, posterior probability)"""
+        scores = {}
+        for label, log_prior in self.log_priors.items():
+            probs = self.log_probs[label]
+            unseen = self.log_unseen[label]
+            scores[label] = log_prior + sum(
+                weight * probs.get(term, unseen) for term, weight in vector.items()
+            )
+        best = max(scores, key=scores.get)
+        total = sum(math.exp(score - scores[best]) for score in scores.values())
+        return best, 1 / total
+
+    def to_dict(self):
+        return {
+            'log_priors': self.log_priors,
+            'log_probs': self.log_probs,
+            'log_unseen': self.log_unseen,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['log_priors'], data['log_probs'], data['log_unseen'])
+
+
+class LocalClassifier:
+    """
+    Predicts issue type and priority from the reporter's description.
+    Pure Python, so it runs in every web process without extra dependencies.
+    """
+
+    def __init__(self, idf, type_model, priority_model):
+        self.idf = idf
+        self.type_model = type_model
+        self.priority_model = priority_model
+
+    @classmethod
+    def fit(cls, examples):
+        """Train on (description, issue_type, priority) tuples"""
+        documents = [Counter(features(description)) for description, _, _ in examples]
+        document_frequency = Counter(term for document in documents for term in document)
+        n = len(documents)
+        idf = {
+            term: math.log((1 + n) / (1 + df)) + 1
+            for term, df in document_frequency.items()
+        }
+        classifier = cls(idf, None, None)
+        vectors = [classifier._weigh(document) for document in documents]
+        classifier.type_model = NaiveBayes.fit(vectors, [e[1] for e in examples], len(idf))
+        classifier.priority_model = NaiveBayes.fit(vectors, [e[2] for e in examples], len(idf))
+        return classifier
+
+    def _weigh(self, term_counts):
+        """L2-normalized TF-IDF vector; terms outside the vocabulary are dropped"""
+        vector = {
+            term: (1 + math.log(count)) * self.idf[term]
+            for term, count in term_counts.items()
+            if term in self.idf
+        }
+        norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1
+        return {term: weight / norm for term, weight in vector.items()}
+
+    def predict(self, description):
+        """
+        Returns: dict with issue_type, priority, their probabilities, and
+        confidence (the lower of the two)
+        """
+        vector = self._weigh(Counter(features(description)))
+        issue_type, type_confidence = self.type_model.predict(vector)
+        priority, priority_confidence = self.priority_model.predict(vector)
+        return {
+            'issue_type': issue_type,
+            'priority': priority,
+            'type_confidence': round(type_confidence, 4),
+            'priority_confidence': round(priority_confidence, 4),
+            'confidence': round(min(type_confidence, priority_confidence), 4),
+        }
+
+    def to_dict(self):
+        return {
+            'inputs': INPUTS,
+            'idf': self.idf,
+            'issue_type': self.type_model.to_dict(),
+            'priority': self.priority_model.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data['idf'],
+            NaiveBayes.from_dict(data['issue_type']),
+            NaiveBayes.from_dict(data['priority']),
+        )
+
+
+def threshold():
+    return getattr(settings, 'LOCAL_CLASSIFIER_THRESHOLD', 0.9)
+
+
+def training_examples(labels='ai'):
+    """
+    Labelled issues as (description, issue_type, priority) tuples.
+    ``labels='ai'`` uses Gemini's answers; ``'final'`` uses the current
+    type and priority, including corrections made by authorities.
+    """
+    issues = CivicIssue.objects.order_by('id')
+    if labels == 'ai':
+        rows = (
+            issues.filter(ai_source='GEMINI', ai_classification__isnull=False, ai_priority__isnull=False)
+            .exclude(ai_classification='').exclude(ai_priority='')
+            .values_list('description', 'ai_classification', 'ai_priority')
+        )
+    else:
+        rows = issues.values_list('description', 'issue_type', 'priority')
+    return list(rows.iterator(chunk_size=2000))
+
+
+def evaluate(classifier, examples, confidence_threshold=None):
+    """Accuracy, confident-prediction coverage and latency on held-out examples"""
+    if confidence_threshold is None:
+        confidence_threshold = threshold()
+    type_hits = priority_hits = confident = confident_hits = 0
+    latencies = []
+    for description, issue_type, priority in examples:
+        started = time.perf_counter()
+        prediction = classifier.predict(description)
+        latencies.append(time.perf_counter() - started)
+        type_ok = prediction['issue_type'] == issue_type
+        priority_ok = prediction['priority'] == priority
+        type_hits += type_ok
+        priority_hits += priority_ok
+        if prediction['confidence'] >= confidence_threshold:
+            confident += 1
+            confident_hits += type_ok and priority_ok
+
+    n = len(examples) or 1
+    latencies.sort()
+    return {
+        'examples': len(examples),
+        'type_accuracy': round(type_hits / n, 4),
+        'priority_accuracy': round(priority_hits / n, 4),
+        'threshold': confidence_threshold,
+        'coverage': round(confident / n, 4),
+        'confident_accuracy': round(confident_hits / confident, 4) if confident else None,
+        'mean_latency_ms': round(sum(latencies) / n * 1000, 4),
+        'p95_latency_ms': round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 4) if latencies else None,
+    }
+
+
+def save(classifier, labels, training_size, metrics):
+    """Store a trained classifier; every process picks it up on its next reload check"""
+    return ClassifierSnapshot.objects.create(
+        labels=labels,
+        training_size=training_size,
+        metrics=metrics,
+        model=classifier.to_dict(),
+    )
+
+
+_loaded = {'id': None, 'classifier': None, 'checked': None}
+
+
+def load(refresh=False):
+    """
+    The latest trained classifier, cached per process, or None. Snapshots
+    trained on other inputs (the generated titles) are not used.
+    """
+    now = time.monotonic()
+    if not refresh and _loaded['checked'] is not None and now - _loaded['checked'] < RELOAD_INTERVAL:
+        return _loaded['classifier']
+    _loaded['checked'] = now
+    latest = ClassifierSnapshot.objects.order_by('-id').values_list('id', flat=True).first()
+    if latest != _loaded['id']:
+        snapshot = ClassifierSnapshot.objects.filter(pk=latest).values_list('model', flat=True).first()
+        usable = snapshot and snapshot.get('inputs') == INPUTS
+        _loaded['classifier'] = LocalClassifier.from_dict(snapshot) if usable else None
+        _loaded['id'] = latest
+    return _loaded['classifier']
+
+
+def predict(description):
+    """Local prediction for a report, or None if no classifier has been trained"""
+    classifier = load()
+    if classifier is None:
+        return None
+    return classifier.predict(description)
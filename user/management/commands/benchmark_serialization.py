@@ -0,0 +1,61 @@
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from user import areas
+from user.fast_serializers import ValuesSerializer
+from user.models import CivicIssue
+from user.renderers import FastJSONRenderer
+from user.serializers import CivicIssueListSerializer, CivicIssueSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compare rows/sec of ModelSerializer + JSONRenderer against the values() fast path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000,
+                            help='Synthetic issues to add (rolled back afterwards) if the table has fewer')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per variant; the best is reported')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self._fill(options['rows'])
+            queryset = CivicIssue.objects.order_by('id')
+            rows = queryset.count()
+            for serializer_class in (CivicIssueListSerializer, CivicIssueSerializer):
+                slow = self._best(options['repeat'], lambda: JSONRenderer().render(
+                    serializer_class(queryset, many=True).data))
+                fast = self._best(options['repeat'], lambda: FastJSONRenderer().render(
+                    ValuesSerializer(serializer_class).serialize(queryset)))
+                self.stdout.write(
+                    f'{serializer_class.__name__} ({rows} rows): '
+                    f'ModelSerializer {rows / slow:,.0f} rows/s, '
+                    f'values() {rows / fast:,.0f} rows/s ({slow / fast:.1f}x)'
+                )
+            transaction.set_rollback(True)
+
+    def _best(self, repeat, func):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
+
+    def _fill(self, rows):
+        missing = rows - CivicIssue.objects.count()
+        if missing <= 0:
+            return
+        user, _ = User.objects.get_or_create(username='benchmark')
+        issues = [
+            CivicIssue(
+                title=f'Benchmark issue {i}', description='Synthetic issue for benchmarking',
+                issue_type='POTHOLE', latitude=28.5 + i * 1e-5, longitude=77.1 + i * 1e-5,
+                address='Main Road', area='Saket', reported_by=user,
+                reporter_name='Benchmark', reporter_phone='0000000000',
+            )
+            for i in range(missing)
+        ]
+        areas.assign(issues)
+        CivicIssue.objects.bulk_create(issues, batch_size=1000)
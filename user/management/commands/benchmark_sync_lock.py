@@ -0,0 +1,84 @@
+import statistics
+import threading
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, transaction
+from user.models import Counter, CivicIssue
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure how long write transactions hold the global sync sequence row lock, '
+        'with several threads saving issues at once. Writes and then deletes real rows: '
+        'run it against a scratch database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4, help='Concurrent writers')
+        parser.add_argument('--writes', type=int, default=200, help='Status changes per writer')
+
+    def handle(self, *args, **options):
+        user, _ = User.objects.get_or_create(username='benchmark')
+        issues = [
+            CivicIssue.objects.create(
+                title=f'Benchmark issue {i}', description='Synthetic issue for benchmarking',
+                issue_type='POTHOLE', latitude=28.5 + i * 1e-4, longitude=77.1 + i * 1e-4,
+                address='Main Road', area=f'Benchmark Area {i % 5}', reported_by=user,
+                reporter_name='Benchmark', reporter_phone='0000000000',
+            )
+            for i in range(options['threads'])
+        ]
+        held, total, failed = [], [], []
+        writers = [
+            threading.Thread(target=self._write, args=(issue.pk, options['writes'], held, total, failed))
+            for issue in issues
+        ]
+        started = time.perf_counter()
+        for writer in writers:
+            writer.start()
+        for writer in writers:
+            writer.join()
+        elapsed = time.perf_counter() - started
+        for issue in issues:
+            issue.delete()
+
+        def ms(values, q):
+            return statistics.quantiles(values, n=100)[q - 1] * 1000
+
+        self.stdout.write(
+            f'{len(total)} writes from {len(writers)} threads in {elapsed:.1f}s '
+            f'({len(total) / elapsed:,.0f} writes/s, {len(failed)} failed with a lock error)\n'
+            f'transaction: p50 {ms(total, 50):.2f} ms, p95 {ms(total, 95):.2f} ms\n'
+            f'sequence lock held: p50 {ms(held, 50):.2f} ms, p95 {ms(held, 95):.2f} ms '
+            f'({sum(held) / sum(total):.0%} of transaction time)'
+        )
+
+    def _write(self, pk, writes, held, total, failed):
+        counter_table = Counter._meta.db_table
+        reserved = []
+
+        def note_reservation(execute, sql, params, many, context):
+            if counter_table in sql and not reserved:
+                reserved.append(time.perf_counter())
+            return execute(sql, params, many, context)
+
+        try:
+            with connection.execute_wrapper(note_reservation):
+                for i in range(writes):
+                    reserved.clear()
+                    issue = CivicIssue.objects.get(pk=pk)
+                    issue.status = ('PENDING', 'IN_PROGRESS', 'RESOLVED')[i % 3]
+                    started = time.perf_counter()
+                    try:
+                        with transaction.atomic():
+                            issue.save()
+                    except OperationalError:
+                        # SQLite gives up on a busy database after its timeout
+                        failed.append(pk)
+                        continue
+                    committed = time.perf_counter()
+                    total.append(committed - started)
+                    held.append(committed - reserved[0])
+        finally:
+            connection.close()
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from user import ai_cache
+
+
+class Command(BaseCommand):
+    help = 'Show AI classification cache statistics, evict stale entries or clear the cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--evict', action='store_true', help='Drop expired and least recently used entries')
+        parser.add_argument('--clear', action='store_true', help='Delete every cached classification')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            self.stdout.write(self.style.SUCCESS(f'Cleared {ai_cache.clear()} cached classifications'))
+        elif options['evict']:
+            self.stdout.write(self.style.SUCCESS(f'Evicted {ai_cache.evict()} cached classifications'))
+
+        stats = ai_cache.stats()
+        hit_rate = 'n/a' if stats['hit_rate'] is None else f"{stats['hit_rate']:.1%}"
+        self.stdout.write(
+            f"Entries: {stats['entries']}/{stats['max_entries']}  "
+            f"Hits: {stats['hits']}  Misses: {stats['misses']}  "
+            f"Evictions: {stats['evictions']}  Hit rate: {hit_rate}"
+        )
@@ -0,0 +1,73 @@
+import time
+from django.core.management.base import BaseCommand
+from user import areas
+from user.gemini_service import GeminiService
+from user.mock_model import MockGenerativeModel
+from user.models import CivicIssue
+from user.tasks import apply_classification
+
+
+class Command(BaseCommand):
+    help = 'Classify (or re-classify) a filtered backlog of issues with batched AI calls'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Re-classify issues that already have an AI classification')
+        parser.add_argument('--status', help='Only issues with this status')
+        parser.add_argument('--area', help='Only issues in this area (a name, an alias or part of one)')
+        parser.add_argument('--issue-type', help='Only issues of this type')
+        parser.add_argument('--limit', type=int, help='Classify at most this many issues')
+        parser.add_argument('--batch-size', type=int, default=20, help='Issues per model call')
+        parser.add_argument('--mock', action='store_true',
+                            help='Use the offline mock model instead of Gemini')
+        parser.add_argument('--mock-latency', type=float, default=0.0,
+                            help='Simulated seconds per mock model call')
+        parser.add_argument('--dry-run', action='store_true', help='Classify but do not save')
+
+    def handle(self, *args, **options):
+        issues = CivicIssue.objects.order_by('id')
+        if not options['all']:
+            issues = issues.exclude(ai_status='DONE')
+        if options['status']:
+            issues = issues.filter(status=options['status'].upper())
+        if options['area']:
+            issues = areas.filter_by_area(issues, options['area'])
+        if options['issue_type']:
+            issues = issues.filter(issue_type=options['issue_type'].upper())
+        if options['limit']:
+            issues = issues[:options['limit']]
+        issues = list(issues)
+
+        model = MockGenerativeModel(latency=options['mock_latency']) if options['mock'] else None
+        # Pace real calls to the shared requests-per-minute budget
+        service = GeminiService(model=model, rate_limit_wait=60)
+        batch_size = max(options['batch_size'], 1)
+        self.stdout.write(f'Classifying {len(issues)} issues in batches of {batch_size}...')
+
+        failed = 0
+        started = time.perf_counter()
+        for offset in range(0, len(issues), batch_size):
+            batch = issues[offset:offset + batch_size]
+            results = service.classify_issues([
+                {'id': issue.id, 'title': issue.title,
+                 'description': issue.description, 'address': issue.address}
+                for issue in batch
+            ], fallback=False)
+            failed += len(batch) - len(results)
+            if options['dry_run']:
+                continue
+            for issue in batch:
+                if issue.id in results:
+                    apply_classification(issue, results[issue.id])
+                    issue.ai_status = 'DONE'
+                    issue.save()
+        elapsed = time.perf_counter() - started
+
+        summary = f'Processed {len(issues)} issues in {elapsed:.2f}s'
+        if issues:
+            summary += f' ({len(issues) / elapsed:.1f} issues/s)'
+        if model is not None:
+            summary += f' using {model.calls} model calls'
+        self.stdout.write(self.style.SUCCESS(summary))
+        if failed:
+            self.stdout.write(self.style.WARNING(f'{failed} issues could not be classified and were left unchanged'))
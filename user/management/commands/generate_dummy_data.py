@@ -93,6 +93,7 @@ class Command(BaseCommand):
                 created_at=created_at,
                 ai_classification=issue_type,
                 ai_priority=priority,
+                ai_source='GEMINI',
                 ai_analysis=f"AI Analysis: {priority} priority {issue_type_names[issue_type]} issue."
             )
             
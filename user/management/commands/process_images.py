@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from user import images
+from user.jobs import enqueue
+from user.models import CivicIssue
+from user.tasks import enqueue_image_processing
+
+
+class Command(BaseCommand):
+    help = 'Strip metadata from uploaded issue photos, build WebP thumbnails and queue labelling'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Reprocess images that already have thumbnails')
+        parser.add_argument('--now', action='store_true',
+                            help='Process in this process instead of queueing jobs for the worker')
+
+    def handle(self, *args, **options):
+        issues = CivicIssue.objects.exclude(image='').exclude(image__isnull=True).order_by('id')
+        if not options['all']:
+            issues = issues.filter(image_thumbnails={})
+
+        count = 0
+        for issue in issues.iterator(chunk_size=200):
+            if options['now']:
+                try:
+                    images.process_issue_image(issue)
+                except Exception as e:
+                    self.stderr.write(self.style.WARNING(f'Issue {issue.pk}: {e}'))
+                    continue
+                enqueue('label_image', {'issue_id': issue.pk})
+            else:
+                enqueue_image_processing(issue)
+            count += 1
+
+        verb = 'Processed' if options['now'] else 'Queued'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {count} images'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from user import sync
+
+
+class Command(BaseCommand):
+    help = 'Delete old delta-sync tombstones; clients with older cursors get a full resync'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Keep tombstones this many days (default SYNC_TOMBSTONE_RETENTION_DAYS)')
+
+    def handle(self, *args, **options):
+        deleted = sync.prune_tombstones(options['days'])
+        self.stdout.write(self.style.SUCCESS(f'Pruned {deleted} tombstones'))
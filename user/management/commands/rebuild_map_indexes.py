@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from user import clusters, heatmap
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the precomputed heatmap grid and marker cluster index from all civic issues'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding heatmap grid...')
+        cells = heatmap.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Wrote {cells} heatmap cells'))
+
+        self.stdout.write('Rebuilding cluster index...')
+        cells = clusters.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Wrote {cells} cluster cells'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from user import search
+from user.models import CivicIssue
+
+
+class Command(BaseCommand):
+    help = 'Create the full-text search index and its triggers if missing, and re-index all civic issues'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding search index...')
+        search.install()
+        search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {CivicIssue.objects.count()} issues'))
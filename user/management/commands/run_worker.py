@@ -0,0 +1,52 @@
+import os
+import signal
+import socket
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from user import jobs
+
+
+class Command(BaseCommand):
+    help = 'Process background jobs (AI classification, ...) from the database queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+        parser.add_argument('--kind', action='append', help='Only run jobs of this kind (repeatable)')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Seconds to sleep when no job is ready')
+        parser.add_argument('--visibility-timeout', type=int,
+                            default=int(jobs.DEFAULT_VISIBILITY_TIMEOUT.total_seconds()),
+                            help='Seconds a claimed job stays hidden from other workers')
+        parser.add_argument('--requeue-dead', action='store_true',
+                            help='Move dead-lettered jobs back to the queue before starting')
+
+    def handle(self, *args, **options):
+        worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        visibility_timeout = timedelta(seconds=options['visibility_timeout'])
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        if options['requeue_dead']:
+            count = jobs.requeue_dead(options['kind'])
+            self.stdout.write(f'Requeued {count} dead jobs')
+
+        self.stdout.write(f'Worker {worker_id} started')
+        processed = 0
+        while not self.stopping:
+            job = jobs.claim(worker_id, options['kind'], visibility_timeout)
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+            outcome = jobs.run(job)
+            processed += 1
+            self.stdout.write(f'{job.kind} #{job.pk}: {outcome}')
+
+        self.stdout.write(self.style.SUCCESS(f'Worker stopped after {processed} jobs'))
+
+    def stop(self, signum, frame):
+        # Finish the current job, then exit the loop
+        self.stopping = True
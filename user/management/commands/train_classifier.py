@@ -0,0 +1,83 @@
+import random
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from user import local_classifier
+from user.ai_cache import normalize
+from user.local_classifier import LocalClassifier
+
+
+class Command(BaseCommand):
+    help = 'Train the local issue classifier on labelled issues and benchmark it on a held-out split'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--labels', choices=['ai', 'final'], default='ai',
+                            help="Train on Gemini's answers (ai) or current type/priority (final)")
+        parser.add_argument('--holdout', type=float, default=0.2,
+                            help='Fraction of issues held out for the benchmark')
+        parser.add_argument('--threshold', type=float,
+                            help='Confidence threshold to benchmark (default LOCAL_CLASSIFIER_THRESHOLD)')
+        parser.add_argument('--min-accuracy', type=float,
+                            help='Held-out accuracy the confident predictions need before the model '
+                                 'is saved (default LOCAL_CLASSIFIER_MIN_ACCURACY)')
+        parser.add_argument('--seed', type=int, default=42, help='Shuffle seed for the split')
+        parser.add_argument('--dry-run', action='store_true', help='Benchmark only, do not save')
+
+    def handle(self, *args, **options):
+        examples = local_classifier.training_examples(options['labels'])
+        if len(examples) < local_classifier.MIN_TRAINING_SIZE:
+            raise CommandError(
+                f'Only {len(examples)} labelled issues; need at least {local_classifier.MIN_TRAINING_SIZE}'
+            )
+
+        held_out, training = self._split(examples, options['holdout'], options['seed'])
+
+        classifier = LocalClassifier.fit(training)
+        metrics = local_classifier.evaluate(classifier, held_out, options['threshold'])
+        self.stdout.write(f'Trained on {len(training)} issues, evaluated on {len(held_out)} held out:')
+        self.stdout.write(
+            f"  type accuracy {metrics['type_accuracy']:.1%}, "
+            f"priority accuracy {metrics['priority_accuracy']:.1%}"
+        )
+        confident_accuracy = metrics['confident_accuracy']
+        self.stdout.write(
+            f"  {metrics['coverage']:.1%} confident at >= {metrics['threshold']} "
+            f"(both correct: {'n/a' if confident_accuracy is None else f'{confident_accuracy:.1%}'})"
+        )
+        self.stdout.write(
+            f"  latency {metrics['mean_latency_ms']:.3f} ms mean, {metrics['p95_latency_ms']:.3f} ms p95"
+        )
+
+        if options['dry_run']:
+            return
+        min_accuracy = options['min_accuracy']
+        if min_accuracy is None:
+            min_accuracy = getattr(settings, 'LOCAL_CLASSIFIER_MIN_ACCURACY', 0.95)
+        # Confident predictions skip Gemini, so they must have earned it on held-out issues
+        if (confident_accuracy or 0) < min_accuracy:
+            raise CommandError(
+                f'Confident predictions need {min_accuracy:.0%} held-out accuracy; not saved. '
+                f'Raise the threshold or label more issues.'
+            )
+
+        # The saved model uses every example; the metrics come from the split above
+        snapshot = local_classifier.save(
+            LocalClassifier.fit(examples), options['labels'], len(examples), metrics
+        )
+        self.stdout.write(self.style.SUCCESS(f'Saved {snapshot}'))
+
+    def _split(self, examples, holdout, seed):
+        """
+        Held-out and training examples. Reports with the same text stay on
+        one side, so repeated reports cannot inflate the held-out accuracy.
+        """
+        groups = {}
+        for example in examples:
+            groups.setdefault(normalize(example[0]), []).append(example)
+        groups = list(groups.values())
+        random.Random(seed).shuffle(groups)
+        held_out, training = [], []
+        for group in groups:
+            (held_out if len(held_out) < len(examples) * holdout else training).extend(group)
+        if not held_out or not training:
+            raise CommandError('Not enough distinct reports to hold some out')
+        return held_out, training
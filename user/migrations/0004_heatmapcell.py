@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:50
+
+import math
+from collections import Counter
+from django.db import migrations, models
+
+# Frozen copies of user.heatmap / user.geo as of this migration, so later
+# changes to the live grid do not change what this backfill writes
+HEATMAP_LEVELS = (5, 7, 9, 11, 13, 15, 17)
+MAX_MERCATOR_LAT = 85.05112878
+
+
+def tile_xy(lat, lng, level):
+    lat = min(max(float(lat), -MAX_MERCATOR_LAT), MAX_MERCATOR_LAT)
+    n = 1 << level
+    x = int((float(lng) + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def cell_keys(state):
+    if state['latitude'] is None or state['longitude'] is None:
+        return []
+    keys = []
+    for level in HEATMAP_LEVELS:
+        x, y = tile_xy(state['latitude'], state['longitude'], level)
+        keys.append((
+            ('level', level), ('cell_x', x), ('cell_y', y),
+            ('status', state['status']), ('issue_type', state['issue_type']),
+        ))
+    return keys
+
+
+def backfill_heatmap(apps, schema_editor):
+    CivicIssue = apps.get_model('user', 'CivicIssue')
+    HeatmapCell = apps.get_model('user', 'HeatmapCell')
+    counts = Counter()
+    rows = CivicIssue.objects.values('latitude', 'longitude', 'status', 'issue_type')
+    for state in rows.iterator(chunk_size=2000):
+        for key in cell_keys(state):
+            counts[key] += 1
+    HeatmapCell.objects.bulk_create(
+        [HeatmapCell(**dict(key), count=count) for key, count in counts.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0003_civicissue_image_labels_alter_civicissue_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HeatmapCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.PositiveSmallIntegerField()),
+                ('cell_x', models.IntegerField()),
+                ('cell_y', models.IntegerField()),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('IN_PROGRESS', 'In Progress'), ('RESOLVED', 'Resolved'), ('REJECTED', 'Rejected')], max_length=20)),
+                ('issue_type', models.CharField(choices=[('POTHOLE', 'Potholes'), ('GARBAGE', 'Garbage overflow'), ('WATER', 'Water leakage'), ('STREETLIGHT', 'Broken streetlights'), ('ROAD_OBSTRUCTION', 'Road obstruction')], max_length=20)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('level', 'cell_x', 'cell_y', 'status', 'issue_type'), name='unique_heatmap_cell')],
+            },
+        ),
+        migrations.RunPython(backfill_heatmap, migrations.RunPython.noop),
+    ]
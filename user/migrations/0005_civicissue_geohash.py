@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Frozen copy of user.geo.geohash_encode as of this migration
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def geohash_encode(lat, lng, precision=10):
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    lat, lng = float(lat), float(lng)
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        rng, coord = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        value <<= 1
+        if coord >= mid:
+            value |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = 0
+            value = 0
+    return ''.join(chars)
+
+
+def backfill_geohash(apps, schema_editor):
+    CivicIssue = apps.get_model('user', 'CivicIssue')
+    batch = []
+    for issue in CivicIssue.objects.only('id', 'latitude', 'longitude').iterator(chunk_size=2000):
+        issue.geohash = geohash_encode(issue.latitude, issue.longitude)
+        batch.append(issue)
+        if len(batch) >= 1000:
+            CivicIssue.objects.bulk_update(batch, ['geohash'])
+            batch = []
+    CivicIssue.objects.bulk_update(batch, ['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0004_heatmapcell'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='civicissue',
+            name='geohash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=12),
+        ),
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='civicissue',
+            index=models.Index(fields=['geohash'], include=('latitude', 'longitude'), name='civicissue_geohash_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:53
+
+import math
+from collections import defaultdict
+from django.db import migrations, models
+
+# Frozen copies of user.clusters / user.geo / user.counters as of this migration
+CLUSTER_MIN_ZOOM = 3
+CLUSTER_MAX_ZOOM = 15
+CELL_BITS = 2
+MAX_MERCATOR_LAT = 85.05112878
+STATUS_COLUMNS = {code: f'{code.lower()}_count' for code in ('PENDING', 'IN_PROGRESS', 'RESOLVED', 'REJECTED')}
+PRIORITY_COLUMNS = {code: f'{code.lower()}_count' for code in ('LOW', 'MEDIUM', 'HIGH', 'CRITICAL')}
+
+
+def tile_xy(lat, lng, level):
+    lat = min(max(float(lat), -MAX_MERCATOR_LAT), MAX_MERCATOR_LAT)
+    n = 1 << level
+    x = int((float(lng) + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def cell_deltas(state, sign):
+    if state['latitude'] is None or state['longitude'] is None:
+        return []
+    lat, lng = float(state['latitude']), float(state['longitude'])
+    deltas = {'count': sign, 'sum_lat': sign * lat, 'sum_lng': sign * lng}
+    if state['status'] in STATUS_COLUMNS:
+        deltas[STATUS_COLUMNS[state['status']]] = sign
+    if state['priority'] in PRIORITY_COLUMNS:
+        deltas[PRIORITY_COLUMNS[state['priority']]] = sign
+    pairs = []
+    for zoom in range(CLUSTER_MIN_ZOOM, CLUSTER_MAX_ZOOM + 1):
+        x, y = tile_xy(lat, lng, zoom + CELL_BITS)
+        pairs.append(((('zoom', zoom), ('cell_x', x), ('cell_y', y)), deltas))
+    return pairs
+
+
+def merge_deltas(keyed_deltas):
+    merged = defaultdict(lambda: defaultdict(int))
+    for lookup, deltas in keyed_deltas:
+        for field, delta in deltas.items():
+            merged[lookup][field] += delta
+    return {
+        lookup: {field: delta for field, delta in deltas.items() if delta}
+        for lookup, deltas in merged.items()
+        if any(deltas.values())
+    }
+
+
+def backfill_clusters(apps, schema_editor):
+    CivicIssue = apps.get_model('user', 'CivicIssue')
+    ClusterCell = apps.get_model('user', 'ClusterCell')
+    rows = CivicIssue.objects.values('latitude', 'longitude', 'status', 'priority')
+    merged = merge_deltas(
+        pair for state in rows.iterator(chunk_size=2000) for pair in cell_deltas(state, 1)
+    )
+    ClusterCell.objects.bulk_create(
+        [ClusterCell(**dict(lookup), **deltas) for lookup, deltas in merged.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0005_civicissue_geohash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClusterCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('zoom', models.PositiveSmallIntegerField()),
+                ('cell_x', models.IntegerField()),
+                ('cell_y', models.IntegerField()),
+                ('count', models.IntegerField(default=0)),
+                ('sum_lat', models.FloatField(default=0)),
+                ('sum_lng', models.FloatField(default=0)),
+                ('pending_count', models.IntegerField(default=0)),
+                ('in_progress_count', models.IntegerField(default=0)),
+                ('resolved_count', models.IntegerField(default=0)),
+                ('rejected_count', models.IntegerField(default=0)),
+                ('low_count', models.IntegerField(default=0)),
+                ('medium_count', models.IntegerField(default=0)),
+                ('high_count', models.IntegerField(default=0)),
+                ('critical_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('zoom', 'cell_x', 'cell_y'), name='unique_cluster_cell')],
+            },
+        ),
+        migrations.RunPython(backfill_clusters, migrations.RunPython.noop),
+    ]
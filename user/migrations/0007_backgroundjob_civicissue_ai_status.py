@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:57
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def mark_classified_issues_done(apps, schema_editor):
+    # Issues created before the queue existed were classified synchronously
+    CivicIssue = apps.get_model('user', 'CivicIssue')
+    CivicIssue.objects.filter(ai_analysis__isnull=False).update(ai_status='DONE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0006_clustercell'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='civicissue',
+            name='ai_status',
+            field=models.CharField(choices=[('QUEUED', 'Queued'), ('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='QUEUED', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='BackgroundJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=50)),
+                ('payload', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('QUEUED', 'Queued'), ('RUNNING', 'Running'), ('DONE', 'Done'), ('DEAD', 'Dead-lettered')], default='QUEUED', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('max_attempts', models.PositiveIntegerField(default=5)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_until', models.DateTimeField(blank=True, null=True)),
+                ('locked_by', models.CharField(blank=True, default='', max_length=100)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['run_after', 'id'],
+                'indexes': [models.Index(fields=['status', 'run_after'], name='user_backgr_status_21dae9_idx'), models.Index(fields=['status', 'locked_until'], name='user_backgr_status_8dd727_idx')],
+            },
+        ),
+        migrations.RunPython(mark_classified_issues_done, migrations.RunPython.noop),
+    ]
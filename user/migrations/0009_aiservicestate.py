@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:04
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0008_classificationcache_counter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AIServiceState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('tokens', models.FloatField(default=0)),
+                ('refilled_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('circuit_state', models.CharField(choices=[('CLOSED', 'Closed'), ('OPEN', 'Open'), ('HALF_OPEN', 'Half Open')], default='CLOSED', max_length=10)),
+                ('failures', models.PositiveIntegerField(default=0)),
+                ('opened_at', models.DateTimeField(blank=True, null=True)),
+                ('probe_started_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+            ],
+        ),
+    ]
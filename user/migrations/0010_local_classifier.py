@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:06
+
+from django.db import migrations, models
+
+
+def mark_existing_sources(apps, schema_editor):
+    # Every classification before this migration came from Gemini
+    CivicIssue = apps.get_model('user', 'CivicIssue')
+    CivicIssue.objects.exclude(ai_classification__isnull=True).exclude(
+        ai_classification=''
+    ).update(ai_source='GEMINI')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0009_aiservicestate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassifierSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('labels', models.CharField(max_length=10)),
+                ('training_size', models.PositiveIntegerField()),
+                ('metrics', models.JSONField(default=dict)),
+                ('model', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='civicissue',
+            name='ai_source',
+            field=models.CharField(blank=True, choices=[('GEMINI', 'Gemini'), ('LOCAL', 'Local model')], default='', max_length=10),
+        ),
+        migrations.RunPython(mark_existing_sources, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0010_local_classifier'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='civicissue',
+            name='image_thumbnails',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='WebP thumbnail paths keyed by size'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0011_civicissue_image_thumbnails'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='civicissue',
+            index=models.Index(fields=['updated_at'], name='user_civici_updated_ff5629_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:22
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F, Max
+
+
+def backfill_sync_seq(apps, schema_editor):
+    """Existing issues get sync_seq = id; the sequence continues after the largest"""
+    CivicIssue = apps.get_model('user', 'CivicIssue')
+    Counter = apps.get_model('user', 'Counter')
+    CivicIssue.objects.update(sync_seq=F('id'))
+    last = CivicIssue.objects.aggregate(last=Max('id'))['last'] or 0
+    Counter.objects.update_or_create(name='sync.sequence', defaults={'value': last})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0012_civicissue_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IssueTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('issue_id', models.BigIntegerField()),
+                ('reported_by_id', models.IntegerField(null=True)),
+                ('sync_seq', models.BigIntegerField(unique=True)),
+                ('deleted_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='civicissue',
+            name='sync_seq',
+            field=models.BigIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_sync_seq, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:25
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0013_delta_sync'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IssueEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.BigIntegerField(unique=True)),
+                ('kind', models.CharField(max_length=30)),
+                ('issue_id', models.BigIntegerField()),
+                ('area', models.CharField(max_length=100)),
+                ('priority', models.CharField(max_length=20)),
+                ('data', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
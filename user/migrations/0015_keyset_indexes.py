@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0014_issueevent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='civicissue',
+            index=models.Index(fields=['created_at', 'id'], name='civicissue_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='civicissue',
+            index=models.Index(fields=['reported_by', 'created_at', 'id'], name='civicissue_reporter_keyset_idx'),
+        ),
+    ]
@@ -0,0 +1,127 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:10
+
+from django.db import migrations
+
+# The search index as first installed, frozen here: user/search.py may
+# change its statements later, with a migration of its own
+SQLITE_INSTALL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS user_civicissue_fts USING fts5(
+        title, description, address, area, reporter_name, authority_notes, comments, tokenize = 'porter unicode61', prefix = '2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS user_civicissue_fts_insert AFTER INSERT ON user_civicissue BEGIN
+        INSERT INTO user_civicissue_fts(rowid, title, description, address, area, reporter_name, authority_notes, comments)
+        VALUES (new.id, new.title, new.description, new.address, new.area, new.reporter_name, new.authority_notes, '');
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS user_civicissue_fts_update AFTER UPDATE ON user_civicissue
+    WHEN old.title IS NOT new.title OR old.description IS NOT new.description OR old.address IS NOT new.address OR old.area IS NOT new.area OR old.reporter_name IS NOT new.reporter_name OR old.authority_notes IS NOT new.authority_notes BEGIN
+        UPDATE user_civicissue_fts SET title = new.title, description = new.description, address = new.address, area = new.area, reporter_name = new.reporter_name, authority_notes = new.authority_notes
+        WHERE rowid = new.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS user_civicissue_fts_delete AFTER DELETE ON user_civicissue BEGIN
+        DELETE FROM user_civicissue_fts WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS user_civicissue_fts_comment_insert AFTER INSERT ON authority_issuecomment BEGIN
+        UPDATE user_civicissue_fts SET comments = (SELECT group_concat(comment, ' ') FROM authority_issuecomment WHERE issue_id = new.issue_id) WHERE rowid = new.issue_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS user_civicissue_fts_comment_update AFTER UPDATE OF comment, issue_id ON authority_issuecomment BEGIN
+        UPDATE user_civicissue_fts SET comments = (SELECT group_concat(comment, ' ') FROM authority_issuecomment WHERE issue_id = old.issue_id) WHERE rowid = old.issue_id;
+        UPDATE user_civicissue_fts SET comments = (SELECT group_concat(comment, ' ') FROM authority_issuecomment WHERE issue_id = new.issue_id) WHERE rowid = new.issue_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS user_civicissue_fts_comment_delete AFTER DELETE ON authority_issuecomment BEGIN
+        UPDATE user_civicissue_fts SET comments = (SELECT group_concat(comment, ' ') FROM authority_issuecomment WHERE issue_id = old.issue_id) WHERE rowid = old.issue_id;
+    END""",
+]
+SQLITE_REBUILD = [
+    'DELETE FROM user_civicissue_fts',
+    """INSERT INTO user_civicissue_fts(rowid, title, description, address, area, reporter_name, authority_notes, comments)
+    SELECT id, title, description, address, area, reporter_name, authority_notes, coalesce((SELECT group_concat(comment, ' ') FROM authority_issuecomment WHERE issue_id = user_civicissue.id), '')
+    FROM user_civicissue""",
+]
+SQLITE_UNINSTALL = [
+    'DROP TRIGGER IF EXISTS user_civicissue_fts_insert',
+    'DROP TRIGGER IF EXISTS user_civicissue_fts_update',
+    'DROP TRIGGER IF EXISTS user_civicissue_fts_delete',
+    'DROP TRIGGER IF EXISTS user_civicissue_fts_comment_insert',
+    'DROP TRIGGER IF EXISTS user_civicissue_fts_comment_update',
+    'DROP TRIGGER IF EXISTS user_civicissue_fts_comment_delete',
+    'DROP TABLE IF EXISTS user_civicissue_fts',
+]
+POSTGRES_INSTALL = [
+    'ALTER TABLE user_civicissue ADD COLUMN IF NOT EXISTS search_vector tsvector',
+    'CREATE INDEX IF NOT EXISTS civicissue_search_idx ON user_civicissue USING GIN (search_vector)',
+    """CREATE OR REPLACE FUNCTION user_civicissue_search_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(NEW.description, '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(NEW.address, '') || ' ' || coalesce(NEW.area, '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(NEW.authority_notes, '') || ' ' || coalesce(NEW.reporter_name, '')), 'C') ||
+            setweight(to_tsvector('english', coalesce(
+                (SELECT string_agg(comment, ' ') FROM authority_issuecomment WHERE issue_id = NEW.id), ''
+            )), 'D');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql""",
+    'DROP TRIGGER IF EXISTS user_civicissue_search ON user_civicissue',
+    """CREATE TRIGGER user_civicissue_search
+    BEFORE INSERT OR UPDATE OF title, description, address, area, reporter_name, authority_notes, search_vector ON user_civicissue
+    FOR EACH ROW EXECUTE FUNCTION user_civicissue_search_vector()""",
+    """CREATE OR REPLACE FUNCTION authority_issuecomment_search() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP <> 'INSERT' THEN
+            UPDATE user_civicissue SET search_vector = NULL WHERE id = OLD.issue_id;
+        END IF;
+        IF TG_OP <> 'DELETE' THEN
+            UPDATE user_civicissue SET search_vector = NULL WHERE id = NEW.issue_id;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql""",
+    'DROP TRIGGER IF EXISTS authority_issuecomment_search ON authority_issuecomment',
+    """CREATE TRIGGER authority_issuecomment_search
+    AFTER INSERT OR UPDATE OF comment, issue_id OR DELETE ON authority_issuecomment
+    FOR EACH ROW EXECUTE FUNCTION authority_issuecomment_search()""",
+]
+POSTGRES_REBUILD = [
+    'UPDATE user_civicissue SET search_vector = NULL',
+]
+POSTGRES_UNINSTALL = [
+    'DROP TRIGGER IF EXISTS authority_issuecomment_search ON authority_issuecomment',
+    'DROP FUNCTION IF EXISTS authority_issuecomment_search()',
+    'DROP TRIGGER IF EXISTS user_civicissue_search ON user_civicissue',
+    'DROP FUNCTION IF EXISTS user_civicissue_search_vector()',
+    'ALTER TABLE user_civicissue DROP COLUMN IF EXISTS search_vector',
+]
+
+STATEMENTS = {
+    'sqlite': (SQLITE_INSTALL + SQLITE_REBUILD, SQLITE_UNINSTALL),
+    'postgresql': (POSTGRES_INSTALL + POSTGRES_REBUILD, POSTGRES_UNINSTALL),
+}
+
+
+def _execute(schema_editor, which):
+    statements = STATEMENTS.get(schema_editor.connection.vendor)
+    if statements is None:
+        return
+    for sql in statements[which]:
+        schema_editor.execute(sql, params=None)
+
+
+def install_search_index(apps, schema_editor):
+    _execute(schema_editor, 0)
+
+
+def uninstall_search_index(apps, schema_editor):
+    _execute(schema_editor, 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0015_keyset_indexes'),
+        ('authority', '0002_issuerollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
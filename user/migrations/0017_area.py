@@ -0,0 +1,124 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:02
+
+import re
+from collections import defaultdict
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Avg, Count, F, Max, Min
+from django.utils import timezone
+
+# Frozen copies of user.areas.UNKNOWN_AREA / normalize as of this migration
+UNKNOWN_AREA = 'Unknown Area'
+
+
+def normalize(name):
+    return ' '.join(re.findall(r'\w+', (name or '').casefold()))[:100]
+
+
+def backfill_areas(apps, schema_editor):
+    """
+    One Area per normalized spelling of the existing area texts, named after
+    its most common spelling. Issues point at it and take that name; renamed
+    ones get new sync_seq values so delta-sync clients pick the change up.
+    """
+    CivicIssue = apps.get_model('user', 'CivicIssue')
+    Area = apps.get_model('user', 'Area')
+    AreaAlias = apps.get_model('user', 'AreaAlias')
+    Counter = apps.get_model('user', 'Counter')
+    spellings = defaultdict(list)
+    rows = CivicIssue.objects.values('area').annotate(count=Count('id'), city=Max('city')).order_by()
+    for row in rows:
+        spellings[normalize(row['area']) or normalize(UNKNOWN_AREA)].append(row)
+
+    counter, _ = Counter.objects.get_or_create(name='sync.sequence')
+    base, renamed_any = counter.value, False
+    now = timezone.now()
+    for key, rows in spellings.items():
+        rows.sort(key=lambda row: (-row['count'], row['area']))
+        name = ' '.join(rows[0]['area'].split())[:100] or UNKNOWN_AREA
+        area = Area.objects.create(name=name, city=rows[0]['city'] or 'Unknown')
+        AreaAlias.objects.create(area=area, name=name, key=key)
+        texts = [row['area'] for row in rows]
+        CivicIssue.objects.filter(area=name).update(area_ref=area)
+        if any(text != name for text in texts):
+            CivicIssue.objects.filter(area__in=[text for text in texts if text != name]).update(
+                area_ref=area, area=name, updated_at=now, sync_seq=F('id') + base
+            )
+            renamed_any = True
+    if renamed_any:
+        counter.value = base + (CivicIssue.objects.aggregate(last=Max('id'))['last'] or 0)
+        counter.save()
+
+    extents = CivicIssue.objects.values('area_ref').annotate(
+        centroid_latitude=Avg('latitude'), centroid_longitude=Avg('longitude'),
+        min_latitude=Min('latitude'), min_longitude=Min('longitude'),
+        max_latitude=Max('latitude'), max_longitude=Max('longitude'),
+    ).order_by()
+    for extent in extents:
+        Area.objects.filter(pk=extent.pop('area_ref')).update(
+            **{field: round(value, 6) for field, value in extent.items()}
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0016_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Area',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('city', models.CharField(default='Unknown', max_length=100)),
+                ('centroid_latitude', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True)),
+                ('centroid_longitude', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True)),
+                ('min_latitude', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True)),
+                ('min_longitude', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True)),
+                ('max_latitude', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True)),
+                ('max_longitude', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='AreaAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('key', models.CharField(max_length=100, unique=True)),
+            ],
+            options={
+                'verbose_name_plural': 'area aliases',
+            },
+        ),
+        migrations.AddField(
+            model_name='civicissue',
+            name='area_ref',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='issues', to='user.area'),
+        ),
+        migrations.AddIndex(
+            model_name='civicissue',
+            index=models.Index(fields=['area_ref', 'created_at', 'id'], name='civicissue_area_keyset_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='civicissue',
+            name='user_civici_issue_t_9f1dff_idx',
+        ),
+        migrations.AddIndex(
+            model_name='civicissue',
+            index=models.Index(fields=['issue_type', 'area_ref'], name='user_civici_issue_t_84359a_idx'),
+        ),
+        migrations.AddField(
+            model_name='areaalias',
+            name='area',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='user.area'),
+        ),
+        migrations.RunPython(backfill_areas, migrations.RunPython.noop),
+    ]
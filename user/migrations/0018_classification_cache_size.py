@@ -0,0 +1,26 @@
+from django.db import migrations
+
+
+def count_entries(apps, schema_editor):
+    """Seed the cache size counter that ai_cache.put() keeps from now on"""
+    ClassificationCache = apps.get_model('user', 'ClassificationCache')
+    Counter = apps.get_model('user', 'Counter')
+    Counter.objects.update_or_create(
+        name='ai_cache.entries', defaults={'value': ClassificationCache.objects.count()}
+    )
+
+
+def drop_counter(apps, schema_editor):
+    Counter = apps.get_model('user', 'Counter')
+    Counter.objects.filter(name='ai_cache.entries').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0017_area'),
+    ]
+
+    operations = [
+        migrations.RunPython(count_entries, drop_counter),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:41
+
+from django.db import migrations, models
+from django.db.models import F, Max
+from django.utils import timezone
+
+
+def skip_stranded(apps, schema_editor):
+    """
+    Issues left QUEUED without a classification job (bulk imports) are
+    SKIPPED. They get new sync_seq values so delta-sync clients see it.
+    """
+    CivicIssue = apps.get_model('user', 'CivicIssue')
+    BackgroundJob = apps.get_model('user', 'BackgroundJob')
+    Counter = apps.get_model('user', 'Counter')
+    pending = {
+        payload.get('issue_id') for payload in BackgroundJob.objects.filter(
+            kind='classify_issue', status__in=['QUEUED', 'RUNNING']
+        ).values_list('payload', flat=True)
+    }
+    stranded = CivicIssue.objects.filter(ai_status='QUEUED').exclude(pk__in=pending)
+    if not stranded.exists():
+        return
+    counter, _ = Counter.objects.get_or_create(name='sync.sequence')
+    base = counter.value
+    stranded.update(ai_status='SKIPPED', updated_at=timezone.now(), sync_seq=F('id') + base)
+    counter.value = base + (CivicIssue.objects.aggregate(last=Max('id'))['last'] or 0)
+    counter.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0018_classification_cache_size'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='civicissue',
+            name='ai_status',
+            field=models.CharField(choices=[('QUEUED', 'Queued'), ('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed'), ('SKIPPED', 'Not requested')], default='QUEUED', max_length=20),
+        ),
+        migrations.RunPython(skip_stranded, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0019_civicissue_ai_status_skipped'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IssueSearchIndex',
+            fields=[
+                ('issue', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='user.civicissue')),
+            ],
+            options={
+                'db_table': 'user_civicissue_fts',
+                'managed': False,
+            },
+        ),
+    ]
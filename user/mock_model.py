@@ -0,0 +1,99 @@
+import json
+import re
+import time
+
+# Keyword -> issue type used by the mock when "reading" a report
+KEYWORDS = {
+    'POTHOLE': ('pothole', 'crater', 'pit'),
+    'GARBAGE': ('garbage', 'trash', 'waste', 'bin', 'dump'),
+    'WATER': ('water', 'leak', 'pipe', 'flood', 'sewage'),
+    'STREETLIGHT': ('streetlight', 'street light', 'lamp', 'light pole', 'dark'),
+    'ROAD_OBSTRUCTION': ('tree', 'blocking', 'obstruction', 'construction', 'debris'),
+}
+URGENT_WORDS = ('danger', 'accident', 'urgent', 'burst', 'injur', 'fire', 'collapse')
+
+
+class MockQuotaExceeded(Exception):
+    """Mimics google-api-core's ResourceExhausted (HTTP 429)"""
+    code = 429
+
+
+class MockResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class MockGenerativeModel:
+    """
+    Offline stand-in for genai.GenerativeModel, for tests and benchmarks.
+    Classifies by keywords so results are deterministic, understands both
+    the single and the batch prompts of GeminiService, and can simulate
+    network latency and failures.
+    """
+
+    def __init__(self, latency=0.0, fail_every=0, drop_every=0):
+        self.latency = latency
+        # Raise on every Nth call / omit every Nth item of a batch answer
+        self.fail_every = fail_every
+        self.drop_every = drop_every
+        self.calls = 0
+
+    def generate_content(self, prompt, stream=False):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail_every and self.calls % self.fail_every == 0:
+            raise MockQuotaExceeded('Resource has been exhausted (mock)')
+
+        if isinstance(prompt, (list, tuple)):
+            # [instructions, PIL image] as sent by GeminiService.label_image
+            text = json.dumps(self._label_image(prompt))
+        elif 'ISSUES_JSON:' in prompt:
+            text = self._batch_answer(prompt)
+        elif 'Issue Details:' in prompt:
+            details = prompt.split('Issue Details:', 1)[1].split('Respond ONLY', 1)[0]
+            text = json.dumps(self._classify(details))
+        else:
+            text = 'Mock report: issue volumes are stable; prioritise critical items.'
+        if stream:
+            words = text.split(' ')
+            return iter([MockResponse(' '.join(words[i:i + 4]) + ' ') for i in range(0, len(words), 4)])
+        return MockResponse(text)
+
+    def _batch_answer(self, prompt):
+        array = prompt.split('ISSUES_JSON:', 1)[1]
+        issues = json.JSONDecoder().raw_decode(array.strip())[0]
+        answers = []
+        for index, issue in enumerate(issues, start=1):
+            if self.drop_every and index % self.drop_every == 0:
+                continue
+            text = ' '.join(str(issue.get(key, '')) for key in ('title', 'description', 'location'))
+            answers.append({'id': issue['id'], **self._classify(text)})
+        return '```json\n' + json.dumps(answers) + '\n```'
+
+    def _label_image(self, parts):
+        """Labels from the report text plus the image's shape and brightness"""
+        text = ' '.join(part for part in parts if isinstance(part, str))
+        details = text.split('Report:', 1)[-1]
+        labels = [self._classify(details)['issue_type'].lower().replace('_', ' ')]
+        for image in parts:
+            if hasattr(image, 'size') and hasattr(image, 'convert'):
+                width, height = image.size
+                labels.append('landscape' if width > height else 'portrait' if height > width else 'square')
+                pixels = list(image.convert('L').resize((8, 8)).getdata())
+                labels.append('night' if sum(pixels) / len(pixels) < 60 else 'daylight')
+        return labels
+
+    def _classify(self, text):
+        text = text.lower()
+        issue_type = 'ROAD_OBSTRUCTION'
+        for candidate, words in KEYWORDS.items():
+            if any(re.search(r'\b' + re.escape(word), text) for word in words):
+                issue_type = candidate
+                break
+        priority = 'HIGH' if any(word in text for word in URGENT_WORDS) else 'MEDIUM'
+        return {
+            'issue_type': issue_type,
+            'priority': priority,
+            'analysis': f'Mock analysis: {issue_type.lower()} issue with {priority.lower()} priority.',
+        }
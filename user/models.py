@@ -1,9 +1,78 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.utils import timezone
+from .counters import next_value
+from .geo import geohash_encode
+
+# Counter row holding the last CivicIssue.sync_seq handed out (see user/sync.py)
+SYNC_SEQUENCE = 'sync.sequence'
+
+class Area(models.Model):
+    """Canonical locality that issues are filed under (see user/areas.py)"""
+    
+    name = models.CharField(max_length=100, unique=True)
+    city = models.CharField(max_length=100, default='Unknown')
+    
+    # Centroid and bounding box of the area's issues (areas.refresh_extents)
+    centroid_latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    centroid_longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    min_latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    min_longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    max_latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    max_longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['name']
+    
+    def __str__(self):
+        return self.name
+    
+    def clean(self):
+        if self._state.adding:
+            _check_area_key(self.name)
+
+
+class AreaAlias(models.Model):
+    """A spelling of an area name; ``key`` is its normalized form (areas.normalize)"""
+    
+    area = models.ForeignKey(Area, on_delete=models.CASCADE, related_name='aliases')
+    name = models.CharField(max_length=100)
+    key = models.CharField(max_length=100, unique=True)
+    
+    class Meta:
+        verbose_name_plural = 'area aliases'
+    
+    def __str__(self):
+        return f"{self.name} -> {self.area_id}"
+    
+    def clean(self):
+        self.key = _check_area_key(self.name, exclude=self.pk)
+
+
+def _check_area_key(name, exclude=None):
+    """Normalized key for a new area name or alias; it must be unused"""
+    from .areas import normalize
+    key = normalize(name)
+    if not key:
+        raise ValidationError({'name': 'Enter a name with letters or digits.'})
+    clash = AreaAlias.objects.filter(key=key).exclude(pk=exclude).select_related('area').first()
+    if clash is not None:
+        raise ValidationError({'name': f'Already used by area "{clash.area.name}".'})
+    return key
+
 
 class CivicIssue(models.Model):
     """Model for civic issues reported by users"""
     
+    # Fields whose changes feed the derived aggregates (see user/signals.py)
+    TRACKED_FIELDS = (
+        'id', 'status', 'priority', 'issue_type', 'area', 'area_ref_id',
+        'latitude', 'longitude', 'created_at',
+    )
+    
     ISSUE_TYPES = [
         ('POTHOLE', 'Potholes'),
         ('GARBAGE', 'Garbage overflow'),
@@ -35,21 +104,45 @@ class CivicIssue(models.Model):
     latitude = models.DecimalField(max_digits=9, decimal_places=6)
     longitude = models.DecimalField(max_digits=9, decimal_places=6)
     address = models.CharField(max_length=500)
+    # The canonical name of area_ref, set on save (see user/areas.py)
     area = models.CharField(max_length=100)
+    # Indexed through civicissue_area_keyset_idx, which leads with it
+    area_ref = models.ForeignKey(
+        Area, on_delete=models.PROTECT, related_name='issues',
+        null=True, blank=True, editable=False, db_index=False,
+    )
     city = models.CharField(max_length=100, default='Unknown')
+    geohash = models.CharField(max_length=12, blank=True, default='', editable=False)
     
     # Media
     image = models.ImageField(upload_to='issues/', null=True, blank=True)
     image_labels = models.TextField(null=True, blank=True, help_text="AI-detected labels for the uploaded image")
+    image_thumbnails = models.JSONField(default=dict, blank=True, editable=False,
+                                        help_text="WebP thumbnail paths keyed by size")
     
     # Status and Priority
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
     priority = models.CharField(max_length=20, choices=PRIORITY_CHOICES, default='MEDIUM')
     
+    AI_STATUS_CHOICES = [
+        ('QUEUED', 'Queued'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+        ('SKIPPED', 'Not requested'),
+    ]
+    
+    AI_SOURCE_CHOICES = [
+        ('GEMINI', 'Gemini'),
+        ('LOCAL', 'Local model'),
+    ]
+    
     # AI Generated Fields
+    ai_status = models.CharField(max_length=20, choices=AI_STATUS_CHOICES, default='QUEUED')
     ai_classification = models.CharField(max_length=20, choices=ISSUE_TYPES, null=True, blank=True)
     ai_analysis = models.TextField(null=True, blank=True)
     ai_priority = models.CharField(max_length=20, choices=PRIORITY_CHOICES, null=True, blank=True)
+    ai_source = models.CharField(max_length=10, choices=AI_SOURCE_CHOICES, blank=True, default='')
     
     # User Information
     reported_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reported_issues')
@@ -61,6 +154,8 @@ class CivicIssue(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     resolved_at = models.DateTimeField(null=True, blank=True)
+    # Bumped on every write; delta-sync cursors point into this sequence
+    sync_seq = models.BigIntegerField(default=0, db_index=True, editable=False)
     
     # Authority Response
     authority_notes = models.TextField(null=True, blank=True)
@@ -70,9 +165,274 @@ class CivicIssue(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['status', 'created_at']),
-            models.Index(fields=['issue_type', 'area']),
+            models.Index(fields=['issue_type', 'area_ref']),
             models.Index(fields=['latitude', 'longitude']),
+            # max(updated_at) for collection ETags (user/conditional.py)
+            models.Index(fields=['updated_at']),
+            # Keyset pages (user/pagination.py), for everyone's and one reporter's issues
+            models.Index(fields=['created_at', 'id'], name='civicissue_keyset_idx'),
+            models.Index(fields=['reported_by', 'created_at', 'id'], name='civicissue_reporter_keyset_idx'),
+            # Area filters: equality on the FK, then keyset order
+            models.Index(fields=['area_ref', 'created_at', 'id'], name='civicissue_area_keyset_idx'),
+            # Prefix scans for radius/k-nearest queries; pattern ops let
+            # PostgreSQL use it for LIKE 'prefix%', other backends ignore them
+            models.Index(
+                fields=['geohash'], name='civicissue_geohash_idx',
+                include=['latitude', 'longitude'], opclasses=['varchar_pattern_ops'],
+            ),
         ]
     
     def __str__(self):
         return f"{self.title} - {self.area} ({self.status})"
+    
+    def save(self, *args, **kwargs):
+        self.assign_geohash()
+        self.assign_area()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'geohash'}
+        if update_fields is not None and 'area' in update_fields:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'area_ref'}
+        # Derived counters are updated from post_save, inside this transaction.
+        # The sequence is reserved after them, as the last write before commit.
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+            self.sync_seq = self.reserve_sync_seq()
+            type(self)._base_manager.using(kwargs.get('using')).filter(pk=self.pk).update(sync_seq=self.sync_seq)
+    
+    @staticmethod
+    def reserve_sync_seq(count=1):
+        """
+        Reserve ``count`` sync sequence numbers; returns the last one.
+        Call inside the writing transaction: the counter row stays locked
+        until commit, so sequence order matches commit order. Every writer
+        in the process serializes on that row, so reserve as late as
+        possible, after issue_changed has been sent.
+        Bulk writers (and queryset .update() calls) must set sync_seq too.
+        """
+        return next_value(Counter, SYNC_SEQUENCE, count)
+    
+    def assign_geohash(self):
+        """Keep the spatial index column in sync with the coordinates"""
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = geohash_encode(self.latitude, self.longitude)
+    
+    def assign_area(self):
+        """Point new issues, and issues whose area text changed, at the canonical Area"""
+        loaded = getattr(self, '_tracked_state', None)
+        if self.area_ref_id is None or (loaded is not None and loaded['area'] != self.area):
+            from .areas import assign
+            assign([self])
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded state so signal handlers can compute deltas
+        if instance.get_deferred_fields().isdisjoint(cls.TRACKED_FIELDS):
+            instance._tracked_state = instance.tracked_state()
+        return instance
+    
+    def tracked_state(self):
+        """Snapshot of the fields that derived aggregates depend on"""
+        return {name: getattr(self, name) for name in self.TRACKED_FIELDS}
+
+
+
+class BackgroundJob(models.Model):
+    """Unit of work for the database-backed job queue (see user/jobs.py)"""
+    
+    STATUS_CHOICES = [
+        ('QUEUED', 'Queued'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('DEAD', 'Dead-lettered'),
+    ]
+    
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='QUEUED')
+    
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    # Set while a worker holds the job; expired locks are picked up again
+    locked_until = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True, default='')
+    last_error = models.TextField(blank=True, default='')
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['run_after', 'id']
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+            models.Index(fields=['status', 'locked_until']),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+
+class ClassificationCache(models.Model):
+    """AI classification results keyed by a hash of the normalized report text"""
+    
+    key = models.CharField(max_length=64, unique=True)
+    prompt_version = models.CharField(max_length=20)
+    result = models.JSONField()
+    hits = models.PositiveIntegerField(default=0)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    def __str__(self):
+        return f"{self.result.get('issue_type')}/{self.result.get('priority')} ({self.hits} hits)"
+
+
+class IssueTombstone(models.Model):
+    """Deleted issue, kept so delta-sync clients can drop their copy (see user/sync.py)"""
+    
+    issue_id = models.BigIntegerField()
+    reported_by_id = models.IntegerField(null=True)
+    sync_seq = models.BigIntegerField(unique=True)
+    deleted_at = models.DateTimeField(default=timezone.now, db_index=True)
+    
+    def __str__(self):
+        return f"Issue #{self.issue_id} deleted at {self.deleted_at}"
+
+
+class IssueEvent(models.Model):
+    """Change notification for the real-time event stream (see user/events.py)"""
+    
+    # Taken from the sync sequence, so it follows commit order
+    seq = models.BigIntegerField(unique=True)
+    kind = models.CharField(max_length=30)
+    issue_id = models.BigIntegerField()
+    area = models.CharField(max_length=100)
+    priority = models.CharField(max_length=20)
+    data = models.JSONField(default=dict)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    
+    def __str__(self):
+        return f"{self.kind} #{self.seq} (issue {self.issue_id})"
+
+
+class Counter(models.Model):
+    """Named counter shared by all processes, e.g. cache hit/miss statistics"""
+    
+    name = models.CharField(max_length=100, unique=True)
+    value = models.BigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
+class AIServiceState(models.Model):
+    """Shared rate-limiter bucket and circuit-breaker state for an AI provider"""
+    
+    CIRCUIT_STATES = [
+        ('CLOSED', 'Closed'),
+        ('OPEN', 'Open'),
+        ('HALF_OPEN', 'Half Open'),
+    ]
+    
+    name = models.CharField(max_length=50, unique=True)
+    
+    # Token bucket; ``version`` guards compare-and-swap updates
+    tokens = models.FloatField(default=0)
+    refilled_at = models.DateTimeField(default=timezone.now)
+    version = models.PositiveBigIntegerField(default=0)
+    
+    # Circuit breaker
+    circuit_state = models.CharField(max_length=10, choices=CIRCUIT_STATES, default='CLOSED')
+    failures = models.PositiveIntegerField(default=0)
+    opened_at = models.DateTimeField(null=True, blank=True)
+    probe_started_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    
+    def __str__(self):
+        return f"{self.name} ({self.circuit_state})"
+
+class ClassifierSnapshot(models.Model):
+    """A trained local classifier (user/local_classifier.py) serialized as JSON"""
+    
+    labels = models.CharField(max_length=10)
+    training_size = models.PositiveIntegerField()
+    metrics = models.JSONField(default=dict)
+    model = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"Classifier #{self.pk} ({self.training_size} issues)"
+
+class HeatmapCell(models.Model):
+    """Pre-binned issue counts on a multi-resolution web-mercator grid"""
+    
+    level = models.PositiveSmallIntegerField()
+    cell_x = models.IntegerField()
+    cell_y = models.IntegerField()
+    status = models.CharField(max_length=20, choices=CivicIssue.STATUS_CHOICES)
+    issue_type = models.CharField(max_length=20, choices=CivicIssue.ISSUE_TYPES)
+    count = models.IntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['level', 'cell_x', 'cell_y', 'status', 'issue_type'],
+                name='unique_heatmap_cell',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"L{self.level} ({self.cell_x}, {self.cell_y}) {self.status}/{self.issue_type}: {self.count}"
+
+
+
+class ClusterCell(models.Model):
+    """Marker cluster for one grid cell at one map zoom level"""
+    
+    zoom = models.PositiveSmallIntegerField()
+    cell_x = models.IntegerField()
+    cell_y = models.IntegerField()
+    count = models.IntegerField(default=0)
+    # Coordinate sums so the cluster can be drawn at its centroid
+    sum_lat = models.FloatField(default=0)
+    sum_lng = models.FloatField(default=0)
+    
+    # Breakdown by status
+    pending_count = models.IntegerField(default=0)
+    in_progress_count = models.IntegerField(default=0)
+    resolved_count = models.IntegerField(default=0)
+    rejected_count = models.IntegerField(default=0)
+    
+    # Breakdown by priority
+    low_count = models.IntegerField(default=0)
+    medium_count = models.IntegerField(default=0)
+    high_count = models.IntegerField(default=0)
+    critical_count = models.IntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['zoom', 'cell_x', 'cell_y'], name='unique_cluster_cell'),
+        ]
+    
+    def __str__(self):
+        return f"Z{self.zoom} ({self.cell_x}, {self.cell_y}): {self.count}"
+
+
+class IssueSearchIndex(models.Model):
+    """
+    Row of the SQLite full-text index of issues (see user/search.py). The
+    table and its triggers come from migration 0016; this model only lets
+    searches join it.
+    """
+    
+    issue = models.OneToOneField(
+        CivicIssue, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid',
+        db_constraint=False, related_name='search_index'
+    )
+    
+    class Meta:
+        managed = False
+        db_table = 'user_civicissue_fts'
@@ -0,0 +1,137 @@
+import json
+from django.core import signing
+from django.db import connections
+from django.db.models import F, Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+CURSOR_SALT = 'user.pagination'
+MAX_PAGE_SIZE = 100
+# Approximate totals count at most this many rows exactly
+APPROX_COUNT_LIMIT = 10000
+
+
+def approximate_count(queryset):
+    """
+    Cheap total for ``queryset``. Up to APPROX_COUNT_LIMIT rows are counted
+    exactly; beyond that PostgreSQL's planner estimate is used, and other
+    databases report the limit.
+    Returns: (count, is_approximate)
+    """
+    queryset = queryset.order_by()
+    count = queryset[:APPROX_COUNT_LIMIT + 1].count()
+    if count <= APPROX_COUNT_LIMIT:
+        return count, False
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return APPROX_COUNT_LIMIT, True
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return max(int(plan[0]['Plan']['Plan Rows']), APPROX_COUNT_LIMIT), True
+
+
+class IssueCursorPagination(BasePagination):
+    """
+    Keyset pagination on (created_at, id), newest first. A page is an index
+    range scan that starts where the previous one ended, so page 1000 costs
+    the same as page 1, and rows written meanwhile never shift a page.
+    ``?count=exact`` or ``?count=approximate`` adds a total.
+    """
+
+    page_size = api_settings.PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self._page_size(request)
+        self.base_url = request.build_absolute_uri()
+        position, reverse = self._decode(request.query_params.get('cursor'))
+        self.total = self._count(queryset, request.query_params.get('count'))
+
+        # The key is fetched alongside whatever the view selects (model
+        # instances, only() or values() rows), so the next cursor needs no
+        # extra columns from the serializer
+        queryset = queryset.annotate(keyset_created_at=F('created_at'), keyset_id=F('pk'))
+        if position is not None:
+            # (created_at, id) < position, spelled so the first condition is
+            # an index range: the scan seeks to the position instead of
+            # walking past every earlier page
+            created_at, pk = position
+            if reverse:
+                queryset = queryset.filter(Q(created_at__gte=created_at), Q(created_at__gt=created_at) | Q(pk__gt=pk))
+            else:
+                queryset = queryset.filter(Q(created_at__lte=created_at), Q(created_at__lt=created_at) | Q(pk__lt=pk))
+        ordering = ('created_at', 'pk') if reverse else ('-created_at', '-pk')
+        rows = list(queryset.order_by(*ordering)[:self.page_size + 1])
+
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+        # Going back, the rows after this page are the ones we came from
+        more_after, more_before = (True, has_more) if reverse else (has_more, position is not None)
+        self.next_key = self._key(rows[-1]) if rows and more_after else None
+        self.previous_key = self._key(rows[0]) if rows and more_before else None
+        return rows
+
+    def get_paginated_response(self, data):
+        body = {'next': self.get_next_link(), 'previous': self.get_previous_link()}
+        if self.total is not None:
+            body['count'], body['count_is_approximate'] = self.total
+        body['results'] = data
+        return Response(body)
+
+    def get_next_link(self):
+        return self._link(self.next_key, reverse=False)
+
+    def get_previous_link(self):
+        return self._link(self.previous_key, reverse=True)
+
+    def _link(self, key, reverse):
+        if key is None:
+            return None
+        created_at, pk = key
+        cursor = signing.dumps({'created_at': created_at.isoformat(), 'id': pk, 'reverse': reverse}, salt=CURSOR_SALT)
+        # Totals are only computed for the first request of a listing
+        return remove_query_param(replace_query_param(self.base_url, 'cursor', cursor), 'count')
+
+    def _decode(self, cursor):
+        if not cursor:
+            return None, False
+        try:
+            data = signing.loads(cursor, salt=CURSOR_SALT)
+            created_at = parse_datetime(data['created_at'])
+            if created_at is None:
+                raise ValueError
+            return (created_at, int(data['id'])), bool(data['reverse'])
+        except (signing.BadSignature, KeyError, TypeError, ValueError):
+            raise ValidationError({'error': 'Invalid cursor'})
+
+    def _page_size(self, request):
+        try:
+            size = int(request.query_params.get('page_size', self.page_size))
+        except ValueError:
+            raise ValidationError({'error': 'page_size must be an integer'})
+        return min(max(size, 1), MAX_PAGE_SIZE)
+
+    def _count(self, queryset, mode):
+        if mode is None:
+            return None
+        if mode == 'exact':
+            return queryset.order_by().count(), False
+        if mode == 'approximate':
+            return approximate_count(queryset)
+        raise ValidationError({'error': 'count must be exact or approximate'})
+
+    @staticmethod
+    def _key(row):
+        if isinstance(row, dict):
+            return row['keyset_created_at'], row['keyset_id']
+        return row.keyset_created_at, row.keyset_id
@@ -0,0 +1,26 @@
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # optional speed-up; falls back to the standard renderer
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer backed by orjson when it is installed. Meant for responses
+    that are already plain dicts/lists of JSON types (see fast_serializers);
+    other values go through DRF's encoder, and indented output falls back
+    to the standard renderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        ret = orjson.dumps(data, default=self.encoder_class().default)
+        # Match JSONRenderer, which escapes these for safe embedding in JavaScript
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+# Renderers for list actions that return plain dicts from ValuesSerializer
+FAST_RENDERERS = [FastJSONRenderer, BrowsableAPIRenderer]
@@ -0,0 +1,236 @@
+import re
+from functools import reduce
+from operator import and_, or_
+from django.apps import apps
+from django.db import DEFAULT_DB_ALIAS, connection as default_connection, connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+# Terms of a query that are searched; the rest are ignored
+MAX_TERMS = 10
+DEFAULT_RESULTS = 20
+MAX_RESULTS = 100
+# Searched with LIKE on databases other than SQLite and PostgreSQL
+FALLBACK_FIELDS = ('title', 'description', 'address', 'area', 'reporter_name', 'authority_notes')
+
+ISSUES = 'user_civicissue'
+COMMENTS = 'authority_issuecomment'
+FTS_TABLE = 'user_civicissue_fts'
+# Indexed columns and their bm25 weights (SQLite)
+FTS_COLUMNS = (
+    ('title', 10.0), ('description', 4.0), ('address', 2.0), ('area', 2.0),
+    ('reporter_name', 1.0), ('authority_notes', 2.0), ('comments', 1.0),
+)
+_ISSUE_COLUMNS = [name for name, _ in FTS_COLUMNS[:-1]]
+_COMMENT_TEXT = f"(SELECT group_concat(comment, ' ') FROM {COMMENTS} WHERE issue_id = {{id}})"
+
+SQLITE_INSTALL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        {', '.join(name for name, _ in FTS_COLUMNS)}, tokenize = 'porter unicode61', prefix = '2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON {ISSUES} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, {', '.join(_ISSUE_COLUMNS)}, comments)
+        VALUES (new.id, {', '.join(f'new.{name}' for name in _ISSUE_COLUMNS)}, '');
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE ON {ISSUES}
+    WHEN {' OR '.join(f'old.{name} IS NOT new.{name}' for name in _ISSUE_COLUMNS)} BEGIN
+        UPDATE {FTS_TABLE} SET {', '.join(f'{name} = new.{name}' for name in _ISSUE_COLUMNS)}
+        WHERE rowid = new.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON {ISSUES} BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_comment_insert AFTER INSERT ON {COMMENTS} BEGIN
+        UPDATE {FTS_TABLE} SET comments = {_COMMENT_TEXT.format(id='new.issue_id')} WHERE rowid = new.issue_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_comment_update AFTER UPDATE OF comment, issue_id ON {COMMENTS} BEGIN
+        UPDATE {FTS_TABLE} SET comments = {_COMMENT_TEXT.format(id='old.issue_id')} WHERE rowid = old.issue_id;
+        UPDATE {FTS_TABLE} SET comments = {_COMMENT_TEXT.format(id='new.issue_id')} WHERE rowid = new.issue_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_comment_delete AFTER DELETE ON {COMMENTS} BEGIN
+        UPDATE {FTS_TABLE} SET comments = {_COMMENT_TEXT.format(id='old.issue_id')} WHERE rowid = old.issue_id;
+    END""",
+]
+SQLITE_REBUILD = [
+    f"DELETE FROM {FTS_TABLE}",
+    f"""INSERT INTO {FTS_TABLE}(rowid, {', '.join(_ISSUE_COLUMNS)}, comments)
+    SELECT id, {', '.join(_ISSUE_COLUMNS)}, coalesce({_COMMENT_TEXT.format(id=f'{ISSUES}.id')}, '')
+    FROM {ISSUES}""",
+]
+SQLITE_UNINSTALL = [
+    *(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{name}" for name in (
+        'insert', 'update', 'delete', 'comment_insert', 'comment_update', 'comment_delete',
+    )),
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+# PostgreSQL: a weighted tsvector column maintained by triggers, with a GIN index.
+# Comment changes reset the column, which makes the issue trigger recompute it.
+POSTGRES_INSTALL = [
+    f"ALTER TABLE {ISSUES} ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    f"CREATE INDEX IF NOT EXISTS civicissue_search_idx ON {ISSUES} USING GIN (search_vector)",
+    f"""CREATE OR REPLACE FUNCTION {ISSUES}_search_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(NEW.description, '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(NEW.address, '') || ' ' || coalesce(NEW.area, '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(NEW.authority_notes, '') || ' ' || coalesce(NEW.reporter_name, '')), 'C') ||
+            setweight(to_tsvector('english', coalesce(
+                (SELECT string_agg(comment, ' ') FROM {COMMENTS} WHERE issue_id = NEW.id), ''
+            )), 'D');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql""",
+    f"DROP TRIGGER IF EXISTS {ISSUES}_search ON {ISSUES}",
+    f"""CREATE TRIGGER {ISSUES}_search
+    BEFORE INSERT OR UPDATE OF {', '.join(_ISSUE_COLUMNS)}, search_vector ON {ISSUES}
+    FOR EACH ROW EXECUTE FUNCTION {ISSUES}_search_vector()""",
+    f"""CREATE OR REPLACE FUNCTION {COMMENTS}_search() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP <> 'INSERT' THEN
+            UPDATE {ISSUES} SET search_vector = NULL WHERE id = OLD.issue_id;
+        END IF;
+        IF TG_OP <> 'DELETE' THEN
+            UPDATE {ISSUES} SET search_vector = NULL WHERE id = NEW.issue_id;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql""",
+    f"DROP TRIGGER IF EXISTS {COMMENTS}_search ON {COMMENTS}",
+    f"""CREATE TRIGGER {COMMENTS}_search
+    AFTER INSERT OR UPDATE OF comment, issue_id OR DELETE ON {COMMENTS}
+    FOR EACH ROW EXECUTE FUNCTION {COMMENTS}_search()""",
+]
+POSTGRES_REBUILD = [f"UPDATE {ISSUES} SET search_vector = NULL"]
+POSTGRES_UNINSTALL = [
+    f"DROP TRIGGER IF EXISTS {COMMENTS}_search ON {COMMENTS}",
+    f"DROP FUNCTION IF EXISTS {COMMENTS}_search()",
+    f"DROP TRIGGER IF EXISTS {ISSUES}_search ON {ISSUES}",
+    f"DROP FUNCTION IF EXISTS {ISSUES}_search_vector()",
+    f"ALTER TABLE {ISSUES} DROP COLUMN IF EXISTS search_vector",
+]
+
+_STATEMENTS = {
+    'sqlite': (SQLITE_INSTALL, SQLITE_REBUILD, SQLITE_UNINSTALL),
+    'postgresql': (POSTGRES_INSTALL, POSTGRES_REBUILD, POSTGRES_UNINSTALL),
+}
+
+
+def _execute(connection, which):
+    statements = _STATEMENTS.get(connection.vendor)
+    if statements is None:
+        return
+    with connection.cursor() as cursor:
+        for sql in statements[which]:
+            cursor.execute(sql)
+
+
+def install(connection=default_connection):
+    """Create the search index and its triggers if missing (idempotent)"""
+    _execute(connection, 0)
+
+
+def rebuild(connection=default_connection):
+    """Re-index every issue and its comments"""
+    _execute(connection, 1)
+
+
+def uninstall(connection=default_connection):
+    _execute(connection, 2)
+
+
+def restore_triggers(using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    post_migrate receiver. SQLite alters a table by copying it, which drops
+    its triggers, so a migration of the issue or comment table would silently
+    stop the index from following writes.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    tables = connection.introspection.table_names()
+    if FTS_TABLE in tables and ISSUES in tables and COMMENTS in tables:
+        install(connection)
+
+
+def terms(text):
+    """Words of a search query, lower-cased, at most MAX_TERMS of them"""
+    return re.findall(r'\w+', (text or '').lower())[:MAX_TERMS]
+
+
+def matching(queryset, text):
+    """Issues of ``queryset`` containing every word of ``text`` (as a prefix)"""
+    return _search(queryset, text, ranked=False)
+
+
+def ranked(queryset, text):
+    """matching() annotated with ``search_rank`` (higher is better) and ordered by it"""
+    return _search(queryset, text, ranked=True)
+
+
+def with_ranks(get_serializer, issues):
+    """Serialize ranked() issues, keeping their order, with their ``search_rank``"""
+    issues = list(issues)
+    data = get_serializer(issues, many=True).data
+    for item, issue in zip(data, issues):
+        item['search_rank'] = issue.search_rank
+    return data
+
+
+def _search(queryset, text, ranked):
+    words = terms(text)
+    if not words:
+        return queryset.none()
+    vendor = connections[queryset.db].vendor
+    if vendor == 'sqlite':
+        queryset = _sqlite_search(queryset, words, ranked)
+    elif vendor == 'postgresql':
+        queryset = _postgres_search(queryset, words, ranked)
+    else:
+        queryset = queryset.filter(_fallback_condition(words))
+        if ranked:
+            queryset = queryset.annotate(search_rank=Value(0.0))
+    if not ranked:
+        return queryset
+    return queryset.order_by('-search_rank', '-created_at')
+
+
+def _sqlite_search(queryset, words, ranked):
+    query = ' '.join(f'"{word}"*' for word in words)
+    if not ranked:
+        return queryset.filter(RawSQL(
+            f'{ISSUES}.id IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)',
+            (query,), output_field=BooleanField()
+        ))
+    # Joined (through IssueSearchIndex) rather than ranked in a correlated
+    # subquery: bm25() is computed while the match is scanned, instead of
+    # re-running the match per row. bm25() is lower for better matches.
+    weights = ', '.join(str(weight) for _, weight in FTS_COLUMNS)
+    return queryset.filter(search_index__isnull=False).filter(
+        RawSQL(f'{FTS_TABLE} MATCH %s', (query,), output_field=BooleanField())
+    ).annotate(search_rank=RawSQL(f'-bm25({FTS_TABLE}, {weights})', (), output_field=FloatField()))
+
+
+def _postgres_search(queryset, words, ranked):
+    query = ' & '.join(f'{word}:*' for word in words)
+    queryset = queryset.filter(RawSQL(
+        f"{ISSUES}.search_vector @@ to_tsquery('english', %s)", (query,), output_field=BooleanField()
+    ))
+    if not ranked:
+        return queryset
+    return queryset.annotate(search_rank=RawSQL(
+        f"ts_rank({ISSUES}.search_vector, to_tsquery('english', %s))", (query,), output_field=FloatField()
+    ))
+
+
+def _fallback_condition(words):
+    """Unindexed LIKE scans, for databases without a search index here"""
+    IssueComment = apps.get_model('authority', 'IssueComment')
+    conditions = []
+    for word in words:
+        commented = IssueComment.objects.filter(comment__icontains=word).values('issue_id')
+        conditions.append(reduce(or_, (
+            Q(**{f'{field}__icontains': word}) for field in FALLBACK_FIELDS
+        ), Q(pk__in=commented)))
+    return reduce(and_, conditions)
@@ -1,8 +1,44 @@
+from django.core.files.storage import default_storage
 from rest_framework import serializers
 from .models import CivicIssue
 from django.contrib.auth.models import User
 
-class CivicIssueSerializer(serializers.ModelSerializer):
+class ThumbnailFieldsMixin(serializers.Serializer):
+    """
+    ``thumbnails``: WebP derivative URLs by size (empty until processed);
+    ``thumbnail``: the medium derivative, or the original image until then.
+    The ``*_from_values`` functions also serve fast_serializers.ValuesSerializer.
+    """
+    
+    thumbnails = serializers.SerializerMethodField()
+    thumbnail = serializers.SerializerMethodField()
+    
+    values_columns = ('image', 'image_thumbnails')
+    
+    @staticmethod
+    def thumbnails_from_values(row, url):
+        return {size: url(path) for size, path in (row['image_thumbnails'] or {}).items()}
+    
+    @staticmethod
+    def thumbnail_from_values(row, url):
+        path = (row['image_thumbnails'] or {}).get('medium') or row['image']
+        return url(path) if path else None
+    
+    def _url(self, path):
+        url = default_storage.url(path)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+    
+    def _row(self, issue):
+        return {'image': issue.image.name, 'image_thumbnails': issue.image_thumbnails}
+    
+    def get_thumbnails(self, issue):
+        return self.thumbnails_from_values(self._row(issue), self._url)
+    
+    def get_thumbnail(self, issue):
+        return self.thumbnail_from_values(self._row(issue), self._url)
+
+class CivicIssueSerializer(ThumbnailFieldsMixin, serializers.ModelSerializer):
     """Serializer for CivicIssue model"""
     
     class Meta:
@@ -10,13 +46,16 @@ class CivicIssueSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'title', 'description', 'issue_type',
             'latitude', 'longitude', 'address', 'area', 'city',
-            'image', 'status', 'priority',
-            'ai_classification', 'ai_analysis', 'ai_priority',
+            'image', 'thumbnail', 'thumbnails', 'image_labels', 'status', 'priority',
+            'ai_status', 'ai_classification', 'ai_analysis', 'ai_priority',
             'reported_by', 'reporter_name', 'reporter_phone', 'reporter_email',
             'created_at', 'updated_at', 'resolved_at',
             'authority_notes', 'assigned_to'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at', 'ai_classification', 'ai_analysis', 'ai_priority']
+        read_only_fields = [
+            'id', 'created_at', 'updated_at',
+            'ai_status', 'ai_classification', 'ai_analysis', 'ai_priority', 'image_labels'
+        ]
 
 class CivicIssueCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating new civic issues"""
@@ -36,7 +75,7 @@ class CivicIssueCreateSerializer(serializers.ModelSerializer):
         # The AI classification and user info will be added in the view
         return super().create(validated_data)
 
-class CivicIssueListSerializer(serializers.ModelSerializer):
+class CivicIssueListSerializer(ThumbnailFieldsMixin, serializers.ModelSerializer):
     """Lightweight serializer for listing issues"""
     
     class Meta:
@@ -44,5 +83,5 @@ class CivicIssueListSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'title', 'issue_type', 'status', 'priority',
             'latitude', 'longitude', 'area', 'city',
-            'created_at', 'image'
+            'created_at', 'image', 'thumbnail', 'thumbnails'
         ]
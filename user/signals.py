@@ -0,0 +1,68 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import Signal, receiver
+from .models import CivicIssue, IssueTombstone
+from . import clusters, events, heatmap
+
+class IssueChangedSignal(Signal):
+    """
+    Sends to every receiver, then stores the issue events. Events take
+    numbers from the sync sequence, so they are published after the other
+    receivers: the sequence row is locked from there until commit.
+    """
+    
+    def send(self, sender, changes, **named):
+        responses = super().send(sender, changes=changes, **named)
+        events.publish(events.issue_events(changes))
+        return responses
+
+
+# Sent with ``changes``: a list of (old_state, new_state) pairs built from
+# CivicIssue.tracked_state(). old_state is None for new issues and new_state
+# is None for deleted ones. Bulk writers send one signal per batch, before
+# reserving sync sequence numbers.
+issue_changed = IssueChangedSignal()
+
+
+@receiver(pre_save, sender=CivicIssue)
+def capture_previous_state(sender, instance, **kwargs):
+    """Load the stored state for instances that were not fetched from the database"""
+    if instance.pk and getattr(instance, '_tracked_state', None) is None:
+        instance._tracked_state = (
+            CivicIssue.objects.filter(pk=instance.pk)
+            .values(*CivicIssue.TRACKED_FIELDS)
+            .first()
+        )
+
+
+@receiver(post_save, sender=CivicIssue)
+def issue_saved(sender, instance, created, **kwargs):
+    old = None if created else getattr(instance, '_tracked_state', None)
+    new = instance.tracked_state()
+    instance._tracked_state = new
+    issue_changed.send(sender=CivicIssue, changes=[(old, new)])
+
+
+@receiver(post_delete, sender=CivicIssue)
+def issue_deleted(sender, instance, **kwargs):
+    old = getattr(instance, '_tracked_state', None) or instance.tracked_state()
+    issue_changed.send(sender=CivicIssue, changes=[(old, None)])
+
+
+@receiver(post_delete, sender=CivicIssue)
+def record_tombstone(sender, instance, **kwargs):
+    """Let delta-sync clients see the deletion (runs inside the delete transaction)"""
+    IssueTombstone.objects.create(
+        issue_id=instance.pk,
+        reported_by_id=instance.reported_by_id,
+        sync_seq=CivicIssue.reserve_sync_seq(),
+    )
+
+
+@receiver(issue_changed, sender=CivicIssue)
+def update_heatmap(sender, changes, **kwargs):
+    heatmap.apply_changes(changes)
+
+
+@receiver(issue_changed, sender=CivicIssue)
+def update_clusters(sender, changes, **kwargs):
+    clusters.apply_changes(changes)
@@ -0,0 +1,64 @@
+import math
+from functools import reduce
+from operator import or_
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import ASin, Cast, Cos, Power, Radians, Sin, Sqrt
+from .geo import (
+    EARTH_RADIUS_KM, geohash_cell_km, geohash_neighbourhood, precision_for_radius,
+)
+
+# Finest precision tried by nearest(); cells are about 0.6km on their short side
+NEAREST_START_PRECISION = 6
+
+
+def haversine_expression(lat, lng):
+    """Database expression for the great-circle distance (km) from (lat, lng)"""
+    lat_rad = math.radians(float(lat))
+    lng_rad = math.radians(float(lng))
+    row_lat = Radians(Cast(F('latitude'), FloatField()))
+    row_lng = Radians(Cast(F('longitude'), FloatField()))
+    a = (
+        Power(Sin((row_lat - lat_rad) / 2), 2)
+        + Cos(row_lat) * math.cos(lat_rad) * Power(Sin((row_lng - lng_rad) / 2), 2)
+    )
+    return 2 * EARTH_RADIUS_KM * ASin(Sqrt(a), output_field=FloatField())
+
+
+def _prefix_filter(lat, lng, precision):
+    """Q object restricting rows to the 3x3 geohash block around (lat, lng)"""
+    prefixes = geohash_neighbourhood(lat, lng, precision)
+    return reduce(or_, (Q(geohash__startswith=prefix) for prefix in prefixes))
+
+
+def within_radius(queryset, lat, lng, radius_km):
+    """
+    Issues within ``radius_km`` of (lat, lng), nearest first.
+    Each row is annotated with ``distance_km``.
+    """
+    precision = precision_for_radius(radius_km, lat)
+    if precision is not None:
+        queryset = queryset.filter(_prefix_filter(lat, lng, precision))
+    return (
+        queryset
+        .annotate(distance_km=haversine_expression(lat, lng))
+        .filter(distance_km__lte=radius_km)
+        .order_by('distance_km', 'id')
+    )
+
+
+def nearest(queryset, lat, lng, k):
+    """
+    The ``k`` issues closest to (lat, lng), annotated with ``distance_km``.
+    Searches progressively coarser geohash blocks until ``k`` rows are found
+    within the radius the block is guaranteed to cover.
+    """
+    for precision in range(NEAREST_START_PRECISION, 0, -1):
+        radius_km = geohash_cell_km(precision, lat)
+        found = list(within_radius(queryset, lat, lng, radius_km)[:k])
+        if len(found) == k:
+            return found
+    return list(
+        queryset
+        .annotate(distance_km=haversine_expression(lat, lng))
+        .order_by('distance_km', 'id')[:k]
+    )
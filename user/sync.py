@@ -0,0 +1,91 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from .models import Counter, IssueTombstone
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 5000
+CURSOR_SALT = 'user.sync'
+# Highest sync_seq of pruned tombstones; older cursors must resync from scratch
+PRUNED_THROUGH = 'sync.pruned_through'
+
+
+def encode_cursor(seq):
+    return signing.dumps({'seq': seq}, salt=CURSOR_SALT)
+
+
+def decode_cursor(cursor):
+    """Raises: ValueError for cursors this server did not issue"""
+    try:
+        return int(signing.loads(cursor, salt=CURSOR_SALT)['seq'])
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        raise ValueError('Invalid cursor')
+
+
+def changes_since(cursor, queryset, tombstones, serializer, limit=DEFAULT_LIMIT):
+    """
+    Issues of ``queryset`` written and ``tombstones`` recorded after ``cursor``,
+    oldest first and at most ``limit`` of them, serialized with a ValuesSerializer.
+    Without a cursor (or one older than the pruned tombstones) every issue is
+    returned with ``reset: true`` and the client should replace its copy.
+    Returns: dict with changed, deleted, cursor, has_more and reset
+    """
+    after = decode_cursor(cursor) if cursor else 0
+    reset = not cursor or after < _pruned_through()
+    if reset:
+        after = 0
+
+    rows = list(
+        queryset.filter(sync_seq__gt=after).order_by('sync_seq')
+        .values(*serializer.plan.columns, 'sync_seq')[:limit + 1]
+    )
+    events = [(row['sync_seq'], row, None) for row in rows]
+    if not reset:
+        events += [
+            (seq, None, issue_id) for seq, issue_id in
+            tombstones.filter(sync_seq__gt=after).order_by('sync_seq')
+            .values_list('sync_seq', 'issue_id')[:limit + 1]
+        ]
+    events.sort(key=lambda event: event[0])
+    has_more = len(events) > limit
+    events = events[:limit]
+
+    return {
+        'changed': serializer.to_representation(row for _, row, _ in events if row is not None),
+        'deleted': [issue_id for _, row, issue_id in events if row is None],
+        'cursor': encode_cursor(events[-1][0] if events else after),
+        'has_more': has_more,
+        'reset': reset,
+    }
+
+
+def sync_page(params, queryset, tombstones, serializer):
+    """changes_since() for the ``cursor`` and ``limit`` query parameters; raises ValueError"""
+    limit = min(max(int(params.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    return changes_since(params.get('cursor'), queryset, tombstones, serializer, limit)
+
+
+def _pruned_through():
+    return Counter.objects.filter(name=PRUNED_THROUGH).values_list('value', flat=True).first() or 0
+
+
+def prune_tombstones(days=None):
+    """
+    Delete tombstones older than ``days`` (default SYNC_TOMBSTONE_RETENTION_DAYS).
+    Clients whose cursor predates them get a full resync.
+    Returns: number of tombstones deleted
+    """
+    if days is None:
+        days = settings.SYNC_TOMBSTONE_RETENTION_DAYS
+    old = IssueTombstone.objects.filter(deleted_at__lt=timezone.now() - timedelta(days=days))
+    with transaction.atomic():
+        through = old.aggregate(seq=Max('sync_seq'))['seq']
+        if through is None:
+            return 0
+        Counter.objects.get_or_create(name=PRUNED_THROUGH)
+        Counter.objects.filter(name=PRUNED_THROUGH, value__lt=through).update(value=through)
+        deleted, _ = IssueTombstone.objects.filter(sync_seq__lte=through).delete()
+    return deleted
@@ -0,0 +1,154 @@
+from django.db import transaction
+from django.utils import timezone
+from .gemini_service import GeminiService
+from .jobs import job_handler, enqueue
+from . import images, local_classifier
+from .models import CivicIssue
+from .signals import issue_changed
+
+# Seconds a worker waits for a rate-limit token before the job is retried later
+RATE_LIMIT_WAIT = 10
+
+# Columns a finished classification writes; everything else is left as stored
+CLASSIFICATION_FIELDS = [
+    'issue_type', 'priority', 'ai_classification', 'ai_priority', 'ai_analysis',
+    'ai_source', 'ai_status', 'updated_at',
+]
+
+
+def apply_classification(issue, ai_result, source='GEMINI'):
+    """Copy an AI classification onto an issue, keeping manually chosen values"""
+    # Values still equal to a local model prediction were filled in by it
+    provisional = issue.ai_source == 'LOCAL'
+    
+    # Set the issue type and priority based on AI if not manually set
+    if (not issue.issue_type or issue.issue_type == 'OTHER'
+            or (provisional and issue.issue_type == issue.ai_classification)):
+        issue.issue_type = ai_result['issue_type']
+    if (not issue.priority or issue.priority == 'MEDIUM'
+            or (provisional and issue.priority == issue.ai_priority)):
+        issue.priority = ai_result['priority']
+    
+    issue.ai_classification = ai_result['issue_type']
+    issue.ai_priority = ai_result['priority']
+    issue.ai_analysis = ai_result['analysis']
+    issue.ai_source = source
+
+
+def local_classification(description, issue_type):
+    """
+    Fields for a new issue from the local classifier, so it gets a type and
+    priority immediately. Only a confident prediction marks the issue DONE;
+    otherwise the values are provisional until Gemini replaces them.
+    Returns: (fields, confident)
+    """
+    prediction = local_classifier.predict(description)
+    if prediction is None:
+        return {}, False
+    
+    confident = prediction['confidence'] >= local_classifier.threshold()
+    fields = {
+        'priority': prediction['priority'],
+        'ai_classification': prediction['issue_type'],
+        'ai_priority': prediction['priority'],
+        'ai_source': 'LOCAL',
+    }
+    if not issue_type or issue_type == 'OTHER':
+        fields['issue_type'] = prediction['issue_type']
+    if confident:
+        fields['ai_status'] = 'DONE'
+        fields['ai_analysis'] = (
+            f"Classified by the local model ({prediction['confidence']:.0%} confidence)."
+        )
+    return fields, confident
+
+
+def enqueue_classification(issue):
+    """Queue AI classification for an issue"""
+    return enqueue('classify_issue', {'issue_id': issue.pk})
+
+
+def enqueue_image_processing(issue):
+    """Queue EXIF stripping, thumbnails and labelling for an issue's photo"""
+    return enqueue('process_image', {'issue_id': issue.pk})
+
+
+def _mark_issue(issue_id, **fields):
+    """Update columns of one issue without a model save, keeping updated_at/sync_seq current"""
+    with transaction.atomic():
+        issues = CivicIssue.objects.filter(pk=issue_id)
+        state = issues.values(*CivicIssue.TRACKED_FIELDS).first()
+        if state is None:
+            return
+        # No tracked field changes, so counts stay put, but receivers such
+        # as the dashboard overview cache still hear about the write
+        issue_changed.send(sender=CivicIssue, changes=[(state, state)])
+        issues.update(**fields, updated_at=timezone.now(), sync_seq=CivicIssue.reserve_sync_seq())
+
+
+def _classification_failed(payload, error):
+    _mark_issue(
+        payload['issue_id'],
+        ai_status='FAILED',
+        ai_analysis='AI classification currently unavailable.',
+    )
+
+
+@job_handler('classify_issue', on_dead=_classification_failed)
+def classify_issue(payload):
+    """Classify an issue with Gemini; errors propagate so the job is retried"""
+    try:
+        issue = CivicIssue.objects.get(pk=payload['issue_id'])
+    except CivicIssue.DoesNotExist:
+        return  # Deleted before the worker got to it
+    
+    issue.ai_status = 'RUNNING'
+    issue.save(update_fields=['ai_status', 'updated_at'])
+    
+    try:
+        ai_result = GeminiService(rate_limit_wait=RATE_LIMIT_WAIT).classify_issue(
+            title=issue.title,
+            description=issue.description,
+            address=issue.address,
+            fallback=False
+        )
+    except Exception:
+        # Back in the queue until the retry (or dead-lettering) happens
+        _mark_issue(issue.pk, ai_status='QUEUED')
+        raise
+    
+    # The call can take a while; reload the row so authority edits made
+    # meanwhile are kept and the derived counters see the stored state
+    with transaction.atomic():
+        issue = CivicIssue.objects.select_for_update().filter(pk=issue.pk).first()
+        if issue is None:
+            return  # Deleted during the call
+        apply_classification(issue, ai_result)
+        issue.ai_status = 'DONE'
+        issue.save(update_fields=CLASSIFICATION_FIELDS)
+
+
+@job_handler('process_image')
+def process_image(payload):
+    """Strip metadata and build WebP thumbnails, then queue labelling"""
+    issue = CivicIssue.objects.filter(pk=payload['issue_id']).first()
+    if issue is None or not issue.image:
+        return
+    
+    images.process_issue_image(issue)
+    # Labelling depends on the AI quota, so it retries on its own
+    enqueue('label_image', {'issue_id': issue.pk})
+
+
+@job_handler('label_image')
+def label_image(payload):
+    """Fill image_labels through the AI provider; errors propagate so the job is retried"""
+    issue = CivicIssue.objects.filter(pk=payload['issue_id']).first()
+    if issue is None or not issue.image:
+        return
+    
+    labels = GeminiService(rate_limit_wait=RATE_LIMIT_WAIT).label_image(
+        images.label_input(issue), description=issue.description, fallback=False
+    )
+    issue.image_labels = ', '.join(labels)
+    issue.save(update_fields=['image_labels', 'updated_at'])
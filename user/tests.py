@@ -1,3 +1,1129 @@
-from django.test import TestCase
+import io
+import math
+import shutil
+from decimal import Decimal
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+from PIL import Image
+from authority.models import AuthorityDashboard, IssueComment
+from authority.stats import reconcile_dashboards
+from . import ai_cache, ai_guard, areas, clusters, counters, geo, heatmap, images, jobs, local_classifier, search, spatial, sync
+from .ai_providers import StubProvider, get_provider
+from .gemini_service import GeminiService
+from .mock_model import MockGenerativeModel, MockResponse
+from .local_classifier import LocalClassifier
+from .models import (
+    AIServiceState, Area, AreaAlias, BackgroundJob, CivicIssue, ClassificationCache, ClassifierSnapshot,
+    ClusterCell, Counter, HeatmapCell, IssueTombstone,
+)
+from .fast_serializers import ValuesSerializer
+from .serializers import CivicIssueListSerializer, CivicIssueSerializer
 
-# Create your tests here.
+REPORTS = [
+    'Water pipe burst near the market',
+    'Garbage not collected for days',
+    'Street light not working, road is dark',
+    'Deep pothole caused an accident',
+    'Fallen tree blocking road',
+    'Overflowing garbage bins',
+]
+
+
+def report_items():
+    return [
+        {'id': i, 'title': 'Report', 'description': text, 'address': 'Main Road'}
+        for i, text in enumerate(REPORTS)
+    ]
+
+
+class BatchClassificationTests(TestCase):
+
+    def test_batch_matches_single_calls_with_one_request(self):
+        model = MockGenerativeModel()
+        service = GeminiService(model=model)
+        batch = service.classify_issues(report_items())
+        self.assertEqual(model.calls, 1)
+
+        for item in report_items():
+            single = service.classify_issue(item['title'], item['description'], item['address'])
+            self.assertEqual(batch[item['id']]['issue_type'], single['issue_type'])
+            self.assertEqual(batch[item['id']]['priority'], single['priority'])
+
+    def test_missing_items_fall_back_to_single_calls(self):
+        model = MockGenerativeModel(drop_every=2)
+        results = GeminiService(model=model).classify_issues(report_items())
+        self.assertEqual(set(results), set(range(len(REPORTS))))
+        # One batch call plus one call per dropped item
+        self.assertEqual(model.calls, 1 + len(REPORTS) // 2)
+
+    def test_failed_items_are_omitted_without_fallback(self):
+        model = MockGenerativeModel(fail_every=1)
+        results = GeminiService(model=model).classify_issues(report_items(), fallback=False)
+        self.assertEqual(results, {})
+
+    def test_invalid_batch_answers_are_rejected(self):
+        class BadModel(MockGenerativeModel):
+            def _classify(self, text):
+                return {'issue_type': 'ELECTRICITY', 'priority': 'SOON', 'analysis': ''}
+
+        model = BadModel()
+        results = GeminiService(model=model).classify_issues(report_items()[:2], fallback=False)
+        # Every batch answer was invalid, so each item was retried on its own
+        self.assertEqual(model.calls, 3)
+        self.assertEqual(results, {})
+
+
+class CounterTests(TestCase):
+
+    def test_rows_are_updated_in_lock_order(self):
+        for size in (3, 25):  # per-row and bulk paths
+            names = [f'counter {i:02d}' for i in range(size)]
+            Counter.objects.bulk_create([Counter(name=name) for name in names])
+            deltas = {(('name', name),): {'value': 1} for name in reversed(names)}
+            deltas[(('name', names[0]),)] = {'value': 2}
+            updated = []
+
+            def record(execute, sql, params, many, context):
+                if sql.startswith('UPDATE'):
+                    updated.extend([row[-1] for row in params] if many else [params[-1]])
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(record):
+                counters.apply_deltas(Counter, deltas)
+            self.assertEqual(updated, names)
+            self.assertEqual(Counter.objects.get(name=names[0]).value, 2)
+            Counter.objects.all().delete()
+
+
+class ClassificationCacheTests(TestCase):
+
+    def test_near_duplicate_reports_hit_the_cache(self):
+        model = MockGenerativeModel()
+        service = GeminiService(model=model)
+        first = service.classify_issue('Garbage', 'Garbage not collected for days', 'Saket')
+        second = service.classify_issue('garbage!', '  Garbage NOT collected, for days ', 'saket')
+        self.assertEqual(model.calls, 1)
+        self.assertEqual(first, second)
+        stats = ai_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (1, 1, 1))
+
+    def test_batch_only_sends_uncached_items(self):
+        model = MockGenerativeModel()
+        service = GeminiService(model=model)
+        items = report_items()
+        service.classify_issue(items[0]['title'], items[0]['description'], items[0]['address'])
+        service.classify_issues(items)
+        self.assertEqual(model.calls, 2)
+        self.assertEqual(service.classify_issues(items).keys(), {item['id'] for item in items})
+        self.assertEqual(model.calls, 2)
+
+    def test_fallback_answers_are_not_cached(self):
+        service = GeminiService(model=MockGenerativeModel(fail_every=1))
+        service.classify_issue('Pothole', 'Deep pothole', 'Main Road')
+        self.assertFalse(ClassificationCache.objects.exists())
+
+    @override_settings(AI_CACHE_MAX_ENTRIES=2)
+    def test_expired_and_least_recently_used_entries_are_evicted(self):
+        for i in range(3):
+            ai_cache.put(f'key{i}', 'v', {'issue_type': 'OTHER'})
+        ClassificationCache.objects.filter(key='key1').update(last_used_at=timezone.now() + timedelta(seconds=1))
+        ai_cache.put('key3', 'v', {'issue_type': 'OTHER'})
+        self.assertEqual(set(ClassificationCache.objects.values_list('key', flat=True)), {'key1', 'key3'})
+
+        ClassificationCache.objects.filter(key='key3').update(expires_at=timezone.now())
+        self.assertIsNone(ai_cache.get('key3'))
+        self.assertEqual(ai_cache.evict(), 1)
+        self.assertEqual(Counter.objects.get(name=ai_cache.SIZE_COUNTER).value, 1)
+
+    @override_settings(AI_CACHE_MAX_ENTRIES=5)
+    def test_put_keeps_a_size_counter_instead_of_counting(self):
+        with CaptureQueriesContext(connection) as queries:
+            for i in range(3):
+                ai_cache.put(f'key{i}', 'v', {'issue_type': 'OTHER'})
+        self.assertFalse([q for q in queries if 'COUNT(' in q['sql'].upper()])
+        self.assertEqual(Counter.objects.get(name=ai_cache.SIZE_COUNTER).value, 3)
+        ai_cache.put('key0', 'v', {'issue_type': 'OTHER'})
+        self.assertEqual(Counter.objects.get(name=ai_cache.SIZE_COUNTER).value, 3)
+
+
+@override_settings(AI_RATE_LIMIT_RPM=60, AI_RATE_LIMIT_BURST=3,
+                   AI_CIRCUIT_FAILURE_THRESHOLD=2, AI_CIRCUIT_COOLDOWN=60)
+class AIGuardTests(TestCase):
+
+    def service(self, model):
+        return GeminiService(model=model, use_cache=False, guard=True)
+
+    def test_rate_limiter_fails_fast_to_fallback(self):
+        model = MockGenerativeModel()
+        service = self.service(model)
+        for text in REPORTS:
+            result = service.classify_issue('Report', text, 'Main Road')
+        # Burst of 3, then the fallback without calling the model
+        self.assertEqual(model.calls, 3)
+        self.assertEqual(result['issue_type'], 'OTHER')
+        self.assertIn('unavailable', result['analysis'])
+
+    def test_quota_error_opens_circuit_until_probe_succeeds(self):
+        model = MockGenerativeModel(fail_every=1)
+        service = self.service(model)
+        service.classify_issue('Report', 'Deep pothole', 'Main Road')
+        service.classify_issue('Report', 'Deep pothole', 'Main Road')
+        self.assertEqual(model.calls, 1)
+        self.assertEqual(ai_guard.status(service.provider_name)['circuit']['state'], 'OPEN')
+
+        # After the cooldown exactly one probe goes through and closes the circuit
+        AIServiceState.objects.update(opened_at=timezone.now() - timedelta(minutes=2),
+                                      tokens=3)
+        self.assertTrue(ai_guard.allow(service.provider_name))
+        self.assertFalse(ai_guard.allow(service.provider_name))
+        ai_guard.record_success(service.provider_name)
+        self.assertEqual(ai_guard.status(service.provider_name)['circuit']['state'], 'CLOSED')
+
+    def test_consecutive_errors_open_circuit(self):
+        class BrokenModel(MockGenerativeModel):
+            def generate_content(self, prompt, stream=False):
+                self.calls += 1
+                raise ConnectionError('network down')
+
+        model = BrokenModel()
+        service = self.service(model)
+        for _ in range(4):
+            service.classify_issue('Report', 'Deep pothole', 'Main Road')
+        self.assertEqual(model.calls, 2)
+        self.assertEqual(ai_guard.status(service.provider_name)['circuit']['state'], 'OPEN')
+
+    def test_stream_outcome_is_recorded_when_it_ends(self):
+        class BrokenStreamModel(MockGenerativeModel):
+            def generate_content(self, prompt, stream=False):
+                self.calls += 1
+                yield MockResponse('Mock report: ')
+                raise ConnectionError('stream reset')
+
+        service = self.service(BrokenStreamModel())
+        summary = {'total': 1, 'pending': 1, 'in_progress': 0, 'resolved': 0,
+                   'issue_types': {'POTHOLE': 1}, 'priority_breakdown': {'HIGH': 1}}
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                list(service.stream_authority_report(summary))
+        self.assertEqual(ai_guard.status(service.provider_name)['circuit']['state'], 'OPEN')
+
+        AIServiceState.objects.update(circuit_state='CLOSED', failures=1, opened_at=None)
+        service.model = MockGenerativeModel()
+        chunks = service.stream_authority_report(summary)
+        next(chunks)
+        # Still undecided while the stream is being read
+        self.assertEqual(ai_guard.status(service.provider_name)['circuit']['consecutive_failures'], 1)
+        list(chunks)
+        self.assertEqual(ai_guard.status(service.provider_name)['circuit']['consecutive_failures'], 0)
+
+    def test_rate_limit_detection(self):
+        from google.api_core.exceptions import ResourceExhausted
+        self.assertTrue(ai_guard.is_rate_limit_error(ResourceExhausted('quota')))
+        self.assertFalse(ai_guard.is_rate_limit_error(ValueError('expected 429 fields')))
+
+
+class AIProviderTests(TestCase):
+
+    @override_settings(AI_PROVIDER='stub')
+    def test_provider_from_settings_is_created_once(self):
+        service = GeminiService()
+        self.assertIsInstance(service.model, StubProvider)
+        self.assertIs(GeminiService().model, service.model)
+        self.assertFalse(service.guard)
+        result = service.classify_issue('Report', 'Street light not working', 'Main Road')
+        self.assertEqual(result['issue_type'], 'STREETLIGHT')
+
+    @override_settings(AI_PROVIDER='gemini', GEMINI_API_KEY='test')
+    def test_gemini_provider_defers_sdk_setup(self):
+        provider = get_provider()
+        self.assertEqual(provider.name, 'gemini')
+        self.assertIsNone(provider._model)
+        self.assertTrue(GeminiService().guard)
+
+
+def labelled_examples(copies=10):
+    """Mock-model labels for every report, each repeated with small variations"""
+    model = MockGenerativeModel()
+    examples = []
+    for i in range(copies):
+        for text in REPORTS:
+            label = model._classify(text)
+            examples.append((f'{text} {i}', label['issue_type'], label['priority']))
+    return examples
+
+
+class LocalClassifierTests(TestCase):
+
+    def test_classifier_learns_labelled_reports(self):
+        classifier = LocalClassifier.fit(labelled_examples())
+        prediction = classifier.predict('Garbage not collected for days')
+        self.assertEqual((prediction['issue_type'], prediction['priority']), ('GARBAGE', 'MEDIUM'))
+
+        metrics = local_classifier.evaluate(classifier, labelled_examples(copies=2), confidence_threshold=0.5)
+        self.assertEqual(metrics['type_accuracy'], 1.0)
+
+        # Round-trips through the JSON stored in ClassifierSnapshot
+        restored = LocalClassifier.from_dict(classifier.to_dict())
+        self.assertEqual(restored.predict('Water pipe burst'), classifier.predict('Water pipe burst'))
+
+    def test_training_reads_descriptions_and_checks_held_out_accuracy(self):
+        user = User.objects.create_user('reporter')
+        for i, (description, issue_type, priority) in enumerate(labelled_examples(copies=4)):
+            # A generated title naming the wrong type must not be learnt
+            map_issue(user, 28.5, 77.1, title=f'Pothole reported in Saket {i}', description=description,
+                      ai_source='GEMINI', ai_classification=issue_type, ai_priority=priority)
+        out = io.StringIO()
+        with self.assertRaises(CommandError):
+            call_command('train_classifier', threshold=0.5, min_accuracy=1.01, stdout=out)
+        self.assertFalse(ClassifierSnapshot.objects.exists())
+
+        call_command('train_classifier', threshold=0.5, min_accuracy=0.5, stdout=out)
+        classifier = local_classifier.load(refresh=True)
+        self.assertEqual(classifier.predict('Garbage not collected for days')['issue_type'], 'GARBAGE')
+
+        # Snapshots trained on titles are ignored
+        ClassifierSnapshot.objects.create(labels='ai', training_size=1, metrics={},
+                                          model={**classifier.to_dict(), 'inputs': None})
+        self.assertIsNone(local_classifier.load(refresh=True))
+
+    def test_confident_prediction_skips_gemini_at_create(self):
+        local_classifier.save(LocalClassifier.fit(labelled_examples()), 'ai', 60, {})
+        local_classifier.load(refresh=True)
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(User.objects.create_user('reporter'))
+
+        with self.settings(LOCAL_CLASSIFIER_THRESHOLD=0.0):
+            response = client.post('/api/user/issues/', {
+                'description': 'Overflowing garbage bins',
+                'latitude': 28.5, 'longitude': 77.1, 'address': 'Main Road', 'area': 'Saket',
+            })
+        self.assertEqual(response.status_code, 201)
+        issue = CivicIssue.objects.get(pk=response.data['id'])
+        self.assertEqual((issue.issue_type, issue.ai_source, issue.ai_status), ('GARBAGE', 'LOCAL', 'DONE'))
+        self.assertFalse(BackgroundJob.objects.exists())
+
+        with self.settings(LOCAL_CLASSIFIER_THRESHOLD=1.01):
+            response = client.post('/api/user/issues/', {
+                'description': 'Deep pothole caused an accident',
+                'latitude': 28.5, 'longitude': 77.1, 'address': 'Main Road', 'area': 'Saket',
+            })
+        issue = CivicIssue.objects.get(pk=response.data['id'])
+        # Provisional values until Gemini answers, which may replace them
+        self.assertEqual((issue.issue_type, issue.ai_status), ('POTHOLE', 'QUEUED'))
+        self.assertEqual(BackgroundJob.objects.count(), 1)
+        from .tasks import apply_classification
+        apply_classification(issue, {'issue_type': 'ROAD_OBSTRUCTION', 'priority': 'CRITICAL', 'analysis': ''})
+        self.assertEqual((issue.issue_type, issue.priority, issue.ai_source), ('ROAD_OBSTRUCTION', 'CRITICAL', 'GEMINI'))
+
+
+def jpeg_with_gps():
+    image = Image.new('RGB', (2000, 1500), (90, 90, 90))
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientation: rotate 90 degrees
+    exif[0x8825] = {1: 'N', 2: (28.0, 30.0, 0.0)}  # GPSInfo
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', exif=exif)
+    return SimpleUploadedFile('photo.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+
+@override_settings(AI_PROVIDER='stub')
+class ImagePipelineTests(TestCase):
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        override = self.settings(MEDIA_ROOT=media)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_upload_is_stripped_thumbnailed_and_labelled(self):
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(User.objects.create_user('reporter'))
+        response = client.post('/api/user/issues/', {
+            'description': 'Deep pothole near the bus stop', 'issue_type': 'POTHOLE',
+            'latitude': 28.5, 'longitude': 77.1, 'address': 'Main Road', 'area': 'Saket',
+            'image': jpeg_with_gps(),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+
+        while (job := jobs.claim('test-worker', kinds=['process_image', 'label_image'])):
+            self.assertEqual(jobs.run(job), 'DONE')
+
+        issue = CivicIssue.objects.get(pk=response.data['id'])
+        with issue.image.open('rb') as f:
+            original = Image.open(f)
+            self.assertFalse(original.getexif())
+            self.assertEqual(original.size, (1500, 2000))  # orientation applied
+
+        self.assertEqual(set(issue.image_thumbnails), {'small', 'medium', 'large'})
+        with issue.image.storage.open(issue.image_thumbnails['small'], 'rb') as f:
+            thumb = Image.open(f)
+            self.assertEqual((thumb.format, max(thumb.size)), ('WEBP', 160))
+        self.assertIn('pothole', issue.image_labels)
+
+        listed = client.get('/api/user/issues/').data
+        row = (listed['results'] if isinstance(listed, dict) else listed)[0]
+        self.assertTrue(row['thumbnail'].endswith('_medium.webp'))
+
+    def test_original_is_kept_until_the_processed_copy_is_saved(self):
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(User.objects.create_user('reporter'))
+        response = client.post('/api/user/issues/', {
+            'description': 'Broken streetlight', 'issue_type': 'STREETLIGHT',
+            'latitude': 28.5, 'longitude': 77.1, 'address': 'Main Road', 'area': 'Saket',
+            'image': jpeg_with_gps(),
+        }, format='multipart')
+        issue = CivicIssue.objects.get(pk=response.data['id'])
+        original = issue.image.name
+        storage = issue.image.storage
+
+        with mock.patch.object(CivicIssue, 'save', side_effect=RuntimeError('db down')):
+            with self.assertRaises(RuntimeError):
+                images.process_issue_image(issue)
+        issue.refresh_from_db()
+        self.assertEqual(issue.image.name, original)
+        self.assertTrue(storage.exists(original))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            paths = images.process_issue_image(issue)
+        issue.refresh_from_db()
+        self.assertNotEqual(issue.image.name, original)
+        self.assertFalse(storage.exists(original))
+        self.assertTrue(storage.exists(issue.image.name))
+        self.assertTrue(all(storage.exists(path) for path in paths.values()))
+
+
+CALLS = []
+
+
+@jobs.job_handler('test.ok')
+def _ok_job(payload):
+    CALLS.append(payload['n'])
+
+
+@jobs.job_handler('test.fail', on_dead=lambda payload, error: CALLS.append(('dead', payload['n'], error)))
+def _failing_job(payload):
+    raise RuntimeError('boom')
+
+
+class JobQueueTests(TestCase):
+
+    def setUp(self):
+        BackgroundJob.objects.all().delete()
+        CALLS.clear()
+
+    def test_claim_order_and_scheduled_jobs(self):
+        later = jobs.enqueue('test.ok', {'n': 3}, delay=timedelta(minutes=5))
+        first, second = jobs.enqueue('test.ok', {'n': 1}), jobs.enqueue('test.ok', {'n': 2})
+        
+        job = jobs.claim('a')
+        self.assertEqual((job.pk, job.status, job.attempts, job.locked_by), (first.pk, 'RUNNING', 1, 'a'))
+        self.assertEqual(jobs.claim('b').pk, second.pk)
+        self.assertIsNone(jobs.claim('c'))  # the third is not due yet
+        self.assertIsNone(jobs.claim('c', kinds=['other']))
+        
+        call_command('run_worker', '--once', stdout=io.StringIO())
+        self.assertEqual(CALLS, [])  # nothing left that is due
+        BackgroundJob.objects.filter(pk=later.pk).update(run_after=timezone.now())
+        call_command('run_worker', '--once', '--kind', 'test.ok', stdout=io.StringIO())
+        self.assertEqual(CALLS, [3])
+        self.assertEqual(BackgroundJob.objects.get(pk=later.pk).status, 'DONE')
+
+    def test_expired_lock_lets_another_worker_take_over(self):
+        queued = jobs.enqueue('test.ok', {'n': 1})
+        slow = jobs.claim('a', visibility_timeout=timedelta(minutes=5))
+        self.assertIsNone(jobs.claim('b'))  # hidden while worker a holds it
+        
+        BackgroundJob.objects.filter(pk=queued.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        taken = jobs.claim('b')
+        self.assertEqual((taken.pk, taken.locked_by, taken.attempts), (queued.pk, 'b', 2))
+        # Both run the handler (at-least-once); only the lock holder records the outcome
+        self.assertEqual(jobs.run(slow), 'LOST')
+        self.assertEqual(jobs.run(taken), 'DONE')
+        self.assertEqual(CALLS, [1, 1])
+        self.assertEqual(BackgroundJob.objects.get(pk=queued.pk).locked_by, 'b')
+
+    def test_stale_claim_loses_the_conditional_update(self):
+        queued = jobs.enqueue('test.ok', {'n': 1})
+        self.assertEqual(jobs.claim('a').pk, queued.pk)
+        # Worker b listed its candidates before a's UPDATE landed; its own
+        # conditional UPDATE must then match nothing
+        real_filter, stale = BackgroundJob.objects.filter, BackgroundJob.objects.filter(pk=queued.pk)
+        calls = []
+        
+        def filter_(*args, **kwargs):
+            calls.append(args)
+            return stale if len(calls) == 1 else real_filter(*args, **kwargs)
+        
+        with mock.patch.object(BackgroundJob.objects, 'filter', side_effect=filter_):
+            self.assertIsNone(jobs.claim('b'))
+        self.assertEqual(BackgroundJob.objects.get(pk=queued.pk).locked_by, 'a')
+
+    def test_failures_back_off_then_dead_letter(self):
+        queued = jobs.enqueue('test.fail', {'n': 7}, max_attempts=3)
+        delays = []
+        for attempt in (1, 2):
+            job = jobs.claim('a')
+            before = timezone.now()
+            self.assertEqual(jobs.run(job), 'RETRY')
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts, job.locked_until), ('QUEUED', attempt, None))
+            self.assertIn('RuntimeError: boom', job.last_error)
+            delays.append(job.run_after - before)
+            self.assertIsNone(jobs.claim('a'))  # backing off
+            BackgroundJob.objects.filter(pk=queued.pk).update(run_after=timezone.now())
+        # Jittered exponential backoff: [base/2, base], then [base, 2 * base]
+        self.assertTrue(jobs.RETRY_BASE_DELAY / 2 <= delays[0] <= jobs.RETRY_BASE_DELAY + timedelta(seconds=1))
+        self.assertTrue(jobs.RETRY_BASE_DELAY <= delays[1] <= 2 * jobs.RETRY_BASE_DELAY + timedelta(seconds=1))
+        
+        self.assertEqual(jobs.run(jobs.claim('a')), 'DEAD')
+        self.assertEqual(BackgroundJob.objects.get(pk=queued.pk).status, 'DEAD')
+        self.assertEqual(CALLS[0][:2], ('dead', 7))
+        self.assertIn('boom', CALLS[0][2])
+        self.assertIsNone(jobs.claim('a'))
+        
+        self.assertEqual(jobs.requeue_dead(['test.fail']), 1)
+        self.assertEqual(jobs.claim('a').attempts, 1)
+
+    def test_unknown_kind_and_expired_final_attempt_dead_letter(self):
+        jobs.enqueue('test.missing', {})
+        self.assertEqual(jobs.run(jobs.claim('a')), 'DEAD')
+        
+        queued = jobs.enqueue('test.ok', {'n': 1}, max_attempts=1)
+        jobs.claim('a')
+        BackgroundJob.objects.filter(pk=queued.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        # The worker holding the final attempt died; the next claim exceeds the budget
+        self.assertEqual(jobs.run(jobs.claim('b')), 'DEAD')
+        self.assertEqual(CALLS, [])
+
+
+class ClassificationJobTests(TestCase):
+
+    def test_edits_made_during_the_ai_call_are_kept(self):
+        user = User.objects.create_user('reporter')
+        issue = CivicIssue.objects.create(
+            title='Leak', description='Pipe leaking', issue_type='WATER', area='Saket',
+            latitude=28.5, longitude=77.1, address='Main Road', reported_by=user,
+            reporter_name='Tester', reporter_phone='0000000000',
+        )
+        BackgroundJob.objects.all().delete()
+        jobs.enqueue('classify_issue', {'issue_id': issue.pk})
+        
+        def triage_meanwhile(*args, **kwargs):
+            edited = CivicIssue.objects.get(pk=issue.pk)
+            edited.status, edited.assigned_to, edited.authority_notes = 'IN_PROGRESS', 'Crew 4', 'On it'
+            edited.save()
+            return {'issue_type': 'WATER', 'priority': 'HIGH', 'analysis': 'Burst pipe'}
+        
+        with mock.patch.object(GeminiService, 'classify_issue', side_effect=triage_meanwhile):
+            self.assertEqual(jobs.run(jobs.claim('test-worker')), 'DONE')
+        
+        issue.refresh_from_db()
+        self.assertEqual((issue.status, issue.assigned_to, issue.authority_notes), ('IN_PROGRESS', 'Crew 4', 'On it'))
+        self.assertEqual((issue.priority, issue.ai_status, issue.ai_analysis), ('HIGH', 'DONE', 'Burst pipe'))
+        self.assertEqual(reconcile_dashboards(repair=False)['drifted'], [])
+
+
+class FastSerializationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('staff', is_staff=True)
+        for i, (lat, lng) in enumerate([('28.5', '77.1'), ('28.123456', '77.000001'), ('-12.5', '0.25')]):
+            CivicIssue.objects.create(
+                title=f'Issue {i}', description='Test', issue_type='WATER', area='Saket',
+                latitude=lat, longitude=lng, address='Main Road', reported_by=cls.staff,
+                reporter_name='Tester', reporter_phone='0000000000',
+                image='issues/photo.jpg' if i else None,
+                image_thumbnails={'medium': 'issues/thumbs/photo_medium.webp'} if i == 2 else {},
+                resolved_at=timezone.now() if i == 1 else None,
+                assigned_to=cls.staff if i == 2 else None,
+            )
+
+    def test_values_path_matches_model_serializers(self):
+        request = APIClient(SERVER_NAME='localhost').get('/').wsgi_request
+        queryset = CivicIssue.objects.order_by('id')
+        for serializer_class in (CivicIssueSerializer, CivicIssueListSerializer):
+            context = {'request': request}
+            expected = serializer_class(queryset, many=True, context=context).data
+            actual = ValuesSerializer(serializer_class, context=context).serialize(queryset)
+            self.assertEqual(actual, [dict(row) for row in expected])
+
+    def test_endpoints_return_the_same_json(self):
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(self.staff)
+        request = client.get('/').wsgi_request
+        expected = CivicIssueListSerializer(CivicIssue.objects.all(), many=True,
+                                            context={'request': request}).data
+        response = client.get('/api/user/issues/map_data/')
+        self.assertEqual(response.json(), [dict(row) for row in expected])
+
+        response = client.get('/api/user/issues/by_status/?status=pending')
+        self.assertEqual(len(response.json()), 3)
+        self.assertEqual(response.json()[0]['latitude'], CivicIssueSerializer(
+            CivicIssue.objects.get(pk=response.json()[0]['id'])).data['latitude'])
+
+    def test_sparse_fieldsets_trim_output_and_columns(self):
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(self.staff)
+        issue = CivicIssue.objects.order_by('id')[2]
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(f'/api/user/issues/{issue.pk}/?fields=id,status,thumbnail')
+        self.assertEqual(response.json(), {
+            'id': issue.pk, 'status': 'PENDING',
+            'thumbnail': 'http://localhost/media/issues/thumbs/photo_medium.webp'
+        })
+        select = next(q['sql'] for q in queries.captured_queries if 'FROM "user_civicissue"' in q['sql'])
+        self.assertNotIn('"description"', select)
+        self.assertNotIn('"ai_analysis"', select)
+        
+        response = client.get('/api/user/issues/?exclude=thumbnail,thumbnails,image')
+        self.assertNotIn('thumbnail', response.json()['results'][0])
+        self.assertIn('title', response.json()['results'][0])
+        
+        response = client.get('/api/user/issues/map_data/?fields=id,latitude')
+        self.assertEqual(sorted(response.json()[0]), ['id', 'latitude'])
+        
+        response = client.get('/api/user/issues/?fields=id,password')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'Unknown fields: password'})
+
+
+def map_issue(user, lat, lng, **fields):
+    values = {
+        'title': 'Issue', 'description': 'Test', 'issue_type': 'POTHOLE', 'area': 'Saket',
+        'address': 'Main Road', 'reporter_name': 'Tester', 'reporter_phone': '0000000000',
+    }
+    values.update(fields)
+    return CivicIssue.objects.create(latitude=lat, longitude=lng, reported_by=user, **values)
+
+
+class HeatmapTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reporter')
+        # Two Delhi issues about 700m apart, one in Mumbai
+        cls.first = map_issue(cls.user, 28.6, 77.2)
+        cls.second = map_issue(cls.user, 28.605, 77.205, status='RESOLVED', issue_type='WATER')
+        cls.far = map_issue(cls.user, 19.07, 72.87)
+
+    def setUp(self):
+        self.client = APIClient(SERVER_NAME='localhost')
+        self.client.force_authenticate(self.user)
+
+    def heatmap(self, bbox, zoom, **params):
+        return self.client.get('/api/user/issues/heatmap/', {'bbox': bbox, 'zoom': zoom, **params}).json()
+
+    def test_levels_follow_zoom(self):
+        self.assertEqual([heatmap.level_for_zoom(zoom) for zoom in (0, 2, 3, 8, 14, 20)], [5, 5, 7, 11, 17, 17])
+
+    def test_cells_merge_when_zoomed_out_and_split_when_zoomed_in(self):
+        india = self.heatmap('68,8,90,35', 4)
+        self.assertEqual(india['level'], 7)
+        self.assertEqual(sorted(cell[2] for cell in india['cells']), [1, 2])
+        self.assertEqual(india['max_weight'], 2)
+
+        delhi = self.heatmap('77.19,28.59,77.21,28.61', 14)
+        self.assertEqual(delhi['level'], 17)
+        self.assertEqual([cell[2] for cell in delhi['cells']], [1, 1])
+        # Each weight is drawn at its cell centre, within a cell (~270m here) of the issue
+        for lat, lng, _ in delhi['cells']:
+            self.assertTrue(any(
+                abs(lat - float(issue.latitude)) < 0.003 and abs(lng - float(issue.longitude)) < 0.003
+                for issue in (self.first, self.second)
+            ))
+
+        resolved = self.heatmap('68,8,90,35', 4, status='resolved')
+        self.assertEqual([cell[2] for cell in resolved['cells']], [1])
+        self.assertEqual(self.heatmap('68,8,90,35', 4, issue_type='water,pothole')['max_weight'], 2)
+
+    def test_incremental_cells_match_rebuild(self):
+        self.second.latitude, self.second.longitude = 19.08, 72.88
+        self.second.save()
+        self.far.delete()
+        rows = lambda: sorted(HeatmapCell.objects.filter(count__gt=0).values_list(
+            'level', 'cell_x', 'cell_y', 'status', 'issue_type', 'count'))
+        incremental = rows()
+        heatmap.rebuild()
+        self.assertEqual(incremental, rows())
+        self.assertEqual(HeatmapCell.objects.filter(level=5, count__gt=0).count(), 2)
+
+
+class ClusterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reporter')
+        cls.first = map_issue(cls.user, 28.6, 77.2, priority='HIGH')
+        cls.second = map_issue(cls.user, 28.605, 77.205, status='RESOLVED')
+        map_issue(cls.user, 19.07, 72.87)
+
+    def setUp(self):
+        self.client = APIClient(SERVER_NAME='localhost')
+        self.client.force_authenticate(self.user)
+
+    def clusters(self, bbox, zoom):
+        return self.client.get('/api/user/issues/clusters/', {'bbox': bbox, 'zoom': zoom}).json()
+
+    def test_clusters_split_with_zoom_then_switch_to_markers(self):
+        delhi = '77.1,28.5,77.3,28.7'
+        data = self.clusters(delhi, 2)  # below the lowest indexed zoom
+        self.assertEqual(([c['count'] for c in data['clusters']], data['points']), ([2], []))
+        cluster = data['clusters'][0]
+        self.assertAlmostEqual(cluster['lat'], 28.6025)
+        self.assertAlmostEqual(cluster['lng'], 77.2025)
+        self.assertEqual((cluster['status']['PENDING'], cluster['status']['RESOLVED']), (1, 1))
+        self.assertEqual((cluster['priority']['HIGH'], cluster['priority']['MEDIUM']), (1, 1))
+
+        self.assertEqual(sorted(c['count'] for c in self.clusters(delhi, clusters.CLUSTER_MAX_ZOOM)['clusters']), [1, 1])
+
+        data = self.clusters(delhi, clusters.POINTS_MIN_ZOOM)
+        self.assertEqual(data['clusters'], [])
+        self.assertEqual({point['id'] for point in data['points']}, {self.first.pk, self.second.pk})
+        self.assertIsNone(data['points'][0]['thumbnail'])
+
+    def test_incremental_clusters_match_rebuild(self):
+        self.first.status = 'IN_PROGRESS'
+        self.first.save()
+        self.second.delete()
+        rows = lambda: sorted(ClusterCell.objects.filter(count__gt=0).values_list(
+            'zoom', 'cell_x', 'cell_y', 'count', 'in_progress_count', 'resolved_count', 'high_count'))
+        incremental = rows()
+        clusters.rebuild()
+        self.assertEqual(incremental, rows())
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * geo.EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def destination(lat, lng, km, bearing):
+    """Point ``km`` along a great circle from (lat, lng) at ``bearing`` degrees"""
+    lat, lng, theta = map(math.radians, (lat, lng, bearing))
+    d = km / geo.EARTH_RADIUS_KM
+    lat2 = math.asin(math.sin(lat) * math.cos(d) + math.cos(lat) * math.sin(d) * math.cos(theta))
+    lng2 = lng + math.atan2(math.sin(theta) * math.sin(d) * math.cos(lat), math.cos(d) - math.sin(lat) * math.sin(lat2))
+    return math.degrees(lat2), (math.degrees(lng2) + 180) % 360 - 180
+
+
+class SpatialQueryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reporter')
+        cls.centre = (28.6, 77.2)
+        km = 1 / (math.pi * geo.EARTH_RADIUS_KM / 180)  # degrees of latitude per km
+        cls.issues = {
+            distance: map_issue(cls.user, round(28.6 + distance * km, 6), 77.2, title=f'{distance} km north')
+            for distance in (0.2, 0.9, 1.1, 3, 40)
+        }
+        cls.issues[1300] = map_issue(cls.user, 19.07, 72.87, title='Mumbai')
+
+    def setUp(self):
+        self.client = APIClient(SERVER_NAME='localhost')
+        self.client.force_authenticate(self.user)
+
+    def test_neighbourhood_covers_the_radius_across_cell_edges(self):
+        for lat, lng in [(28.6, 77.2), (0.0, 0.0), (-33.9, 18.4), (64.1, -21.9), (12.0, 179.999)]:
+            for radius in (0.5, 2, 10, 50):
+                precision = geo.precision_for_radius(radius, lat)
+                lat_deg, lng_deg = geo.geohash_cell_size(precision)
+                # Points just inside the radius in every direction, from the
+                # centre and from the corners of its cell
+                corner_lat = math.floor((lat + 90) / lat_deg) * lat_deg - 90
+                corner_lng = math.floor((lng + 180) / lng_deg) * lng_deg - 180
+                origins = [(lat, lng), (corner_lat + 1e-9, corner_lng + 1e-9),
+                           (corner_lat + lat_deg - 1e-9, corner_lng + lng_deg - 1e-9)]
+                for origin_lat, origin_lng in origins:
+                    for bearing in range(0, 360, 15):
+                        theta = math.radians(bearing)
+                        point_lat = origin_lat + 0.99 * radius / 111.2 * math.cos(theta)
+                        point_lng = origin_lng + 0.99 * radius / (111.2 * math.cos(math.radians(origin_lat))) * math.sin(theta)
+                        point_lng = (point_lng + 180) % 360 - 180
+                        if haversine_km(origin_lat, origin_lng, point_lat, point_lng) > radius:
+                            continue
+                        cell = geo.geohash_encode(point_lat, point_lng, precision)
+                        self.assertIn(cell, geo.geohash_neighbourhood(origin_lat, origin_lng, precision),
+                                      (origin_lat, origin_lng, radius, bearing))
+
+    def test_cell_width_is_taken_at_the_poleward_edge(self):
+        self.assertAlmostEqual(geo._KM_PER_DEGREE, haversine_km(0, 0, 1, 0))
+        # On the east and poleward edges of a precision 2 cell, with the
+        # largest radius its neighbourhood is said to cover
+        for lat in (61.874999999, 67.500000001, -61.874999999):
+            lng = 11.249999999
+            radius = 0.999 * geo.geohash_cell_km(2, lat)
+            precision = geo.precision_for_radius(radius, lat)
+            neighbourhood = geo.geohash_neighbourhood(lat, lng, precision)
+            for bearing in range(0, 3600, 5):
+                point = destination(lat, lng, 0.999 * radius, bearing / 10)
+                self.assertIn(geo.geohash_encode(*point, precision), neighbourhood, (lat, bearing / 10))
+
+    def test_radius_cut_off_uses_great_circle_distance(self):
+        response = self.client.get('/api/user/issues/nearby/', {'lat': 28.6, 'lng': 77.2, 'radius': 1})
+        self.assertEqual([row['title'] for row in response.json()], ['0.2 km north', '0.9 km north'])
+        self.assertEqual([row['distance_km'] for row in response.json()], [0.2, 0.9])
+
+        found = spatial.within_radius(CivicIssue.objects.all(), 28.6, 77.2, 3.001)
+        self.assertEqual([issue.title for issue in found], ['0.2 km north', '0.9 km north', '1.1 km north', '3 km north'])
+        for issue in found:
+            self.assertAlmostEqual(
+                issue.distance_km, haversine_km(28.6, 77.2, float(issue.latitude), float(issue.longitude)), places=6
+            )
+
+        response = self.client.get('/api/user/issues/nearby/', {'lat': 28.6, 'lng': 77.2, 'radius': 51})
+        self.assertEqual(response.status_code, 400)
+
+    def test_nearest_orders_by_distance_and_widens_the_search(self):
+        response = self.client.get('/api/user/issues/nearest/', {'lat': 28.6, 'lng': 77.2, 'k': 3})
+        self.assertEqual([row['title'] for row in response.json()], ['0.2 km north', '0.9 km north', '1.1 km north'])
+
+        # Only the full scan reaches Mumbai; the order still holds
+        found = spatial.nearest(CivicIssue.objects.all(), 28.6, 77.2, 6)
+        self.assertEqual([issue.pk for issue in found], [self.issues[d].pk for d in (0.2, 0.9, 1.1, 3, 40, 1300)])
+        distances = [issue.distance_km for issue in found]
+        self.assertEqual(distances, sorted(distances))
+
+        # Equal distances fall back to id order
+        twin = map_issue(self.user, *self.centre, title='twin')
+        same = map_issue(self.user, *self.centre, title='same spot')
+        self.assertEqual([issue.pk for issue in spatial.nearest(CivicIssue.objects.all(), 28.6, 77.2, 2)],
+                         [twin.pk, same.pk])
+
+
+class ConditionalGetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reporter')
+        cls.issue = CivicIssue.objects.create(
+            title='Leak', description='Test', issue_type='WATER', area='Saket',
+            latitude=28.5, longitude=77.1, address='Main Road', reported_by=cls.user,
+            reporter_name='Tester', reporter_phone='0000000000',
+        )
+
+    def setUp(self):
+        self.client = APIClient(SERVER_NAME='localhost')
+        self.client.force_authenticate(self.user)
+
+    def test_unchanged_collection_is_not_modified(self):
+        first = self.client.get('/api/user/issues/map_data/')
+        self.assertEqual(first.status_code, 200)
+        etag = first['ETag']
+        
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/user/issues/map_data/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertNotIn('Last-Modified', first)
+        
+        # Other filters are a different collection
+        response = self.client.get('/api/user/issues/?status=pending', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_writes_and_deletes_change_the_etag(self):
+        etag = self.client.get('/api/user/issues/').headers['ETag']
+        self.issue.status = 'RESOLVED'
+        self.issue.save()
+        response = self.client.get('/api/user/issues/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        
+        CivicIssue.objects.create(
+            title='Pothole', description='Test', issue_type='POTHOLE', area='Saket',
+            latitude=28.5, longitude=77.1, address='Main Road', reported_by=self.user,
+            reporter_name='Tester', reporter_phone='0000000000',
+        )
+        etag = self.client.get('/api/user/issues/').headers['ETag']
+        # Deleting an older issue leaves max(updated_at) as it was
+        self.issue.delete()
+        self.assertEqual(self.client.get('/api/user/issues/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        # ...so a date-only revalidation must not be answered with 304
+        response = self.client.get('/api/user/issues/', HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60))
+        self.assertEqual(response.status_code, 200)
+
+
+class DeltaSyncTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reporter')
+        cls.other = User.objects.create_user('other')
+
+    def setUp(self):
+        self.client = APIClient(SERVER_NAME='localhost')
+        self.client.force_authenticate(self.user)
+
+    def report(self, user, title):
+        return CivicIssue.objects.create(
+            title=title, description='Test', issue_type='WATER', area='Saket',
+            latitude=28.5, longitude=77.1, address='Main Road', reported_by=user,
+            reporter_name='Tester', reporter_phone='0000000000',
+        )
+
+    def sync(self, cursor=None, **params):
+        if cursor:
+            params['cursor'] = cursor
+        response = self.client.get('/api/user/issues/sync/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_sequence_is_reserved_after_the_fan_out(self):
+        issue = self.report(self.user, 'First')
+        issue.status = 'RESOLVED'
+        with CaptureQueriesContext(connection) as queries:
+            issue.save()
+        sql = [query['sql'] for query in queries]
+        counter = [i for i, statement in enumerate(sql) if 'user_counter' in statement]
+        derived = [i for i, statement in enumerate(sql) if any(
+            table in statement for table in ('user_heatmapcell', 'user_clustercell', 'authority_issuerollup'))]
+        self.assertTrue(derived)
+        self.assertGreater(counter[0], derived[-1])
+        issue.refresh_from_db()
+        self.assertEqual(issue.sync_seq, Counter.objects.get(name='sync.sequence').value)
+    
+    def test_changes_since_cursor(self):
+        first, second = self.report(self.user, 'First'), self.report(self.user, 'Second')
+        self.report(self.other, 'Not mine')
+        
+        data = self.sync(limit=1)
+        self.assertTrue(data['reset'])
+        self.assertEqual([item['id'] for item in data['changed']], [first.pk])
+        self.assertTrue(data['has_more'])
+        data = self.sync(data['cursor'])
+        self.assertEqual(([item['id'] for item in data['changed']], data['has_more']), ([second.pk], False))
+        cursor = data['cursor']
+        
+        self.assertEqual(self.sync(cursor)['changed'], [])
+        first.status = 'RESOLVED'
+        first.save(update_fields=['status', 'updated_at'])
+        second_id = second.pk
+        second.delete()
+        third = self.report(self.user, 'Third')
+        data = self.sync(cursor)
+        self.assertFalse(data['reset'])
+        self.assertEqual([(item['id'], item['status']) for item in data['changed']],
+                         [(first.pk, 'RESOLVED'), (third.pk, 'PENDING')])
+        self.assertEqual(data['deleted'], [second_id])
+
+    def test_map_scope_and_bad_cursors(self):
+        self.report(self.other, 'Not mine')
+        data = self.sync(scope='map', fields='id,status')
+        self.assertEqual(len(data['changed']), 1)
+        self.assertEqual(sorted(data['changed'][0]), ['id', 'status'])
+        
+        response = self.client.get('/api/user/issues/sync/', {'cursor': 'forged'})
+        self.assertEqual(response.json(), {'error': 'Invalid cursor'})
+
+    def test_pruned_tombstones_force_a_full_resync(self):
+        issue = self.report(self.user, 'First')
+        cursor = self.sync()['cursor']
+        issue.delete()
+        IssueTombstone.objects.update(deleted_at=timezone.now() - timedelta(days=365))
+        self.assertEqual(sync.prune_tombstones(), 1)
+        data = self.sync(cursor)
+        self.assertEqual((data['reset'], data['changed'], data['deleted']), (True, [], []))
+
+
+class KeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reporter')
+        cls.other = User.objects.create_user('neighbour')
+        for i in range(23):
+            CivicIssue.objects.create(
+                title=f'Issue {i}', description='Test', issue_type='WATER', area='Saket',
+                latitude=28.5, longitude=77.1, address='Main Road',
+                reported_by=cls.other if i % 4 == 0 else cls.user,
+                reporter_name='Tester', reporter_phone='0000000000',
+            )
+        # Ties on created_at are broken by id
+        CivicIssue.objects.filter(title__in=['Issue 5', 'Issue 6', 'Issue 7']).update(
+            created_at=timezone.now() - timedelta(days=1)
+        )
+
+    def setUp(self):
+        self.client = APIClient(SERVER_NAME='localhost')
+        self.client.force_authenticate(self.user)
+
+    def test_pages_walk_forward_and_back_in_key_order(self):
+        expected = list(CivicIssue.objects.filter(reported_by=self.user)
+                        .order_by('-created_at', '-id').values_list('id', flat=True))
+        data = self.client.get('/api/user/issues/?page_size=5&count=exact').json()
+        self.assertEqual((data['count'], data['count_is_approximate'], data['previous']), (17, False, None))
+        
+        pages = [[issue['id'] for issue in data['results']]]
+        while data['next']:
+            with self.assertNumQueries(2):  # conditional GET version + the page
+                data = self.client.get(data['next']).json()
+            self.assertNotIn('count', data)
+            pages.append([issue['id'] for issue in data['results']])
+        self.assertEqual([pk for page in pages for pk in page], expected)
+        self.assertEqual([len(page) for page in pages], [5, 5, 5, 2])
+        
+        back = self.client.get(data['previous']).json()
+        self.assertEqual([issue['id'] for issue in back['results']], pages[2])
+        back = self.client.get(self.client.get(back['previous']).json()['previous']).json()
+        self.assertEqual([issue['id'] for issue in back['results']], pages[0])
+        self.assertIsNone(back['previous'])
+
+    def test_sparse_authority_pages_and_bad_parameters(self):
+        self.client.force_authenticate(User.objects.create_user('staff', is_staff=True))
+        data = self.client.get('/api/authority/issues/?fields=title&page_size=20&count=approximate').json()
+        self.assertEqual((data['count'], len(data['results'])), (23, 20))
+        self.assertEqual(list(data['results'][0]), ['title'])
+        data = self.client.get(data['next']).json()
+        self.assertEqual((len(data['results']), data['next']), (3, None))
+        
+        for query in ('cursor=forged', 'page_size=ten', 'count=all'):
+            response = self.client.get(f'/api/authority/issues/?{query}')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('error', response.json())
+
+
+class FullTextSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reporter')
+        cls.other = User.objects.create_user('neighbour')
+        issues = [
+            ('Streetlight broken', 'The streetlight near the temple is broken', 'Temple Road', cls.user),
+            ('Garbage pile', 'Garbage next to a broken streetlight', 'Ring Road', cls.user),
+            ('Water leak', 'Pipe leaking for days', 'Canal Street', cls.user),
+            ('Streetlight flickering', 'Streetlight flickers all night', 'Mall Road', cls.other),
+        ]
+        cls.issues = [
+            CivicIssue.objects.create(
+                title=title, description=description, issue_type='STREETLIGHT', area='Saket',
+                latitude=28.5, longitude=77.1, address=address, reported_by=reporter,
+                reporter_name='Tester', reporter_phone='0000000000',
+            )
+            for title, description, address, reporter in issues
+        ]
+
+    def setUp(self):
+        self.client = APIClient(SERVER_NAME='localhost')
+        self.client.force_authenticate(self.user)
+
+    def ids(self, query):
+        return list(search.ranked(CivicIssue.objects.all(), query).values_list('id', flat=True))
+
+    def test_ranked_prefix_search_of_own_issues(self):
+        lit, garbage, leak, flicker = self.issues
+        # Title matches outrank description matches
+        ranked = self.ids('streetlight')
+        self.assertEqual((set(ranked[:2]), ranked[2:]), ({lit.id, flicker.id}, [garbage.id]))
+        self.assertEqual(self.ids('stre brok'), [lit.id, garbage.id])
+        self.assertEqual(self.ids('temple road'), [lit.id])
+        self.assertEqual(self.ids('!!'), [])
+        
+        data = self.client.get('/api/user/issues/search/?q=streetlight').json()
+        self.assertEqual([issue['id'] for issue in data], [lit.id, garbage.id])
+        self.assertGreater(data[0]['search_rank'], data[1]['search_rank'])
+        data = self.client.get('/api/user/issues/search/?q=streetlight&limit=1').json()
+        self.assertEqual([issue['id'] for issue in data], [lit.id])
+        for query in ('q=', 'q=%20-', 'q=light&limit=all'):
+            response = self.client.get(f'/api/user/issues/search/?{query}')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('error', response.json())
+
+    def test_index_follows_notes_comments_and_deletes(self):
+        lit, garbage, leak, flicker = self.issues
+        leak.authority_notes = 'Plumber dispatched'
+        leak.save()
+        self.assertEqual(self.ids('plumber'), [leak.id])
+        
+        comment = IssueComment.objects.create(issue=garbage, comment='Contractor notified', commented_by='Ward office')
+        IssueComment.objects.create(issue=garbage, comment='Second reminder sent', commented_by='Ward office')
+        self.assertEqual(self.ids('contractor'), [garbage.id])
+        self.assertEqual(self.ids('reminder'), [garbage.id])
+        comment.delete()
+        self.assertEqual(self.ids('contractor'), [])
+        self.assertEqual(self.ids('reminder'), [garbage.id])
+        
+        lit.delete()
+        self.assertEqual(self.ids('temple'), [])
+        # A rebuild indexes the same rows the triggers did
+        search.rebuild()
+        self.assertEqual(self.ids('streetlight'), [flicker.id, garbage.id])
+        self.assertEqual(self.ids('reminder plumber'), [])
+        
+        staff = User.objects.create_superuser('admin', password='x')
+        self.client.force_login(staff)
+        response = self.client.get('/admin/user/civicissue/', {'q': 'remind'})
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+
+class AreaTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reporter', is_staff=True)
+
+    def setUp(self):
+        self.client = APIClient(SERVER_NAME='localhost')
+        self.client.force_authenticate(self.user)
+
+    def report(self, area, latitude=28.5):
+        return CivicIssue.objects.create(
+            title='Issue', description='Test', issue_type='WATER', area=area,
+            latitude=latitude, longitude=77.1, address='Main Road', reported_by=self.user,
+            reporter_name='Tester', reporter_phone='0000000000',
+        )
+
+    def test_spelling_variants_share_one_area(self):
+        first = self.report('Sector 56')
+        variants = [self.report(name) for name in (' sector-56 ', 'SECTOR 56.', 'Sector  56')]
+        other = self.report('Saket')
+        self.assertEqual(Area.objects.count(), 2)
+        for issue in variants:
+            self.assertEqual((issue.area_ref_id, issue.area), (first.area_ref_id, 'Sector 56'))
+        self.assertEqual(AuthorityDashboard.objects.get(area='Sector 56').total_issues, 4)
+        
+        # Exact names and aliases, then substrings, resolve to FK equality
+        for query in ('sector-56', 'sec'):
+            with CaptureQueriesContext(connection) as queries:
+                data = self.client.get(f'/api/user/issues/?area={query}&page_size=50').json()
+            self.assertEqual(len(data['results']), 4)
+            self.assertIn('"area_ref_id" = ', queries.captured_queries[-1]['sql'])
+        self.assertEqual(len(self.client.get('/api/authority/issues/?area=SAKET').json()['results']), 1)
+        self.assertEqual(self.client.get('/api/user/issues/?area=Dwarka').json()['results'], [])
+        
+        other.area = 'sector 56'
+        other.save()
+        self.assertEqual((other.area_ref_id, other.area), (first.area_ref_id, 'Sector 56'))
+        self.assertEqual(reconcile_dashboards(repair=False)['drifted'], [])
+
+    def test_merge_moves_issues_aliases_and_counters(self):
+        target = self.report('Sector 56', latitude=28.5).area_ref
+        moved = [self.report('Sec 56', latitude=28.6), self.report('Sec 56', latitude=28.7)]
+        source = moved[0].area_ref
+        cursor = sync.encode_cursor(CivicIssue.objects.order_by('-sync_seq').first().sync_seq)
+        
+        self.assertEqual(areas.merge(target, [source]), 2)
+        self.assertFalse(Area.objects.filter(pk=source.pk).exists())
+        self.assertEqual(set(CivicIssue.objects.values_list('area', 'area_ref')), {('Sector 56', target.pk)})
+        self.assertEqual(AreaAlias.objects.get(key='sec 56').area, target)
+        self.assertEqual(self.report('SEC-56').area_ref, target)
+        self.assertEqual(reconcile_dashboards(repair=False)['drifted'], [])
+        self.assertEqual(AuthorityDashboard.objects.get(area_ref=target).total_issues, 4)
+        
+        target.refresh_from_db()
+        self.assertEqual((target.min_latitude, target.max_latitude), (Decimal('28.5'), Decimal('28.7')))
+        changed = self.client.get(f'/api/user/issues/sync/?cursor={cursor}').json()['changed']
+        self.assertTrue({issue['id'] for issue in changed}.issuperset(issue.pk for issue in moved))
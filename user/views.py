@@ -3,15 +3,29 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
 from django.contrib.auth.models import User
-from .models import CivicIssue
+from django.db import transaction
+from functools import partial
+from .models import CivicIssue, IssueTombstone
 from .serializers import CivicIssueSerializer, CivicIssueCreateSerializer, CivicIssueListSerializer
-from .gemini_service import GeminiService
+from .conditional import conditional_response
+from .fieldsets import FullTextSearchMixin, SparseFieldsetMixin
+from .pagination import IssueCursorPagination
+from .renderers import FAST_RENDERERS
+from .tasks import enqueue_classification, enqueue_image_processing, local_classification
+from .geo import parse_bbox, parse_zoom
+from .heatmap import heatmap_cells
+from .clusters import viewport_clusters
+from . import areas, spatial, sync
 
-class CivicIssueViewSet(viewsets.ModelViewSet):
+MAX_NEARBY_RADIUS_KM = 50
+MAX_NEAREST_K = 100
+
+class CivicIssueViewSet(FullTextSearchMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing civic issues
     """
     queryset = CivicIssue.objects.all()
+    pagination_class = IssueCursorPagination
     
     def get_queryset(self):
         """Filter queryset to only show user's own issues if not staff"""
@@ -31,7 +45,7 @@ class CivicIssueViewSet(viewsets.ModelViewSet):
         if status_filter:
             queryset = queryset.filter(status=status_filter.upper())
         if area_filter:
-            queryset = queryset.filter(area__icontains=area_filter)
+            queryset = areas.filter_by_area(queryset, area_filter)
             
         return queryset.order_by('-created_at')
 
@@ -44,8 +58,15 @@ class CivicIssueViewSet(viewsets.ModelViewSet):
             return CivicIssueListSerializer
         return CivicIssueSerializer
     
+    def list(self, request, *args, **kwargs):
+        """Paginated issue list; 304 when the client's copy is current"""
+        return conditional_response(
+            request, self.filter_queryset(self.get_queryset()),
+            partial(super().list, request, *args, **kwargs)
+        )
+    
     def create(self, request, *args, **kwargs):
-        """Create a new civic issue with AI classification"""
+        """Create a new civic issue and queue its AI classification"""
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
@@ -66,89 +87,175 @@ class CivicIssueViewSet(viewsets.ModelViewSet):
             # Fallback to user's phone if available, or just use username truncated to 15
             reporter_phone = (user.username)[:15]
         
-        # Create the issue
-        issue = serializer.save(
-            reported_by=user,
-            reporter_name=f"{user.first_name} {user.last_name}".strip() or user.username,
-            reporter_email=user.email,
-            reporter_phone=reporter_phone,
-            title=title
+        # Immediate type and priority from the local classifier
+        ai_fields, confident = local_classification(
+            serializer.validated_data.get('description', ''),
+            serializer.validated_data.get('issue_type')
         )
         
-        # Use Gemini AI to classify the issue
-        try:
-            gemini_service = GeminiService()
-            ai_result = gemini_service.classify_issue(
-                title=issue.title,
-                description=issue.description,
-                address=issue.address
+        # Create the issue and its classification job together
+        with transaction.atomic():
+            issue = serializer.save(
+                reported_by=user,
+                reporter_name=f"{user.first_name} {user.last_name}".strip() or user.username,
+                reporter_email=user.email,
+                reporter_phone=reporter_phone,
+                title=title,
+                **ai_fields
             )
             
-            # Update issue with AI classification
-            issue.ai_classification = ai_result['issue_type']
-            issue.ai_priority = ai_result['priority']
-            issue.ai_analysis = ai_result['analysis']
-            
-            # Set the issue type and priority based on AI if not manually set
-            if not issue.issue_type or issue.issue_type == 'OTHER':
-                issue.issue_type = ai_result['issue_type']
-            if not issue.priority or issue.priority == 'MEDIUM':
-                issue.priority = ai_result['priority']
-            
-            issue.save()
-        except Exception as e:
-            print(f"AI classification error: {str(e)}")
+            # Ask Gemini in the background unless the local model was confident
+            if not confident:
+                enqueue_classification(issue)
+            if issue.image:
+                enqueue_image_processing(issue)
         
         # Return the created issue
         response_serializer = CivicIssueSerializer(issue)
         return Response(response_serializer.data, status=status.HTTP_201_CREATED)
     
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['get'], renderer_classes=FAST_RENDERERS)
     def by_area(self, request):
         """Get issues filtered by area"""
         area = request.query_params.get('area', None)
         if area:
-            issues = self.get_queryset().filter(area__icontains=area)
-            serializer = self.get_serializer(issues, many=True)
-            return Response(serializer.data)
+            issues = areas.filter_by_area(self.get_queryset(), area)
+            return conditional_response(request, issues, lambda: Response(self._fast_data(issues)))
         return Response({'error': 'Area parameter required'}, status=status.HTTP_400_BAD_REQUEST)
     
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['get'], renderer_classes=FAST_RENDERERS)
     def by_status(self, request):
         """Get issues filtered by status"""
         status_param = request.query_params.get('status', None)
         if status_param:
             issues = self.get_queryset().filter(status=status_param.upper())
-            serializer = self.get_serializer(issues, many=True)
-            return Response(serializer.data)
+            return conditional_response(request, issues, lambda: Response(self._fast_data(issues)))
         return Response({'error': 'Status parameter required'}, status=status.HTTP_400_BAD_REQUEST)
     
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['get'], renderer_classes=FAST_RENDERERS)
     def map_data(self, request):
         """Get all issues for map display (non-paginated)"""
         # Always return all issues for the city-wide heatmap
         queryset = CivicIssue.objects.all()
-        serializer = CivicIssueListSerializer(queryset, many=True)
-        return Response(serializer.data)
+        return conditional_response(
+            request, queryset, lambda: Response(self._fast_data(queryset, CivicIssueListSerializer))
+        )
 
+    @action(detail=False, methods=['get'], renderer_classes=FAST_RENDERERS)
+    def sync(self, request):
+        """
+        Issues created, updated or deleted since ``cursor`` (omit it for a full copy).
+        ``scope=map`` follows all issues in the map_data shape; the default
+        follows the caller's own issues (all issues for staff).
+        """
+        if request.query_params.get('scope') == 'map':
+            queryset, tombstones = CivicIssue.objects.all(), IssueTombstone.objects.all()
+            serializer_class = CivicIssueListSerializer
+        elif request.user.is_staff:
+            queryset, tombstones = CivicIssue.objects.all(), IssueTombstone.objects.all()
+            serializer_class = CivicIssueSerializer
+        else:
+            queryset = CivicIssue.objects.filter(reported_by=request.user)
+            tombstones = IssueTombstone.objects.filter(reported_by_id=request.user.pk)
+            serializer_class = CivicIssueSerializer
+        
+        try:
+            data = sync.sync_page(
+                request.query_params, queryset, tombstones,
+                self.get_values_serializer(serializer_class)
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(data)
+
+    def _fast_data(self, queryset, serializer_class=None):
+        """Serialize a read-only list via values(), matching the ModelSerializer output"""
+        return self.get_values_serializer(serializer_class).serialize(queryset)
+    
     @action(detail=False, methods=['get'])
-    def nearby(self, request):
-        """Get issues near a specific location"""
-        lat = request.query_params.get('lat', None)
-        lng = request.query_params.get('lng', None)
-        radius = float(request.query_params.get('radius', 5))  # Default 5km radius
+    def heatmap(self, request):
+        """Get pre-binned heatmap weights for the visible map area"""
+        try:
+            bbox = parse_bbox(request.query_params.get('bbox'))
+            zoom = parse_zoom(request.query_params.get('zoom'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        if lat and lng:
-            # Simple bounding box filter (for more accurate distance, use GeoDjango)
-            lat_delta = radius / 111  # Approximate km to degrees
-            lng_delta = radius / (111 * abs(float(lat)))
-            
-            issues = self.get_queryset().filter(
-                latitude__gte=float(lat) - lat_delta,
-                latitude__lte=float(lat) + lat_delta,
-                longitude__gte=float(lng) - lng_delta,
-                longitude__lte=float(lng) + lng_delta
+        statuses = _split_param(request.query_params.get('status'))
+        issue_types = _split_param(request.query_params.get('issue_type'))
+        
+        level, cells = heatmap_cells(bbox, zoom, statuses, issue_types)
+        return Response({
+            'zoom': zoom,
+            'level': level,
+            'max_weight': max((cell[2] for cell in cells), default=0),
+            'cells': cells,
+        })
+
+    @action(detail=False, methods=['get'])
+    def clusters(self, request):
+        """Get marker clusters (or individual issues when zoomed in) for the visible map area"""
+        try:
+            bbox = parse_bbox(request.query_params.get('bbox'))
+            zoom = parse_zoom(request.query_params.get('zoom'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        data = viewport_clusters(bbox, zoom)
+        data['zoom'] = zoom
+        return Response(data)
+
+    @action(detail=False, methods=['get'])
+    def nearby(self, request):
+        """Get issues within a radius (km) of a location, nearest first"""
+        try:
+            lat, lng = _parse_point(request.query_params)
+            radius = float(request.query_params.get('radius', 5))  # Default 5km radius
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if not 0 < radius <= MAX_NEARBY_RADIUS_KM:
+            return Response(
+                {'error': f'radius must be between 0 and {MAX_NEARBY_RADIUS_KM} km'},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            serializer = self.get_serializer(issues, many=True)
-            return Response(serializer.data)
-        return Response({'error': 'Latitude and longitude required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        issues = spatial.within_radius(self.filter_queryset(self.get_queryset()), lat, lng, radius)
+        return Response(self._with_distances(issues))
+    
+    @action(detail=False, methods=['get'])
+    def nearest(self, request):
+        """Get the k issues closest to a location"""
+        try:
+            lat, lng = _parse_point(request.query_params)
+            k = min(max(int(request.query_params.get('k', 10)), 1), MAX_NEAREST_K)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        issues = spatial.nearest(self.filter_queryset(self.get_queryset()), lat, lng, k)
+        return Response(self._with_distances(issues))
+    
+    def _with_distances(self, issues):
+        """Serialize distance-annotated issues, keeping their order"""
+        issues = list(issues)
+        data = self.get_serializer(issues, many=True).data
+        for item, issue in zip(data, issues):
+            item['distance_km'] = round(issue.distance_km, 3)
+        return data
+
+def _split_param(value):
+    """Split a comma-separated query parameter into upper-cased values"""
+    if not value:
+        return []
+    return [part.strip().upper() for part in value.split(',') if part.strip()]
+
+
+def _parse_point(params):
+    """Read and validate ``lat``/``lng`` query parameters"""
+    lat = params.get('lat')
+    lng = params.get('lng')
+    if not lat or not lng:
+        raise ValueError('Latitude and longitude required')
+    lat, lng = float(lat), float(lng)
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise ValueError('Latitude or longitude out of range')
+    return lat, lng